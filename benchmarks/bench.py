@@ -0,0 +1,652 @@
+"""
+Origin: A file to benchmark the psid_py package
+Filename: bench.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script contains benchmarks of the psid_py package on synthetic data of
+the size of a full PSID release.  Run it from the repository root with
+
+    python -m benchmarks.bench [name ...]
+
+where the names select benchmarks from BENCHMARKS, all by default.  The exit
+status is non-zero if a benchmark with a budget goes over it.
+
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from psid_py import join
+from psid_py.synthetic import (release_zip, write_panel_data,
+                               write_release_file)
+
+
+def best_of(f, repeat=3):
+    """Return the best wall time in seconds of repeat calls to f."""
+    times = []
+    for i in range(0, repeat):
+        start = time.time()
+        f()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def report(name, seconds, baseline=None):
+    """Print a single benchmark result."""
+    line = '%-40s %10.4f s' % (name, seconds)
+    if baseline is not None:
+        line += '   (%.1fx)' % (baseline/seconds)
+    print(line)
+
+
+def bench_join(n_fam=9000, n_ind=75000, fam_cols=10, repeat=3):
+    """
+    Compare pd.merge with join.interview_join on one year of a full release.
+
+    Parameters
+    ----------
+    n_fam       :   integer; families in the wave
+    n_ind       :   integer; rows of the individual file
+    fam_cols    :   integer; family variables selected
+    repeat      :   integer; repetitions, the best is reported
+
+    """
+    rng = np.random.RandomState(0)
+    fam = pd.DataFrame(rng.rand(n_fam, fam_cols),
+                       columns=['v' + str(i) for i in range(0, fam_cols)])
+    fam['interview'] = np.arange(1, n_fam + 1)
+    ind = pd.DataFrame({'interview': rng.randint(0, n_fam + 1, n_ind),
+                        'ID1968': rng.randint(1, 9309, n_ind),
+                        'pernum': rng.randint(1, 200, n_ind),
+                        'weight': rng.rand(n_ind)})
+
+    print('\nJoin: ' + str(n_fam) + ' families x ' + str(fam_cols)
+          + ' variables, ' + str(n_ind) + ' individuals')
+    merge = best_of(lambda: pd.merge(fam, ind, on='interview'), repeat)
+    report('pd.merge', merge)
+    report('join.interview_join',
+           best_of(lambda: join.interview_join(fam, ind), repeat), merge)
+    shuffled = fam.sample(frac=1, random_state=0)
+    report('join.interview_join (unsorted family)',
+           best_of(lambda: join.interview_join(shuffled, ind), repeat), merge)
+
+
+
+def write_dictionary(name, n_vars=10000, width=7):
+    """
+    Write a synthetic sas dictionary name.sas in the layout of the PSID
+    dictionaries: a comment block, an ATTRIB statement with a label and
+    format per variable, the INPUT statement and LABEL statements, about
+    three lines per variable.
+
+    Parameters
+    ----------
+    name        :   string; the file name, without extension
+    n_vars      :   integer; the number of variables
+    width       :   integer; the width of each variable
+
+    """
+    lines = ['/* PSID DATA CENTER ' + '*'*50, '   JOBID  : 1',
+             '   DATA_DOMAIN : PSID', '*'*70 + '*/',
+             'DATA PSID.' + os.path.basename(name) + ' ;', '   ATTRIB']
+    for i in range(0, n_vars):
+        lines.append('      ER%05d LABEL="VARIABLE %d OF THE FILE"'
+                     '  FORMAT=F%d.' % (i + 1, i + 1, width))
+    lines += [';', "INFILE '" + os.path.basename(name) + ".txt' LRECL = "
+              + str(n_vars*width) + ' ;', 'INPUT']
+    for i in range(0, n_vars):
+        lines.append('      ER%05d %d - %d' % (i + 1, i*width + 1,
+                                               (i + 1)*width))
+    lines.append(';')
+    for i in range(0, n_vars):
+        lines.append("LABEL ER%05d = 'VARIABLE %d' ;" % (i + 1, i + 1))
+    lines += ['RUN ;', '']
+    with open(name + '.sas', 'w') as f:
+        f.write('\n'.join(lines))
+
+
+#The line by line clean up of a sas dictionary read_sas used before
+#input_tokens, kept as the baseline of bench_dictionary
+
+
+def first_clean_up(lines):
+    """
+    A function to remove line delimiters, comments, tabs, etc. from the
+    .sas dictionary file.
+
+    Parameters
+    ----------
+    lines    :   list of strings; the raw file
+
+    """
+    #Remove all tabs from the string
+    for i in range(0, len(lines)):
+        lines[i] = re.sub('\t', ' ', lines[i])
+        lines[i] = re.sub('\r', '', lines[i])
+        lines[i] = re.sub('\n', '', lines[i])
+
+    #Remove all comments from the code
+    start_comment = 0
+    for i in range(0, len(lines)):
+        if lines[i].find('/*') >= 0:
+            start_comment = i
+        elif lines[i].find('*/') >= 0:
+            lines[start_comment] = lines[start_comment]\
+                .replace('/*', '')
+            lines[start_comment] = lines[start_comment]\
+                .replace('*', '')
+            lines[i] = lines[i].replace('*/', '')
+            lines[i] = lines[i].replace('*', '')
+            if i > start_comment + 1:
+                lines[start_comment + 1:i] = ['' for x in
+                                              range(start_comment+1, i)]
+    for i in range(0, len(lines)):
+        lines[i] = lines[i].replace('*', '')
+    return lines
+
+
+def find_input(lines):
+    """
+    A function to find the the word INPUT, indicating the start of variables.
+
+    Parameters
+    ----------
+    lines    :   list of strings; the raw file
+
+    """
+    #Find the first line containing the word 'INPUT', which indicates variables
+    for i in range(0, len(lines)):
+        if lines[i].find('INPUT') < 0:
+            pass
+        else:
+            firstline = i
+            break
+    return firstline
+
+
+def find_semicolon(lines, firstline):
+    """
+    A function to find the the first semicolon, indicating the end of
+    the first variable definition.
+
+    Parameters
+    ----------
+    lines       :       list of strings; the raw file
+    firstline   :       integer; the index of the start of the first line
+
+    """
+    #Find the first line containing the word 'INPUT', which indicates variables
+    for i in range(firstline, len(lines)):
+        if lines[i].find(';') < 0:
+            pass
+        else:
+            lastline = i
+            break
+    return lastline
+
+
+def second_clean_up(lines, firstline, lastline):
+    """
+    A function to remove all the variable definition information and seperate
+    the file into individual entries.  It returns a list object containing
+    lines from the sas variable definition section.
+
+    Parameters
+    ----------
+    lines       :   list of strings; the raw file
+    firstline   :   integer; the index of the start of variable definition
+    lastline    :   integer; the index of the end of variable definition
+
+    """
+    #Extract the fixed width file (FWF) input lines
+    FWFlines = lines[firstline:lastline + 1]
+
+    #Remove the INPUT command and the trailing ';'
+    FWFlines[0] = FWFlines[0].replace('INPUT', '')
+    FWFlines[len(FWFlines) - 1] = FWFlines[len(FWFlines) - 1]\
+        .replace(';', '')
+
+    #Add spaces around of all dollar signs and dashes
+    #NOTE: Is this necessary?
+    for i in range(0, len(FWFlines)):
+        FWFlines[i] = FWFlines[i].replace('$', ' $ ')
+        FWFlines[i] = FWFlines[i].replace('-', ' - ')
+
+    #Remove all blank lines
+    FWFlines = [x for x in FWFlines if not x.isspace()]
+
+    #Split the string
+    z = [x.split(' ') for x in FWFlines]
+
+    #Initiate a character list
+    sas_input_lines = []
+
+    #Throw out empty characters and then concatenate lines
+    for i in range(0, len(z)):
+        for k in range(0, len(z[i])):
+            z[i][k] = z[i][k].replace('-', '')
+            z[i][k] = z[i][k].replace(' ', '')
+        z[i] = [x for x in z[i] if x != '']
+        sas_input_lines += z[i]
+    return sas_input_lines
+
+
+def bench_dictionary(n_vars=10000, repeat=3):
+    """
+    Compare the line by line clean up of a sas dictionary with the single
+    pass of read_sas.input_tokens, and time parse_sas, on a dictionary of
+    the size of a PSID family file.
+
+    Parameters
+    ----------
+    n_vars      :   integer; the number of variables
+    repeat      :   integer; repetitions, the best is reported
+
+    """
+    from psid_py import read_sas
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        name = os.path.join(temp_dir, 'FAM2001ER')
+        write_dictionary(name, n_vars)
+        with open(name + '.sas') as f:
+            n_lines = len(f.readlines())
+        print('\nDictionary: ' + str(n_vars) + ' variables, '
+              + str(n_lines) + ' lines')
+
+        def clean_up():
+            with open(name + '.sas') as f:
+                lines = [x.upper() for x in first_clean_up(f.readlines())]
+            first = find_input(lines)
+            last = find_semicolon(lines, first)
+            return second_clean_up(lines, first, last)
+
+        def single_pass():
+            with open(name + '.sas') as f:
+                return read_sas.input_tokens(f)
+
+        if clean_up() != single_pass():
+            print('    the two clean ups disagree')
+            return False
+        baseline = best_of(clean_up, repeat)
+        report('first_clean_up + second_clean_up', baseline)
+        report('input_tokens', best_of(single_pass, repeat), baseline)
+        report('parse_sas', best_of(lambda: read_sas.parse_sas(
+            name + '.sas', 1), repeat))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_zip(n_rec=20000, n_vars=200, repeat=3):
+    """
+    Compare extracting a zipped data file before reading it with reading it
+    from the archive, for a compressed and for a stored archive.
+
+    Parameters
+    ----------
+    n_rec       :   integer; the number of records
+    n_vars      :   integer; the number of variables
+    repeat      :   integer; repetitions, the best is reported
+
+    """
+    from psid_py import read_sas
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        name = os.path.join(temp_dir, 'FAM2001ER')
+        write_release_file(name, n_rec, n_vars)
+        specs = read_sas.column_specs(read_sas.parse_sas(name + '.sas', 1))
+        size = os.path.getsize(name + '.txt')
+        print('\nZipped data: ' + str(n_rec) + ' records x ' + str(n_vars)
+              + ' variables, %.1f MB' % (size/2.**20))
+
+        for method in [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED]:
+            archive = name + str(method) + '.zip'
+            with zipfile.ZipFile(archive, 'w', method) as z:
+                z.write(name + '.txt', 'FAM2001ER.txt')
+                z.write(name + '.sas', 'FAM2001ER.sas')
+            label = 'deflated' if method == zipfile.ZIP_DEFLATED\
+                else 'stored'
+
+            def extract():
+                scratch = tempfile.mkdtemp(dir=temp_dir)
+                with zipfile.ZipFile(archive) as z:
+                    data_file = z.extract('FAM2001ER.txt', scratch)
+                read_sas.read_records(data_file, specs)
+                shutil.rmtree(scratch)
+
+            baseline = best_of(extract, repeat)
+            report('extract then read (' + label + ')', baseline)
+            report('read from archive (' + label + ')',
+                   best_of(lambda: read_sas.read_zipped(archive, specs),
+                           repeat), baseline)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_decode(n_rec=20000, n_vars=200, workers=(1, 2, 4, 8), repeat=3):
+    """
+    Compare pd.read_fwf with read_sas.read_records decoding the variables in
+    1, 2, 4 and 8 threads.
+
+    Parameters
+    ----------
+    n_rec       :   integer; the number of records
+    n_vars      :   integer; the number of variables
+    workers     :   list; the numbers of decoding threads
+    repeat      :   integer; repetitions, the best is reported
+
+    """
+    from psid_py import read_sas
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        name = os.path.join(temp_dir, 'FAM2001ER')
+        write_release_file(name, n_rec, n_vars)
+        specs = read_sas.column_specs(read_sas.parse_sas(name + '.sas', 1))
+        size = os.path.getsize(name + '.txt')
+        print('\nFixed width decoding: ' + str(n_rec) + ' records x '
+              + str(n_vars) + ' variables, %.1f MB, %d cores'
+              % (size/2.**20, os.cpu_count() or 1))
+
+        colspecs = [(int(start), int(start + width)) for start, width
+                    in zip(specs['start'], specs['width'])]
+        baseline = best_of(lambda: pd.read_fwf(name + '.txt',
+                                               colspecs=colspecs,
+                                               header=None), repeat)
+        report('pd.read_fwf', baseline)
+        for n in workers:
+            seconds = best_of(lambda: read_sas.read_records(
+                name + '.txt', specs, workers=n), repeat)
+            report('read_records, ' + str(n) + ' threads (%.0f MB/s)'
+                   % (size/2.**20/seconds), seconds, baseline)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+
+def bench_download(n_files=12, n_rec=5000, concurrency=(1, 2, 4, 8),
+                   latency=0.05, bandwidth=40*2**20,
+                   connection_bandwidth=10*2**20, fail_rate=0.25, seed=1):
+    """
+    Measure the acquisition of a set of files from a local mock SIMBA
+    server, see mock_simba, for several numbers of simultaneous downloads:
+    the wall time, the retries, the failures injected and the peak memory
+    allocated while downloading.
+
+    Parameters
+    ----------
+    n_files     :   integer; the number of files to download
+    n_rec       :   integer; the records of each synthetic file
+    concurrency :   list; the numbers of simultaneous downloads
+    latency     :   float; seconds added to every response
+    bandwidth   :   float; bytes per second shared by all connections
+    connection_bandwidth :  float; bytes per second of each connection
+    fail_rate   :   float; the probability that a file request fails
+    seed        :   integer; the seed of the failure draws
+
+    """
+    import contextlib
+    import io
+    import tracemalloc
+
+    from psid_py import download
+    from psid_py import mock_simba
+
+    archive = release_zip('FAM2001ER', n_rec)
+    files = [str(1040 + i) for i in range(0, n_files)]
+    print('\nDownload: ' + str(n_files) + ' files of %.1f MB, latency %.0f'
+          ' ms, %.0f MB/s shared, %.0f MB/s per connection, %.0f%% failures'
+          % (len(archive)/2.**20, latency*1000, bandwidth/2.**20,
+             connection_bandwidth/2.**20, fail_rate*100))
+
+    baseline = None
+    for n in concurrency:
+        #Each setting sees the same sequence of injected failures
+        server = mock_simba.start(dict((f, archive) for f in files),
+                                  latency=latency, bandwidth=bandwidth,
+                                  connection_bandwidth=connection_bandwidth,
+                                  fail_rate=fail_rate, seed=seed)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            client = download.PSIDClient('user', 'pass', base_url=server.url,
+                                         concurrency=n, retries=5,
+                                         backoff=0.01, progress=None)
+            tracemalloc.start()
+            start = time.time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                client.download(files, temp_dir)
+            seconds = time.time() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        finally:
+            server.stop()
+            shutil.rmtree(temp_dir)
+
+        retries = sum(client.attempts.values()) - len(files)
+        if baseline is None:
+            baseline = seconds
+        report('%d simultaneous (%d retries, %d failed, %.1f MB peak)'
+               % (n, retries, server.counts['failures'], peak/2.**20),
+               seconds, baseline)
+
+
+
+def bench_builds(n_builds=24, workers=(1, 2, 4, 8), n_fam=3000):
+    """
+    Stress a PanelBuilder with overlapping builds of several designs and
+    sub-samples on shared data files already loaded in memory, see builder.
+    Reports the builds per second for each number of threads.  Returns
+    False if a build differs from the same build run alone.
+
+    Parameters
+    ----------
+    n_builds    :   integer; the builds run for each number of threads
+    workers     :   list; the numbers of threads
+    n_fam       :   integer; families in each wave
+
+    """
+    import itertools
+
+    from psid_py.builder import PanelBuilder
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        fam_vars, ind_vars = write_panel_data(temp_dir, n_fam=n_fam)
+        combinations = list(itertools.product(['balanced', 2, 'all'],
+                                              [None, True], [None, 'SRC']))
+        requests = [{'fam_vars': fam_vars, 'ind_vars': ind_vars,
+                     'design': d, 'heads_only': h, 'sample': s}
+                    for d, h, s in combinations]
+        requests = [requests[i % len(requests)]
+                    for i in range(0, n_builds)]
+
+        #The panels of the builds run one at a time, on data loaded once
+        frames = {}
+        with PanelBuilder(temp_dir, frames=frames, workers=1) as builder:
+            expected = [builder.build(**r) for r in requests[:len(
+                combinations)]]
+
+        print('\nBuilds: ' + str(n_builds) + ' overlapping builds of '
+              + str(n_fam*3) + ' individuals, ' + str(len(combinations))
+              + ' designs and samples')
+        ok = True
+        baseline = None
+        for n in workers:
+            with PanelBuilder(temp_dir, frames=frames, workers=n) as builder:
+                start = time.time()
+                builds = builder.map(requests)
+                seconds = time.time() - start
+            wrong = sum(not b.panel.reset_index(drop=True).equals(
+                expected[i % len(combinations)].reset_index(drop=True))
+                for i, b in enumerate(builds))
+            ok = ok and wrong == 0
+            if baseline is None:
+                baseline = seconds
+            report('%d threads (%.1f builds/s%s)'
+                   % (n, n_builds/seconds,
+                      ', %d WRONG' % wrong if wrong else ''),
+                   seconds, baseline)
+        return ok
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_ids(n_persons=80000, n_years=20, n_fam=9000, repeat=3):
+    """
+    Compare float and integer identifiers on a panel of the size of a full
+    release, see identifiers: the pid construction, the count of years
+    present of build_panel and the per-year merge on interview numbers.
+
+    Parameters
+    ----------
+    n_persons   :   integer; individuals of the panel
+    n_years     :   integer; waves, every individual present in each
+    n_fam       :   integer; families in each wave
+    repeat      :   integer; repetitions, the best is reported
+
+    """
+    from psid_py import identifiers
+
+    rng = np.random.RandomState(0)
+    n = n_persons*n_years
+    ID1968 = np.tile(rng.randint(1, 9309, n_persons), n_years).astype(float)
+    pernum = np.tile(rng.randint(1, 200, n_persons), n_years).astype(float)
+    fam = pd.DataFrame(rng.rand(n_fam, 10),
+                       columns=['v' + str(i) for i in range(0, 10)])
+    fam['interview'] = np.arange(1, n_fam + 1).astype(float)
+    ind = pd.DataFrame({'interview': rng.randint(0, n_fam + 1,
+                                                 n_persons).astype(float),
+                        'weight': rng.rand(n_persons)})
+    fam_int = identifiers.compact_ids(fam, ['interview'])
+    ind_int = identifiers.compact_ids(ind, ['interview'])
+
+    #Identifiers are compacted once, when the files are loaded
+    ID1968_int = identifiers.compact(ID1968)
+    pernum_int = identifiers.compact(pernum)
+    pid_float = ID1968*1000 + pernum
+    pid_int = identifiers.pid_of(ID1968_int, pernum_int)
+    panel_float = pd.DataFrame({'year': np.repeat(np.arange(n_years),
+                                                  n_persons),
+                                'pid': pid_float})
+    panel_int = pd.DataFrame({'year': panel_float['year'].values,
+                              'pid': pid_int})
+
+    print('\nIdentifiers: ' + str(n) + ' observations of '
+          + str(n_persons) + ' individuals, ' + str(n_fam) + ' families')
+    print('ID1968, pernum and pid: %.1f MB as floats, %.1f MB as integers'
+          % ((ID1968.nbytes + pernum.nbytes + pid_float.nbytes)/2.**20,
+             (ID1968_int.nbytes + pernum_int.nbytes + pid_int.nbytes)/2.**20))
+    base = best_of(lambda: ID1968*1000 + pernum, repeat)
+    report('pid, float', base)
+    report('pid, integer',
+           best_of(lambda: identifiers.pid_of(ID1968_int, pernum_int),
+                   repeat), base)
+    base = best_of(lambda: panel_float[['year', 'pid']].groupby(['pid'])
+                   .transform('count'), repeat)
+    report('years present, float groupby', base)
+    report('years present, integer groupby',
+           best_of(lambda: panel_int[['year', 'pid']].groupby(['pid'])
+                   .transform('count'), repeat), base)
+    report('years present, identifiers.count_by',
+           best_of(lambda: identifiers.count_by(pid_int), repeat), base)
+    base = best_of(lambda: pd.merge(fam, ind, on='interview'), repeat)
+    report('merge, float pd.merge', base)
+    report('merge, integer pd.merge',
+           best_of(lambda: pd.merge(fam_int, ind_int, on='interview'),
+                   repeat), base)
+    report('merge, float join.interview_join',
+           best_of(lambda: join.interview_join(fam, ind), repeat), base)
+    report('merge, integer join.interview_join',
+           best_of(lambda: join.interview_join(fam_int, ind_int), repeat),
+           base)
+
+
+#Import time budgets in milliseconds, and modules that must not be imported
+IMPORT_BUDGETS = {'psid_py': 20, 'psid_py.psid_py': 50}
+LAZY_MODULES = ['requests', 'bs4', 'psid_py.read_sas', 'psid_py.download']
+
+
+def import_times(module):
+    """
+    Import module in a fresh interpreter with python -X importtime.  Returns
+    a dictionary mapping each imported module to its (self, cumulative)
+    import time in milliseconds.
+
+    Parameters
+    ----------
+    module      :   string; the module to import
+
+    """
+    out = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+                            'import ' + module], stderr=subprocess.PIPE,
+                           universal_newlines=True).communicate()[1]
+    times = {}
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own)/1000., int(cumulative)/1000.)
+    return times
+
+
+def bench_import(budgets=IMPORT_BUDGETS, lazy=LAZY_MODULES):
+    """
+    Check the import time of the package against a budget.  The budget of
+    each module counts the package's own modules only, not third party
+    libraries such as pandas.  Returns True if every budget is met and no
+    lazy module was imported.
+
+    Parameters
+    ----------
+    budgets     :   dict; module name to budget in milliseconds
+    lazy        :   list; modules that importing the package must not load
+
+    """
+    print('\nImport time')
+    ok = True
+    for module in sorted(budgets):
+        times = import_times(module)
+        own = sum(t[0] for name, t in times.items()
+                  if name.split('.')[0] == 'psid_py')
+        passed = own <= budgets[module]
+        print('%-40s %10.1f ms  budget %5.1f ms  %s'
+              % ('import ' + module, own, budgets[module],
+                 'ok' if passed else 'OVER BUDGET'))
+        loaded = [name for name in lazy if name in times]
+        if loaded:
+            print('    eagerly imported: ' + ', '.join(loaded))
+            passed = False
+        ok = ok and passed
+    return ok
+
+
+def bench_joins():
+    """Run the join benchmark with few and with many family variables."""
+    bench_join()
+    bench_join(fam_cols=300)
+
+
+BENCHMARKS = {'join': bench_joins,
+              'import': bench_import,
+              'zip': bench_zip,
+              'decode': bench_decode,
+              'dictionary': bench_dictionary,
+              'download': bench_download,
+              'builds': bench_builds,
+              'ids': bench_ids}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or sorted(BENCHMARKS)
+    results = [BENCHMARKS[name]() for name in names]
+    sys.exit(1 if any(result is False for result in results) else 0)
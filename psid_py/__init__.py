@@ -0,0 +1,20 @@
+"""
+A package to build PSID panel data sets.
+
+The functions of the psid_py module are available from the package, e.g.
+psid_py.build_panel.  Nothing is imported until one of them is first used,
+so that importing the package stays cheap.
+
+"""
+import importlib
+
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    module = importlib.import_module(__name__ + '.psid_py')
+    try:
+        return getattr(module, name)
+    except AttributeError:
+        raise AttributeError("module '" + __name__ + "' has no attribute '"
+                             + name + "'")
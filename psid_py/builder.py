@@ -0,0 +1,193 @@
+"""
+Origin: A module to run PSID builds concurrently in a long running service
+Filename: builder.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains a builder object running build_panel from many threads
+at once, e.g. behind a web service:
+
+    builder = PanelBuilder('/data/psid/', cache_dir='/data/panels/',
+                           workers=8)
+    future = builder.submit(fam_vars, ind_vars=ind_vars, design=3)
+    panel = future.result()
+    builder.close()
+
+Each build is independent of the others and of the caller:
+
+    inputs      =>  fam_vars and ind_vars are copied, never modified
+    output      =>  what a build prints, including its downloads and
+                    conversions, goes to a log of its own passed to
+                    build_panel, see Build.log, and errors are raised as a
+                    BuildError instead of printed.  sys.stdout is never
+                    touched.
+    scratch     =>  SAScii downloads go to a directory of their own, removed
+                    after the build
+    prompts     =>  credentials are given to the builder, a build never
+                    waits for input
+
+Builds share the data files read by earlier builds (see read_data), the
+presence index and catalog of the data directory and the result cache, all
+of which are safe to use from several threads.
+
+"""
+import copy
+import io
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BuildError(Exception):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+class Build(object):
+    """
+    The result of a build: the panel, the printed output and the seconds it
+    took.
+    """
+    def __init__(self, panel, log, seconds):
+        self.panel = panel
+        self.log = log
+        self.seconds = seconds
+
+    def __repr__(self):
+        return ('Build(' + type(self.panel).__name__ + ', %.2f s)'
+                % self.seconds)
+
+
+class PanelBuilder(object):
+    """
+    A re-entrant builder of PSID panels, safe to call from several threads,
+    with a pool of threads running submitted builds.
+
+    Parameters
+    ----------
+    datadir     :   string; the directory of the data files, shared by all
+                    builds.  None to build from SAScii downloads only.
+    out_type    :   string; the format of SAScii downloads, see build_panel()
+    cache_dir   :   string; the directory of saved panels, see cache
+    cache_bytes :   integer; the size limit of cache_dir
+    username    :   string; PSID username for SAScii downloads
+    password    :   string; PSID password for SAScii downloads
+    processes   :   integer; the processes converting SAScii downloads
+    scratch_dir :   string; where the scratch directories of SAScii builds
+                    are made, the system temporary directory if None
+    workers     :   integer; the threads of the pool running submit()
+    frames      :   dict; loaded data files shared by the builds, see
+                    read_data().  A new dictionary if None.
+
+    """
+    def __init__(self, datadir=None, out_type='csv', cache_dir=None,
+                 cache_bytes=None, username=None, password=None,
+                 processes=None, scratch_dir=None, workers=4, frames=None):
+        self.datadir = datadir
+        self.out_type = out_type
+        self.cache_dir = cache_dir
+        self.cache_bytes = cache_bytes
+        self.username = username
+        self.password = password
+        self.processes = processes
+        self.scratch_dir = scratch_dir
+        self.workers = workers
+        self.frames = {} if frames is None else frames
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def run(self, fam_vars, ind_vars=None, design="balanced",
+            heads_only=None, sample=None, SAScii=None, normalized=False,
+            labels=None, dataset=None, buckets=None, verbose=False):
+        """
+        A function to build a panel in the calling thread.  Returns a Build
+        with the panel and its printed output.  Raises a BuildError if the
+        build fails.  Arguments are as in build_panel().
+        """
+        from .psid_py import build_panel
+
+        fam_vars = copy.deepcopy(fam_vars)
+        ind_vars = copy.deepcopy(ind_vars)
+        if SAScii and (self.username is None or self.password is None):
+            raise BuildError('SAScii builds need the PSID username and'
+                             ' password of the builder.')
+        if not SAScii and self.datadir is None:
+            raise BuildError('The builder has no datadir, only SAScii builds'
+                             ' are possible.')
+
+        scratch = None
+        if SAScii:
+            scratch = tempfile.mkdtemp(dir=self.scratch_dir)
+        log = io.StringIO()
+        start = time.time()
+        try:
+            panel = build_panel(
+                fam_vars, design=design,
+                datadir=scratch if SAScii else self.datadir,
+                ind_vars=ind_vars, SAScii=SAScii, heads_only=heads_only,
+                sample=sample, verbose=verbose, username=self.username,
+                password=self.password, processes=self.processes,
+                out_type=self.out_type, frames=self.frames,
+                cache_dir=None if SAScii else self.cache_dir,
+                cache_bytes=self.cache_bytes, normalized=normalized,
+                dataset=dataset, buckets=buckets, labels=labels, log=log)
+        finally:
+            if scratch is not None:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+        if panel is None:
+            errors = [line for line in log.getvalue().splitlines()
+                      if line.startswith('ERROR')]
+            raise BuildError(' '.join(errors) or 'The build failed.')
+        return Build(panel, log.getvalue(), time.time() - start)
+
+    def build(self, fam_vars, **options):
+        """
+        Build a panel in the calling thread and return it, see run().
+        """
+        return self.run(fam_vars, **options).panel
+
+    def submit(self, fam_vars, **options):
+        """
+        A function to run a build in the thread pool.  Returns a
+        concurrent.futures.Future of its Build.  Options are those of run().
+        """
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(self.workers)
+            pool = self.pool
+        return pool.submit(self.run, fam_vars, **options)
+
+    def map(self, requests):
+        """
+        A function to run many builds in the thread pool.  Returns their
+        Builds in the order of the requests, raising the error of the first
+        failed build.
+
+        Parameters
+        ----------
+        requests    :   list; dictionaries of run() arguments, each holding
+                        fam_vars
+
+        """
+        futures = [self.submit(**request) for request in requests]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Wait for the submitted builds and stop the thread pool."""
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
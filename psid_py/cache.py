@@ -0,0 +1,230 @@
+"""
+Origin: A module to cache built PSID panels
+Filename: cache.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains a content addressed cache of build_panel results.  A
+build is identified by a hash of its arguments, of the contents of its
+input files and of the PSID metadata file in use, see metadata, so that the
+same build on the same data returns the saved panel, whoever ran it first
+and wherever the data are.  Panels are stored as
+parquet files in a shared directory, or as pickles if pyarrow is missing or
+a column mixes numbers and strings:
+
+    cache_dir/
+        fingerprints/       =>  the content hash of each input file, with
+                                its size and modification time, so that
+                                each file is only hashed once
+        <key>.parquet       =>  one finished panel per build
+
+Files are written under a temporary name and renamed into place, so several
+processes can share a directory without seeing half written files.  When the
+directory grows over its size limit the least recently used panels are
+deleted.
+
+"""
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+
+#Bump when the panels built from the same arguments change
+CACHE_VERSION = 3
+
+#Default size limit of a cache directory
+MAX_BYTES = 2**32
+
+FINGERPRINTS = 'fingerprints'
+
+
+def atomic_write(target, write):
+    """
+    Write a file under a temporary name with write(tmp) and rename it to
+    target, so that readers only ever see complete files.
+    """
+    tmp = (target + '.' + str(os.getpid()) + '.'
+           + str(threading.get_ident()) + '.tmp')
+    try:
+        write(tmp)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def file_digest(file, block=2**20):
+    """Return the sha256 hex digest of the contents of a file."""
+    h = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprints(files, cache_dir):
+    """
+    A function to find the content hash of every input file.  Hashes are
+    remembered in the cache directory by path, size and modification time,
+    so only new or modified files are read.  Each file has a memo of its
+    own, so processes hashing different files never overwrite each other's
+    hashes.  Returns a list of (file name, hash) sorted by file name.
+
+    Parameters
+    ----------
+    files       :   list; paths of the input files
+    cache_dir   :   string; the cache directory
+
+    """
+    memo_dir = os.path.join(cache_dir, FINGERPRINTS)
+    os.makedirs(memo_dir, exist_ok=True)
+
+    found = []
+    for file in files:
+        stat = os.stat(file)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        path = os.path.abspath(file)
+        memo_file = os.path.join(memo_dir, hashlib.sha256(
+            path.encode('utf-8')).hexdigest() + '.json')
+        try:
+            with open(memo_file) as f:
+                memo = json.load(f)
+        except (IOError, ValueError):
+            memo = None
+        if memo is None or memo['path'] != path or memo['stamp'] != stamp:
+            memo = {'path': path, 'stamp': stamp,
+                    'digest': file_digest(file)}
+
+            def write(tmp):
+                with open(tmp, 'w') as f:
+                    json.dump(memo, f)
+            atomic_write(memo_file, write)
+        found.append((os.path.basename(file), memo['digest']))
+    return sorted(found)
+
+
+def build_key(arguments, files, cache_dir):
+    """
+    A function to compute the cache key of a build, covering the metadata
+    file in use.  Returns a hex string.
+
+    Parameters
+    ----------
+    arguments   :   dict; the build_panel arguments defining the result
+    files       :   list; paths of the input files
+    cache_dir   :   string; the cache directory
+
+    """
+    from . import metadata
+
+    os.makedirs(cache_dir, exist_ok=True)
+    canonical = json.dumps({'version': CACHE_VERSION,
+                            'metadata': metadata.digest(),
+                            'arguments': arguments,
+                            'files': fingerprints(files, cache_dir)},
+                           sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def entry_path(cache_dir, key):
+    """Return the path of the saved panel of a key, or None."""
+    for ext in ('.parquet', '.pkl'):
+        if os.path.isfile(os.path.join(cache_dir, key + ext)):
+            return os.path.join(cache_dir, key + ext)
+    return None
+
+
+def load(cache_dir, key):
+    """
+    A function to load a cached panel.  Returns None on a miss.
+
+    Parameters
+    ----------
+    cache_dir   :   string; the cache directory
+    key         :   string; the output of build_key
+
+    """
+    entry = entry_path(cache_dir, key)
+    if entry is None:
+        return None
+    try:
+        if entry.endswith('.parquet'):
+            panel = pd.read_parquet(entry)
+        else:
+            panel = pd.read_pickle(entry)
+    except (IOError, OSError):
+        #Evicted by another process while reading
+        return None
+
+    #Mark the entry as recently used
+    try:
+        os.utime(entry, None)
+    except OSError:
+        pass
+    return panel
+
+
+def store(cache_dir, key, panel, max_bytes=MAX_BYTES):
+    """
+    A function to save a built panel and evict the least recently used
+    panels if the cache grows over max_bytes.  Returns the path written.
+
+    Parameters
+    ----------
+    cache_dir   :   string; the cache directory
+    key         :   string; the output of build_key
+    panel       :   dataframe; the built panel
+    max_bytes   :   integer; the size limit of the cache directory
+
+    """
+    #Columns mixing numbers with the 'NA' of variables missing in a year
+    #cannot be stored in parquet, such panels are pickled, as are
+    #normalized panels
+    try:
+        entry = os.path.join(cache_dir, key + '.parquet')
+        atomic_write(entry, lambda tmp: panel.to_parquet(tmp))
+    except (ImportError, ValueError, TypeError, AttributeError):
+        entry = os.path.join(cache_dir, key + '.pkl')
+        atomic_write(entry, lambda tmp: pd.to_pickle(panel, tmp))
+    evict(cache_dir, max_bytes, keep=entry)
+    return entry
+
+
+def evict(cache_dir, max_bytes=MAX_BYTES, keep=None):
+    """
+    A function to delete the least recently used panels until the cache
+    directory holds at most max_bytes.
+
+    Parameters
+    ----------
+    cache_dir   :   string; the cache directory
+    max_bytes   :   integer; the size limit of the cache directory
+    keep        :   string; a path never to delete, e.g. the newest entry
+
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(('.parquet', '.pkl')):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size,
+                        os.path.join(cache_dir, name)))
+
+    total = sum(x[1] for x in entries)
+    for mtime, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        if entry == keep:
+            continue
+        try:
+            os.remove(entry)
+        except OSError:
+            #Already removed by another process
+            pass
+        total -= size
@@ -0,0 +1,274 @@
+"""
+Origin: A module to catalog the PSID data files of a directory
+Filename: catalog.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains functions to scan a data directory once and describe
+every PSID data file in it: its kind (family or individual), year, file
+type, size and column names, the columns being read from the file header
+only.  The catalog is saved in the directory as psid_catalog.json and
+refreshed from file sizes and modification times, so builds resolve their
+input files with dictionary lookups, check that every requested variable
+exists and fail before loading anything when a file or a variable is
+missing.  The saved columns also let builds read only the columns they
+need.
+
+"""
+import json
+import os
+import re
+
+import pandas as pd
+
+from . import cache
+
+
+CATALOG = 'psid_catalog.json'
+CATALOG_VERSION = 1
+
+#File types by extension, in order of preference when a directory holds
+#several types of the same files
+FILE_TYPES = [('.npy', 'npy'), ('.parquet', 'parquet'), ('.dta', 'stata'),
+              ('.csv', 'csv'), ('.rda', 'Rdata'), ('.RData', 'Rdata'),
+              ('.hdf', 'HDF5')]
+
+#PSID file names, e.g. FAM2001ER.csv or IND2011ER.parquet
+NAME = re.compile(r'(fam|ind)[^0-9]*(\d{4})', re.IGNORECASE)
+
+
+class CatalogError(Exception):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+class VariableError(Exception):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+def file_type(name):
+    """Return the type of a data file from its extension, or None."""
+    if name.startswith('psid_') or name.endswith('.char.npy'):
+        return None
+    for ext, ftype in FILE_TYPES:
+        if name.endswith(ext):
+            return ftype
+    return None
+
+
+def header_columns(file, ftype):
+    """
+    A function to read the column names of a data file from its header
+    only.  Returns None for types that cannot be probed.
+
+    Parameters
+    ----------
+    file        :   string; path of the data file
+    ftype       :   string; the file type, see FILE_TYPES
+
+    """
+    if ftype in ('csv', 'parquet', 'npy'):
+        from . import storage
+        return storage.frame_columns(file)
+    if ftype == 'stata':
+        with pd.read_stata(file, iterator=True) as reader:
+            return list(reader.variable_labels())
+    return None
+
+
+def describe(datadir, name, stat):
+    """Return the catalog entry of a data file, or None if it is not one."""
+    ftype = file_type(name)
+    found = NAME.search(name)
+    if ftype is None or found is None:
+        return None
+    return {'name': name, 'kind': found.group(1).lower(),
+            'year': int(found.group(2)), 'ftype': ftype,
+            'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+            'columns': header_columns(os.path.join(datadir, name), ftype)}
+
+
+def load_catalog(datadir, save=True):
+    """
+    A function to catalog the data files of a directory.  Entries of the
+    saved catalog are kept for files whose size and modification time did
+    not change, so only new or modified files have their header read.
+    Returns a dataframe indexed by file name with columns kind, year, ftype,
+    size, mtime and columns.
+
+    Parameters
+    ----------
+    datadir     :   string; the data directory
+    save        :   bool; save the refreshed catalog in the directory
+
+    """
+    saved = {}
+    catalog_file = os.path.join(datadir, CATALOG)
+    try:
+        with open(catalog_file) as f:
+            found = json.load(f)
+        if found.get('version') == CATALOG_VERSION:
+            saved = dict((x['name'], x) for x in found['files'])
+    except (IOError, ValueError, KeyError):
+        pass
+
+    entries = []
+    changed = False
+    for name in sorted(os.listdir(datadir)):
+        if file_type(name) is None:
+            continue
+        stat = os.stat(os.path.join(datadir, name))
+        entry = saved.pop(name, None)
+        if entry is None or entry['size'] != stat.st_size\
+                or entry['mtime'] != stat.st_mtime_ns:
+            entry = describe(datadir, name, stat)
+            changed = True
+        if entry is not None:
+            entries.append(entry)
+    changed = changed or bool(saved)
+
+    if save and changed:
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump({'version': CATALOG_VERSION, 'files': entries}, f)
+        try:
+            cache.atomic_write(catalog_file, write)
+        except (IOError, OSError):
+            #A read only data directory is scanned on every build
+            pass
+
+    columns = ['kind', 'year', 'ftype', 'size', 'mtime', 'columns']
+    if not entries:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(entries).set_index('name')[columns]
+
+
+def resolve(catalog, datadir, years, ftype=None, log=None):
+    """
+    A function to find the input files of a build.  Returns the file type,
+    a dictionary mapping each year to its family file and the individual
+    file.  Raises a CatalogError if a file is missing.
+
+    When the directory holds several individual files the latest release is
+    used.  When it holds several file types the first type of FILE_TYPES
+    holding every file is used.
+
+    Parameters
+    ----------
+    catalog     :   dataframe; the output of load_catalog
+    datadir     :   string; the data directory
+    years       :   list; years desired
+    ftype       :   string; the file type, chosen from the catalog if None
+    log         :   file; where warnings are printed, stdout if None
+
+    """
+    if ftype is None:
+        types = [t for ext, t in FILE_TYPES if t in set(catalog['ftype'])]
+    else:
+        types = [ftype]
+
+    missing = None
+    for t in types:
+        files = catalog[catalog['ftype'] == t]
+        fam = files[files['kind'] == 'fam']
+        fam = dict((int(y), os.path.join(datadir, name))
+                   for name, y in zip(fam.index, fam['year']))
+        ind = files[files['kind'] == 'ind'].sort_values('year')
+        lacking = [y for y in years if y not in fam]
+        if not lacking and ind.shape[0]:
+            if ind.shape[0] > 1:
+                print('WARNING: You have too many individual files.'
+                      'I will take only the latest one: ' + ind.index[-1],
+                      file=log)
+            return t, fam, os.path.join(datadir, ind.index[-1])
+        if missing is None:
+            missing = (t, lacking, ind.shape[0] == 0)
+
+    if missing is None:
+        raise CatalogError('No PSID data files in ' + str(datadir) + '.')
+    t, lacking, no_ind = missing
+    message = 'The ' + t + ' files of ' + str(datadir) + ' lack'
+    if lacking:
+        message += ' the family files of ' + ', '.join(map(str, lacking))
+    if no_ind:
+        message += (' and' if lacking else '') + ' an individual file'
+    raise CatalogError(message + '.')
+
+
+def ind_columns(ind_vars, ids, years):
+    """
+    A function to list the individual file columns a build reads: the
+    identifiers, the id variables of every wave (see presence) and the
+    requested individual variables.
+
+    Parameters
+    ----------
+    ind_vars    :   dataframe; desired individual variables, indexed by year
+    ids         :   dataframe; the PSID id variables, see makeids()
+    years       :   list; years desired
+
+    """
+    wanted = ['ER30001', 'ER30002']
+    for col in ['ind_interview', 'ind_seq', 'ind_head']:
+        wanted += list(ids[col])
+    for year in years:
+        wanted += list(ind_vars.loc[year].drop('year'))
+    seen = set()
+    return [x for x in wanted if x != 'NA' and not (x in seen or seen.add(x))]
+
+
+def check_variables(catalog, fam_files, ind_file, fam_vars, ind_vars, ids):
+    """
+    A function to check that every requested variable exists in the file of
+    its year, from the columns saved in the catalog.  Raises a VariableError
+    listing every missing variable.  Files of types whose columns are not
+    known are not checked.
+
+    Parameters
+    ----------
+    catalog     :   dataframe; the output of load_catalog
+    fam_files   :   dict; family file of each year, see resolve()
+    ind_file    :   string; the individual file, see resolve()
+    fam_vars    :   dataframe; desired family variables, indexed by year
+    ind_vars    :   dataframe; desired individual variables, indexed by year
+    ids         :   dataframe; the PSID id variables, see makeids()
+
+    """
+    problems = []
+    for year in fam_vars.index:
+        name = os.path.basename(fam_files[year])
+        columns = catalog.loc[name, 'columns']
+        if columns is None:
+            continue
+        #Family variables are matched without case, see year_panel()
+        have = set(str(x).lower() for x in columns)
+        lacking = [x for x in fam_vars.loc[year].drop('year')
+                   if x != 'NA' and str(x).lower() not in have]
+        if lacking:
+            problems.append(name + ' (' + str(year) + ') lacks '
+                            + ', '.join(lacking))
+
+    name = os.path.basename(ind_file)
+    columns = catalog.loc[name, 'columns']
+    if columns is not None:
+        have = set(columns)
+        for year in ind_vars.index:
+            current = ids.loc[year]
+            wanted = ['ER30001', 'ER30002', current.ind_interview,
+                      current.ind_seq, current.ind_head]\
+                + list(ind_vars.loc[year].drop('year'))
+            lacking = [x for x in wanted if x != 'NA' and x not in have]
+            if lacking:
+                problems.append(name + ' (' + str(year) + ') lacks '
+                                + ', '.join(lacking))
+
+    if problems:
+        raise VariableError('Requested variables are missing: '
+                            + '; '.join(problems) + '.')
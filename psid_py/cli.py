@@ -0,0 +1,403 @@
+"""
+Origin: A command line interface to the psid_py package
+Filename: cli.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains the psid-py command.  It has five subcommands:
+
+    build           =>  build a panel from a json specification of
+                        build_panel arguments and save it.
+    convert         =>  convert a .txt/.sas pair to csv, parquet or npy.
+    convert-release =>  convert a directory of .txt/.sas pairs or zip
+                        archives in parallel.
+    download        =>  download and convert the PSID files for a set of
+                        years.
+    serve           =>  keep loaded data files in memory and build panels
+                        for specifications sent over a unix socket only
+                        its owner can use.
+
+A specification is a json object of build_panel keyword arguments, e.g.
+
+    {"fam_vars": {"year": [2001, 2003],
+                  "house_value": ["ER17044", "ER21043"]},
+     "design": "balanced", "heads_only": true}
+
+The build server accepts only the keys of SERVER_KEYS, reads the data of
+its own data directory and writes panels inside its output directory.
+
+"""
+import argparse
+import getpass
+import json
+import os
+import socket
+import stat
+import sys
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+#The socket of the build server, in a directory only its owner can open
+DEFAULT_SOCKET = os.path.join(os.path.expanduser('~'), '.psid_py',
+                              'serve.sock')
+
+#The specification keys a build server accepts
+SERVER_KEYS = ['fam_vars', 'ind_vars', 'design', 'heads_only', 'sample',
+               'labels', 'verbose']
+
+#build_panel options whose results are not a single panel to save
+UNSAVED_KEYS = ['normalized', 'dataset', 'buckets']
+
+OUTPUT_TYPES = ('.csv', '.parquet', '.pkl')
+
+
+def read_spec(spec_file):
+    """
+    A function to read a build specification from a json file, '-' meaning
+    standard input.
+
+    Parameters
+    ----------
+    spec_file   :   string; path of the json file
+
+    """
+    if spec_file == '-':
+        return json.load(sys.stdin)
+    with open(spec_file) as f:
+        return json.load(f)
+
+
+def write_panel(panel, output):
+    """
+    A function to save a built panel, the format chosen by the extension of
+    output: .csv, .parquet or .pkl.
+
+    Parameters
+    ----------
+    panel       :   dataframe; the built panel
+    output      :   string; the output path
+
+    """
+    if output.endswith('.parquet'):
+        from . import dataset
+
+        #Variables missing in a year hold the string 'NA', which a typed
+        #column cannot store
+        dataset.coerce_na(panel).to_parquet(output)
+    elif output.endswith('.pkl'):
+        panel.to_pickle(output)
+    else:
+        panel.to_csv(output, index=False)
+
+
+def run_build(spec, output, frames=None):
+    """
+    A function to build and save the panel of a specification.  Returns a
+    dictionary describing the result.
+
+    Parameters
+    ----------
+    spec        :   dict; build_panel keyword arguments
+    output      :   string; the output path
+    frames      :   dict; loaded data files to reuse, see build_panel()
+
+    """
+    from . import psid_py
+
+    start = time.time()
+    spec = dict(spec)
+    unsaved = [x for x in UNSAVED_KEYS if spec.get(x)]
+    if unsaved:
+        return {'status': 'error', 'message': 'psid-py build saves a single'
+                ' panel, remove ' + ', '.join(unsaved) + ' from the'
+                ' specification'}
+    if not output.endswith(OUTPUT_TYPES):
+        return {'status': 'error', 'message': 'the output must be a '
+                + ', '.join(OUTPUT_TYPES) + ' file'}
+    fam_vars = spec.pop('fam_vars')
+    panel = psid_py.build_panel(fam_vars, frames=frames, **spec)
+    if panel is None:
+        return {'status': 'error', 'message': 'build_panel returned nothing'}
+    write_panel(panel, output)
+    return {'status': 'ok', 'output': output, 'rows': int(panel.shape[0]),
+            'seconds': round(time.time() - start, 3)}
+
+
+def server_output(output, output_dir):
+    """
+    Return the real path of a requested output inside output_dir, or None
+    if it points elsewhere, symbolic links included.
+    """
+    root = os.path.realpath(output_dir)
+    path = os.path.realpath(os.path.join(root, output))
+    if os.path.dirname(path) != root\
+            and not os.path.dirname(path).startswith(root + os.sep):
+        return None
+    return path
+
+
+class BuildHandler(socketserver.StreamRequestHandler):
+    """
+    Handle one request: a json line holding a specification and an
+    'output' path inside the server's output directory.  Replies with a
+    json line describing the result.
+    """
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            #A connection closed without a request, e.g. socket_dir()
+            #checking whether a server is running
+            return
+        try:
+            spec = json.loads(line.decode('utf-8'))
+            output = server_output(str(spec.pop('output', '')),
+                                   self.server.output_dir)
+            unknown = sorted(x for x in spec if x not in SERVER_KEYS)
+            if unknown:
+                result = {'status': 'error', 'message': 'the build server'
+                          ' does not accept ' + ', '.join(unknown)}
+            elif output is None:
+                result = {'status': 'error', 'message': 'the output must be'
+                          ' inside ' + self.server.output_dir}
+            else:
+                spec['datadir'] = self.server.datadir
+                result = run_build(spec, output, self.server.frames)
+        except Exception as e:
+            result = {'status': 'error', 'message': repr(e)}
+        self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+
+
+class BuildServer(socketserver.UnixStreamServer):
+    """
+    A build server holding the loaded data files between requests,
+    listening on a unix socket readable and writable by its owner only.
+    """
+    def __init__(self, socket_file, datadir, output_dir):
+        #The socket is created with mode 0600, there is no window in which
+        #other users could connect
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_file,
+                                                   BuildHandler)
+        finally:
+            os.umask(umask)
+        self.datadir = datadir
+        self.output_dir = os.path.realpath(output_dir)
+        self.frames = {}
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def socket_dir(socket_file):
+    """
+    Create the directory of a server socket, or restrict an existing one,
+    to be opened by its owner only, and remove a socket left behind by a
+    server that stopped.  Raises an IOError if the directory belongs to
+    another user or is not a directory.
+    """
+    directory = os.path.dirname(os.path.abspath(socket_file))
+    if not os.path.lexists(directory):
+        os.makedirs(directory, 0o700)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise IOError(directory + ' is not a directory.')
+    if info.st_uid != os.getuid():
+        raise IOError(directory + ' belongs to another user, choose a'
+                      ' socket in a directory of your own.')
+    os.chmod(directory, 0o700)
+    if os.path.exists(socket_file):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_file)
+        except (IOError, OSError):
+            os.remove(socket_file)
+        else:
+            raise IOError('A build server already listens on '
+                          + socket_file + '.')
+        finally:
+            probe.close()
+
+
+def serve(datadir, output_dir='.', socket_file=DEFAULT_SOCKET):
+    """
+    A function to run the build server.  Data files stay loaded between
+    requests, so repeated builds on the same release skip reading them.
+    Requests are handled one at a time.
+
+    Parameters
+    ----------
+    datadir     :   string; the data directory of every build
+    output_dir  :   string; the directory panels are written in
+    socket_file :   string; the path of the unix socket to listen on
+
+    """
+    socket_dir(socket_file)
+    server = BuildServer(socket_file, datadir, output_dir)
+    print('psid-py: serving builds from ' + str(datadir) + ' to '
+          + server.output_dir + ' on ' + socket_file)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def request_build(spec, output, socket_file=DEFAULT_SOCKET):
+    """
+    A function to send a specification to a running build server.  Returns
+    the server's reply.
+
+    Parameters
+    ----------
+    spec        :   dict; build_panel keyword arguments, see SERVER_KEYS
+    output      :   string; the output path, inside the server's output
+                    directory
+    socket_file :   string; the server socket
+
+    """
+    spec = dict(spec)
+    spec['output'] = os.path.abspath(output)
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_file)
+        conn.sendall((json.dumps(spec) + '\n').encode('utf-8'))
+        reply = conn.makefile('rb').readline()
+    finally:
+        conn.close()
+    return json.loads(reply.decode('utf-8'))
+
+
+def parser():
+    """Return the argument parser of the psid-py command."""
+    p = argparse.ArgumentParser(prog='psid-py',
+                                description='Build PSID panel data sets.')
+    sub = p.add_subparsers(dest='command')
+
+    b = sub.add_parser('build', help='build a panel from a json spec')
+    b.add_argument('spec', help="json file of build_panel arguments, "
+                   "'-' for standard input")
+    b.add_argument('-o', '--output', required=True,
+                   help='output file, .csv, .parquet or .pkl')
+    b.add_argument('-d', '--datadir', help='data directory, overrides spec')
+    b.add_argument('--server', action='store_true',
+                   help='send the build to a running psid-py serve')
+    b.add_argument('--socket', default=DEFAULT_SOCKET,
+                   help='the socket of the build server')
+
+    c = sub.add_parser('convert', help='convert a .txt/.sas pair')
+    c.add_argument('data_file', help='the ASCII .txt data file')
+    c.add_argument('dict_file', help='the .sas dictionary file')
+    c.add_argument('-o', '--output', required=True,
+                   help='output name, without extension')
+    c.add_argument('-f', '--format', default='parquet',
+                   choices=['csv', 'parquet', 'npy'])
+    c.add_argument('-m', '--missing', help='json file of missing value codes'
+                   ' by variable, read as nulls')
+
+    r = sub.add_parser('convert-release',
+                       help='convert a directory of sas data files')
+    r.add_argument('src_dir', help='directory of .txt/.sas pairs or zips')
+    r.add_argument('out_dir', help='directory to store the converted files')
+    r.add_argument('-f', '--format', default='parquet',
+                   choices=['csv', 'parquet', 'npy'])
+    r.add_argument('-j', '--processes', type=int, default=None,
+                   help='conversion processes, default the number of cores')
+    r.add_argument('-m', '--missing', help='json file of missing value codes'
+                   ' by variable, read as nulls')
+
+    d = sub.add_parser('download', help='download and convert PSID files',
+                       description='Download and convert PSID files.  The'
+                       ' password is read from $PSID_PASSWORD, or prompted'
+                       ' for.')
+    d.add_argument('datadir', help='directory to store the files')
+    d.add_argument('years', type=int, nargs='+', help='years to download')
+    d.add_argument('-u', '--username',
+                   default=os.environ.get('PSID_USERNAME'),
+                   help='PSID username, default $PSID_USERNAME')
+    d.add_argument('-f', '--format', default='parquet',
+                   choices=['csv', 'parquet', 'npy'])
+    d.add_argument('-j', '--concurrency', type=int, default=4,
+                   help='simultaneous downloads')
+
+    s = sub.add_parser('serve', help='keep data loaded and serve builds')
+    s.add_argument('datadir', help='data directory of every build')
+    s.add_argument('-o', '--output-dir', default='.',
+                   help='directory panels are written in, default the'
+                   ' current directory')
+    s.add_argument('--socket', default=DEFAULT_SOCKET,
+                   help='the unix socket to listen on')
+    return p
+
+
+def main(argv=None):
+    """The psid-py console entry point."""
+    args = parser().parse_args(argv)
+
+    if args.command == 'build':
+        spec = read_spec(args.spec)
+        if args.server and args.datadir is not None:
+            print('psid-py: the build server reads its own data directory.')
+            return 1
+        if args.datadir is not None:
+            spec['datadir'] = args.datadir
+        if args.server:
+            result = request_build(spec, args.output, args.socket)
+        else:
+            result = run_build(spec, args.output)
+        print(json.dumps(result))
+        return 0 if result['status'] == 'ok' else 1
+
+    elif args.command == 'convert':
+        from . import read_sas
+        from . import storage
+
+        x = read_sas.read_sas(args.data_file, args.dict_file,
+                              missing=args.missing)
+        layout = read_sas.parse_sas(args.dict_file, 1)
+        print(storage.write_frame(x, args.output, args.format, layout,
+                                  read_sas.value_labels(args.dict_file)))
+        return 0
+
+    elif args.command == 'convert-release':
+        from . import convert
+
+        convert.convert_release(args.src_dir, args.out_dir, args.format,
+                                args.processes, missing=args.missing)
+        return 0
+
+    elif args.command == 'download':
+        from . import psid_py
+
+        #Never from the command line, where other users can read it
+        password = os.environ.get('PSID_PASSWORD')
+        if password is None:
+            password = getpass.getpass('PSID password: ')
+        datadir = os.path.join(args.datadir, '')
+        psid_py.acquire_ascii_data(args.years, datadir, args.username,
+                                   password, args.concurrency,
+                                   out_type=args.format)
+        return 0
+
+    elif args.command == 'serve':
+        try:
+            serve(args.datadir, args.output_dir, args.socket)
+        except (IOError, OSError) as e:
+            print('psid-py: ' + str(e))
+            return 1
+        return 0
+
+    parser().print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Origin: A module to convert a whole PSID release on disk
+Filename: convert.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains functions to convert a directory of sas data files, as
+.txt/.sas pairs or as zip archives, across a pool of processes.  Every
+record of a fixed width file has the same length, so large files are split
+into byte ranges of whole records and the ranges are read in parallel, then
+put back together in order and saved with storage.write_frame.
+
+"""
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import read_sas
+from . import storage
+
+
+#Size of the byte ranges large files are split into
+CHUNK_BYTES = 2**26
+
+
+def release_files(src_dir):
+    """
+    A function to list the sas data files of a release directory.  Returns a
+    list of (name, data file, dictionary file, zipped) tuples, where name is
+    the file name without extension.  A zip archive is paired with the .sas
+    file of the same name if there is one, otherwise the archive must hold
+    its own dictionary.
+
+    Parameters
+    ----------
+    src_dir     :   string; the directory holding the release
+
+    """
+    entries = sorted(os.listdir(src_dir))
+    stems = dict((os.path.splitext(x)[0].upper(), os.path.join(src_dir, x))
+                 for x in entries if x.lower().endswith('.sas'))
+    found = []
+    for x in entries:
+        stem, ext = os.path.splitext(x)
+        ext = ext.lower()
+        if ext == '.txt' and stem.upper() in stems:
+            found.append((stem, os.path.join(src_dir, x),
+                          stems[stem.upper()], False))
+        elif ext == '.zip':
+            found.append((stem, os.path.join(src_dir, x),
+                          stems.get(stem.upper()), True))
+    return found
+
+
+def read_range(data_file, specs, offset, nrows, missing=None):
+    """
+    Read a range of records, see read_sas.read_records.  Returns the frame
+    and the seconds spent reading it.
+    """
+    start = time.time()
+    x = read_sas.read_records(data_file, specs, offset, nrows,
+                              missing=missing)
+    return x, time.time() - start
+
+
+def convert_archive(zip_file, dict_file, name, out_type, missing=None):
+    """
+    Convert a zip archive.  Returns the path written, the number of rows
+    and the seconds spent.
+    """
+    from . import psid_py
+
+    start = time.time()
+    if dict_file is None:
+        out = psid_py.convert_zip(zip_file, name, out_type, missing)
+        rows = len(storage.read_frame(out, storage.frame_columns(out)[:1]))
+    else:
+        x = read_sas.read_sas(zip_file, dict_file, zipped=True,
+                              missing=missing)
+        layout = None if out_type == 'csv' else \
+            read_sas.parse_sas(dict_file, 1)
+        value_labels = None if out_type == 'csv' else \
+            read_sas.value_labels(dict_file)
+        out = storage.write_frame(x, name, out_type, layout, value_labels)
+        rows = x.shape[0]
+    return out, rows, time.time() - start
+
+
+def convert_release(src_dir, out_dir, out_type='csv', processes=None,
+                    chunk_bytes=CHUNK_BYTES, verbose=True, missing=None):
+    """
+    A function to convert every sas data file of a release directory in
+    parallel.  Returns a dataframe with the rows, size, conversion time and
+    throughput of each file.  Times are the seconds spent reading a file,
+    summed over the processes that worked on it, so the rates are per core.
+    Zip archives whose data are stored uncompressed are split into byte
+    ranges like plain files.
+
+    Parameters
+    ----------
+    src_dir     :   string; the directory holding the .txt/.sas pairs or zip
+                    archives
+    out_dir     :   string; the directory to store output
+    out_type    :   string; one of 'csv', 'parquet' or 'npy'.  See storage.
+    processes   :   integer; the number of processes.  Defaults to the
+                    number of cores.
+    chunk_bytes :   integer; the approximate size of the byte ranges large
+                    files are split into
+    verbose     :   bool; print the throughput of each file
+    missing     :   dict or string; per variable missing value codes, see
+                    read_sas.missing_codes()
+
+    """
+    missing = read_sas.missing_codes(missing)
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    start = time.time()
+
+    stats = []
+    with ProcessPoolExecutor(processes) as pool:
+        #Submit every range of every file before waiting on any of them
+        jobs = []
+        for name, data_file, dict_file, zipped in release_files(src_dir):
+            out_name = os.path.join(out_dir, name)
+            size = os.path.getsize(data_file)
+            base = 0
+            if zipped:
+                #Stored members are split like plain files, compressed ones
+                #are streamed whole by a single process
+                with zipfile.ZipFile(data_file) as z:
+                    member = read_sas.zip_member(z)
+                    size = z.getinfo(member).file_size
+                    with z.open(member) as stream:
+                        reclen = len(stream.readline())
+                if dict_file is not None:
+                    base = read_sas.member_offset(data_file, member)
+                if dict_file is None or base is None:
+                    jobs.append((name, size, None, None, None,
+                                 pool.submit(convert_archive, data_file,
+                                             dict_file, out_name, out_type,
+                                             missing)))
+                    continue
+            else:
+                reclen = read_sas.record_length(data_file)
+            layout = read_sas.parse_sas(dict_file, 1)
+            specs = read_sas.column_specs(layout)
+            ranges = read_sas.record_ranges(size, reclen, chunk_bytes)
+            jobs.append((name, size, out_name, layout,
+                         read_sas.value_labels(dict_file),
+                         [pool.submit(read_range, data_file, specs,
+                                      base + offset, nrows, missing)
+                          for offset, nrows in ranges]))
+
+        for name, size, out_name, layout, value_labels, futures in jobs:
+            if out_name is None:
+                out, rows, seconds = futures.result()
+            else:
+                pieces = [f.result() for f in futures]
+                seconds = sum(p[1] for p in pieces)
+                x = pd.concat([p[0] for p in pieces], ignore_index=True)\
+                    if len(pieces) != 1 else pieces[0][0]
+                written = time.time()
+                out = storage.write_frame(
+                    x, out_name, out_type,
+                    None if out_type == 'csv' else layout, value_labels)
+                seconds += time.time() - written
+                rows = x.shape[0]
+            stats.append({'file': name, 'output': out, 'rows': rows,
+                          'bytes': size, 'seconds': seconds,
+                          'MB/s': size/2.**20/max(seconds, 1e-9),
+                          'rows/s': rows/max(seconds, 1e-9)})
+            if verbose:
+                print('%-16s %10d rows %9.1f MB %8.1f MB/s %10.0f rows/s'
+                      % (name, rows, size/2.**20, stats[-1]['MB/s'],
+                         stats[-1]['rows/s']))
+
+    stats = pd.DataFrame(stats, columns=['file', 'output', 'rows', 'bytes',
+                                         'seconds', 'MB/s', 'rows/s'])
+    if verbose:
+        wall = time.time() - start
+        print('Converted ' + str(stats.shape[0]) + ' files, %.1f MB in %.1f'
+              ' s (%.1f MB/s)' % (stats['bytes'].sum()/2.**20, wall,
+                                  stats['bytes'].sum()/2.**20/max(wall,
+                                                                  1e-9)))
+    return stats
@@ -0,0 +1,271 @@
+"""
+Origin: A module to write built PSID panels as partitioned datasets
+Filename: dataset.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains a writer saving a panel as a directory of parquet
+files while build_panel produces its years, so the whole panel is never
+held in memory or serialized at once.  Files are partitioned by year and,
+optionally, by buckets of pid:
+
+    out_dir/
+        year=2001/
+            part-0.parquet              =>  without buckets
+        year=2003/
+            bucket=0/part-0.parquet     =>  with buckets, one directory per
+            bucket=1/part-0.parquet         range of pid
+            ...
+
+The layout is hive style, so pd.read_parquet(out_dir, filters=...) and
+pyarrow.dataset read it directly and skip the directories of other years or
+buckets.  Rows are sorted by pid and written in row groups with min/max
+statistics, so reads of a pid range inside a file skip the other row
+groups.  Year and bucket are stored in the directory names only.
+
+Designs other than 'all' depend on the number of years each individual is
+present, known after the last year.  Each year is written as soon as it is
+built and the writer then rewrites the files one at a time with the
+present column, dropping the rows the design excludes.
+
+The dataset is written in a temporary directory next to out_dir and moved
+into place when it is complete.  An existing out_dir is only replaced if it
+is empty or is a dataset written before, holding METADATA.
+
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+#Compression of the parquet files
+COMPRESSION = 'zstd'
+
+#Rows per row group, the unit parquet readers skip using statistics
+ROW_GROUP = 2**16
+
+#Person identifiers are ID1968*1000 + pernum, with ID1968 below 10000
+PID_SPAN = 10000*1000
+
+#Name of the files of a year before the design is applied
+STAGED = '_staged.parquet'
+PART = 'part-0.parquet'
+
+#Description of the dataset, ignored by parquet readers as it starts with _
+METADATA = '_psid_dataset.json'
+
+#Kinds of values, see pd.api.types.infer_dtype, of the columns coerce_na
+#reads as numbers
+NUMBERS = ('integer', 'floating', 'mixed-integer-float', 'decimal')
+
+
+class DatasetError(Exception):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+def check_target(out_dir):
+    """
+    Raise a DatasetError if out_dir exists and is neither an empty
+    directory nor a dataset written before.
+    """
+    if not os.path.lexists(out_dir):
+        return
+    if os.path.islink(out_dir) or not os.path.isdir(out_dir):
+        raise DatasetError(out_dir + ' exists and is not a directory.')
+    if os.listdir(out_dir)\
+            and not os.path.isfile(os.path.join(out_dir, METADATA)):
+        raise DatasetError(out_dir + ' is not empty and is not a psid_py'
+                           ' dataset, it will not be replaced.')
+
+
+def bucket_of(pid, buckets):
+    """
+    Return the bucket of each pid.  Buckets are equal ranges of pid, so a
+    range of pid is read from a range of buckets.
+    """
+    pid = np.asarray(pid, dtype=np.int64)
+    return np.clip(pid*buckets//PID_SPAN, 0, buckets - 1)
+
+
+def coerce_na(x):
+    """
+    Return a copy of a panel with its 'NA' columns, the variables missing in
+    a year, read as null numbers, as typed columns cannot hold them.
+
+    Only numeric variables are coerced.  Converted files hold the character
+    variables of the sas dictionary as strings, see read_sas.column_specs(),
+    so a column holding any string but 'NA' is left as it is, keeping codes
+    such as '0012' intact.
+    """
+    x = x.copy()
+    for col in x.columns:
+        if pd.api.types.is_numeric_dtype(x[col]):
+            continue
+        values = x[col].where(x[col] != 'NA')
+        if values.notna().any() and pd.api.types.infer_dtype(
+                values, skipna=True) not in NUMBERS:
+            continue
+        x[col] = pd.to_numeric(values)
+    return x
+
+
+def write_table(x, out, compression=COMPRESSION):
+    """Write a frame to a parquet file with row group statistics."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(x, preserve_index=False)
+    pq.write_table(table, out, compression=compression,
+                   row_group_size=ROW_GROUP, write_statistics=True)
+
+
+class DatasetWriter(object):
+    """
+    A writer of the years of a panel to a partitioned parquet dataset.
+
+    Parameters
+    ----------
+    out_dir     :   string; the dataset directory.  Replaced on close() if
+                    it is empty or an older dataset, else a DatasetError
+                    is raised.
+    buckets     :   integer; the number of pid buckets of each year, None
+                    for a single file per year
+    compression :   string; the parquet compression
+
+    """
+    def __init__(self, out_dir, buckets=None, compression=COMPRESSION):
+        self.out_dir = out_dir
+        self.buckets = buckets
+        self.compression = compression
+        self.files = []
+        self.pids = []
+        check_target(out_dir)
+
+        #Years are written next to out_dir, so the move is a rename
+        parent = os.path.dirname(os.path.abspath(out_dir))
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        self.staging = tempfile.mkdtemp(
+            dir=parent, prefix='.' + os.path.basename(
+                os.path.abspath(out_dir)) + '.')
+
+    def directory(self, year, bucket=None):
+        """Return the directory of a year, or of a bucket of a year."""
+        d = os.path.join(self.staging, 'year=' + str(year))
+        if bucket is not None:
+            d = os.path.join(d, 'bucket=' + str(bucket))
+        return d
+
+    def add(self, year, frame):
+        """
+        Write the rows of a year, sorted by pid.
+        """
+        frame = coerce_na(frame.drop(columns=['year']))
+        frame = frame.sort_values('pid', kind='mergesort')
+        self.pids.append(frame['pid'].values)
+        if self.buckets is None:
+            parts = [(None, frame)]
+        else:
+            bucket = bucket_of(frame['pid'].values, self.buckets)
+            parts = [(b, frame[bucket == b]) for b in np.unique(bucket)]
+        for b, part in parts:
+            d = self.directory(year, b)
+            os.makedirs(d)
+            write_table(part, os.path.join(d, STAGED), self.compression)
+            self.files.append((year, d))
+
+    def close(self, design="balanced"):
+        """
+        A function to apply the design and finish the dataset.  Returns the
+        number of rows written by year.
+
+        Parameters
+        ----------
+        design      :   string or integer; see build_panel()
+
+        """
+        import pyarrow.parquet as pq
+
+        if self.pids:
+            present = pd.Series(np.concatenate(self.pids)).value_counts()
+        else:
+            present = pd.Series([], dtype=int)
+        if design == 'balanced':
+            least = present.max() if present.shape[0] else 0
+        elif str(design).isdigit():
+            least = int(design)
+        else:
+            least = 0
+
+        rows = {}
+        for year, d in self.files:
+            staged = os.path.join(d, STAGED)
+            x = pq.read_table(staged).to_pandas()
+            x['present'] = present.reindex(x['pid'].values).values
+            x = x[x['present'].values >= least]
+            rows[year] = rows.get(year, 0) + x.shape[0]
+            if x.shape[0]:
+                write_table(x, os.path.join(d, PART), self.compression)
+            os.remove(staged)
+
+        with open(os.path.join(self.staging, METADATA), 'w') as f:
+            json.dump({'buckets': self.buckets, 'design': str(design),
+                       'rows': dict((str(y), int(n))
+                                    for y, n in rows.items())}, f)
+
+        #Move the finished dataset into place, then remove the older one
+        check_target(self.out_dir)
+        old = None
+        if os.path.isdir(self.out_dir):
+            old = self.staging + '.old'
+            os.rename(self.out_dir, old)
+        os.rename(self.staging, self.out_dir)
+        if old is not None:
+            shutil.rmtree(old)
+        return pd.Series(rows, name='rows').sort_index()
+
+    def abort(self):
+        """Remove the files written so far, leaving out_dir untouched."""
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+
+def read_dataset(out_dir, years=None, pids=None, columns=None):
+    """
+    A function to read a panel written by DatasetWriter, only touching the
+    files and row groups of the years and pid range requested.
+
+    Parameters
+    ----------
+    out_dir     :   string; the dataset directory
+    years       :   list; the years to read, all if None
+    pids        :   tuple; (lowest, highest) pid to read, all if None
+    columns     :   list; the columns to read, all if None
+
+    """
+    filters = []
+    if years is not None:
+        filters.append(('year', 'in', [int(y) for y in years]))
+    if pids is not None:
+        filters += [('pid', '>=', pids[0]), ('pid', '<=', pids[1])]
+        with open(os.path.join(out_dir, METADATA)) as f:
+            n = json.load(f)['buckets']
+        if n is not None:
+            filters.append(('bucket', 'in', list(range(
+                int(bucket_of(pids[0], n)), int(bucket_of(pids[1], n)) + 1))))
+    if columns is not None:
+        columns = list(columns) + [x for x in ('pid', 'year')
+                                   if x not in columns]
+    x = pd.read_parquet(out_dir, columns=columns, filters=filters or None)
+    x['year'] = x['year'].astype(int)
+    if 'bucket' in x.columns:
+        x = x.drop(columns=['bucket'])
+    return x.sort_values(['year', 'pid'], kind='mergesort')\
+        .reset_index(drop=True)
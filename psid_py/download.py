@@ -0,0 +1,349 @@
+"""
+Origin: A module to download PSID files from the SIMBA website
+Filename: download.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains an asyncio based client for the PSID login and download
+flow.  The login form is scraped once, the login is posted once and then the
+zip archives are requested concurrently from GetFile.aspx.  Each download
+thread has a session of its own holding the login cookies.  When the site
+answers with the login page, the session has expired: the client logs in
+again, once for all threads, before retrying.  No prompts are issued, so the
+client can run unattended given a username and password.
+
+"""
+import asyncio
+import os
+import threading
+from functools import partial
+
+import requests
+from bs4 import BeautifulSoup
+
+
+SIMBA_URL = 'http://simba.isr.umich.edu'
+
+HIDDEN_FIELDS = ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION',
+                 'RadScriptManager1_TSM']
+
+PASSWORD_FIELD = 'ctl00$ContentPlaceHolder1$Login1$Password'
+
+
+class DownloadError(Exception):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+def form_fields(content):
+    """
+    A function to scrape the hidden ASP.NET form variables from the login
+    page.
+
+    Parameters
+    ----------
+    content     :   bytes; the html of the login page
+
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    fields = {}
+    for name in HIDDEN_FIELDS:
+        tag = soup.find('input', {'type': 'hidden', 'name': name})
+        fields[name] = tag['value'] if tag is not None else ''
+    return fields
+
+
+def is_login_page(content):
+    """
+    Return True if a page holds the login form, i.e. the session is not
+    logged in.
+
+    Parameters
+    ----------
+    content     :   bytes; the html of the page
+
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    return soup.find('input', {'name': PASSWORD_FIELD}) is not None
+
+
+def login_params(fields, username, password):
+    """
+    A function to gather the login form data into a single dictionary.
+
+    Parameters
+    ----------
+    fields      :   dict; hidden form variables, see form_fields()
+    username    :   string; PSID username
+    password    :   string; PSID password
+
+    """
+    return {'RadScriptManager1_TSM': fields['RadScriptManager1_TSM'],
+            '__EVENTTARGET': '',
+            ' __EVENTARGUMENT': '',
+            '__VIEWSTATE': fields['__VIEWSTATE'],
+            '__VIEWSTATEGENERATOR': fields['__VIEWSTATEGENERATOR'],
+            '__EVENTVALIDATION': fields['__EVENTVALIDATION'],
+            'ctl00$ContentPlaceHolder1$Login1$UserName': username,
+            PASSWORD_FIELD: password,
+            'ctl00$ContentPlaceHolder1$Login1$LoginButton': 'Log In',
+            'ctl00_RadWindowManager1_ClientState': ''}
+
+
+def print_progress(file, received, total, log=None):
+    """
+    The default progress report.  Prints a line once a file is complete.
+
+    Parameters
+    ----------
+    file        :   string; the PSID file number
+    received    :   integer; bytes received so far
+    total       :   integer or None; the expected size, if known
+    log         :   file; where the line is printed, stdout if None
+
+    """
+    if total is not None and received == total:
+        print('Downloaded file number ' + file + ' ('
+              + str(round(received/10.**6, 1)) + ' MB).', file=log)
+
+
+class PSIDClient(object):
+    """
+    A client for the SIMBA login and download flow.
+
+    Parameters
+    ----------
+    username    :   string; PSID username
+    password    :   string; PSID password
+    base_url    :   string; the site root, change to point at a mock server
+    concurrency :   integer; the number of simultaneous downloads
+    retries     :   integer; the number of retries per file
+    backoff     :   float; seconds to wait before the first retry, doubled
+                    on each subsequent retry
+    timeout     :   float; seconds before a stalled request is abandoned
+    progress    :   callable; called as progress(file, received, total) as
+                    chunks arrive.  total is None when the size is unknown.
+    chunk_size  :   integer; bytes per streamed chunk
+    log         :   file; where retry warnings are printed, stdout if None
+
+    """
+    def __init__(self, username, password, base_url=SIMBA_URL, concurrency=4,
+                 retries=3, backoff=1.0, timeout=600, progress=print_progress,
+                 chunk_size=2**20, log=None):
+        self.username = username
+        self.password = password
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.log = log
+        self.attempts = {}
+        self.logins = 0
+        #The cookies of the last login, copied to the session of each
+        #thread, and the number of that login
+        self.cookies = None
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.login_lock = threading.Lock()
+        self.local = threading.local()
+        self.sessions = []
+
+    def login(self):
+        """
+        Fetch the hidden form variables and post the login.  Raises a
+        DownloadError unless the site answers with a page other than the
+        login form and sets a cookie.
+        """
+        session = requests.Session()
+        try:
+            page = session.get(self.base_url + '/u/Login.aspx',
+                               timeout=self.timeout)
+            params = login_params(form_fields(page.content), self.username,
+                                  self.password)
+            referer = self.base_url + '/U/Login.aspx?redir=' + self.base_url\
+                + '/U/Logout.aspx'
+            r = session.post(self.base_url + '/u/Login.aspx', data=params,
+                             headers={'Referer': referer},
+                             allow_redirects=True, timeout=self.timeout)
+            if r.status_code != 200:
+                raise DownloadError('Login failed with HTTP status '
+                                    + str(r.status_code) + '.')
+            if is_login_page(r.content) or not len(session.cookies):
+                raise DownloadError('Login failed.  Check the PSID username'
+                                    ' and password.')
+            with self.lock:
+                self.cookies = session.cookies.copy()
+                self.generation += 1
+                self.logins += 1
+        finally:
+            session.close()
+
+    def relogin(self, generation):
+        """
+        Log in again after a session of the given login expired, unless
+        another thread already has.
+        """
+        with self.login_lock:
+            if generation == self.generation:
+                self.login()
+
+    def thread_session(self):
+        """
+        Return the session of the calling thread, with the cookies of the
+        last login, and the number of that login.
+        """
+        local = self.local
+        with self.lock:
+            if getattr(local, 'session', None) is None:
+                local.session = requests.Session()
+                local.generation = None
+                self.sessions.append(local.session)
+            if local.generation != self.generation:
+                local.session.cookies = self.cookies.copy()
+                local.generation = self.generation
+            return local.session, local.generation
+
+    def fetch(self, file, dest, stop=None):
+        """
+        Download a single zip archive to dest, streaming it in chunks, with
+        the session of the calling thread.  When the site answers with the
+        login page, logs in again and raises a DownloadError, so that the
+        file is retried with the new session.
+
+        Parameters
+        ----------
+        file        :   string; the PSID file number
+        dest        :   string; the output file path
+        stop        :   threading.Event; abandons the download when set
+
+        """
+        url = self.base_url + '/Zips/GetFile.aspx?file=' + file\
+            + '&mainurl=Y'
+        referer = self.base_url + '/Zips/ZipMain.aspx'
+        session, generation = self.thread_session()
+        r = session.get(url, allow_redirects=False, stream=True,
+                        headers={'Referer': referer}, timeout=self.timeout)
+        try:
+            if r.status_code != 200:
+                raise DownloadError('File number ' + file + ' returned HTTP '
+                                    'status ' + str(r.status_code) + '.')
+            total = r.headers.get('Content-Length')
+            total = int(total) if total is not None else None
+            received = 0
+            with open(dest, 'wb') as f:
+                for chunk in r.iter_content(self.chunk_size):
+                    if stop is not None and stop.is_set():
+                        raise DownloadError('File number ' + file
+                                            + ' was abandoned.')
+                    f.write(chunk)
+                    received += len(chunk)
+                    if self.progress is not None:
+                        self.progress(file, received, total)
+            if total is not None and received != total:
+                raise DownloadError('File number ' + file + ' was truncated.')
+            with open(dest, 'rb') as f:
+                start = f.read(2)
+                if start != b'PK' and is_login_page(start + f.read(2**20)):
+                    self.relogin(generation)
+                    raise DownloadError('File number ' + file + ' returned'
+                                        ' the login page, the session had'
+                                        ' expired.')
+                if start != b'PK':
+                    raise DownloadError('File number ' + file
+                                        + ' is not a zip archive.')
+            if total is None and self.progress is not None:
+                self.progress(file, received, received)
+        finally:
+            r.close()
+        return dest
+
+    async def _fetch_with_retry(self, loop, executor, semaphore, file, dest,
+                                callback, stop=None):
+        """Fetch one file, retrying with exponential backoff."""
+        async with semaphore:
+            for attempt in range(0, self.retries + 1):
+                if stop is not None and stop.is_set():
+                    return None
+                self.attempts[file] = attempt + 1
+                try:
+                    await loop.run_in_executor(
+                        executor, partial(self.fetch, file, dest, stop))
+                    break
+                except (DownloadError, requests.RequestException) as e:
+                    if stop is not None and stop.is_set():
+                        return None
+                    if attempt == self.retries:
+                        raise
+                    wait = self.backoff*2**attempt
+                    print('WARNING: ' + str(e) + ' Retrying in '
+                          + str(wait) + ' seconds.', file=self.log)
+                    await asyncio.sleep(wait)
+        if callback is not None:
+            await loop.run_in_executor(executor,
+                                       partial(callback, file, dest))
+        return dest
+
+    async def _download_all(self, files, dest_dir, callback, stop=None):
+        """Run the fetches for all files under a shared semaphore."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        loop = asyncio.get_running_loop()
+        if stop is None:
+            stop = threading.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        executor = ThreadPoolExecutor(self.concurrency)
+        tasks = [loop.create_task(self._fetch_with_retry(
+                     loop, executor, semaphore, f,
+                     os.path.join(dest_dir, f + '.zip'), callback, stop))
+                 for f in files]
+        try:
+            paths = await asyncio.gather(*tasks)
+        except BaseException:
+            #Abandon the other downloads, and wait for them to end before
+            #the executor is shut down
+            stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            #The sessions of the executor threads, which are gone
+            with self.lock:
+                sessions, self.sessions = self.sessions, []
+            for session in sessions:
+                session.close()
+        return paths
+
+    def download(self, files, dest_dir, callback=None, stop=None):
+        """
+        Log in and download a set of files concurrently.
+
+        Parameters
+        ----------
+        files       :   list; PSID file numbers
+        dest_dir    :   string; the directory to store the zip archives
+        callback    :   callable; called as callback(file, path) once a
+                        file has been downloaded.  It runs in a worker
+                        thread so that the remaining downloads continue.
+        stop        :   threading.Event; when set, files not yet downloaded
+                        are skipped and those downloading are abandoned
+
+        Returns a dictionary mapping file numbers to zip archive paths, None
+        for the files skipped after stop was set.
+        """
+        files = [str(f) for f in files]
+        self.login()
+        loop = asyncio.new_event_loop()
+        try:
+            paths = loop.run_until_complete(
+                self._download_all(files, dest_dir, callback, stop))
+        finally:
+            loop.close()
+        return dict(zip(files, paths))
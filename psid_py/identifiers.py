@@ -0,0 +1,111 @@
+"""
+Origin: A module to hold PSID identifiers as compact integers
+Filename: identifiers.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains functions to keep the PSID identifiers, the 1968
+family number (ER30001), the person number (ER30002), the interview and
+sequence numbers and the person identifier pid = ID1968*1000 + pernum, as
+integer arrays of the smallest type holding them.  Converted data files
+hold every variable as a float, so the identifiers are converted when the
+files are loaded into a build, and the joins, groupings and design counts
+of build_panel run on integer keys.
+
+"""
+import numpy as np
+import pandas as pd
+
+
+INTEGER_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def compact(values):
+    """
+    A function to return whole numbers as an integer array of the smallest
+    type holding them.  Values with nulls or fractions, and values that are
+    not numbers, are returned unchanged.
+
+    Parameters
+    ----------
+    values      :   array; the identifiers
+
+    """
+    if isinstance(values, pd.Series):
+        values = values.values
+    if not isinstance(values, np.ndarray) or values.dtype.kind not in 'iuf'\
+            or values.shape[0] == 0:
+        return values
+    if values.dtype.kind == 'f':
+        if not np.isfinite(values).all()\
+                or (values != np.floor(values)).any():
+            return values
+    low, high = values.min(), values.max()
+    for dtype in INTEGER_TYPES:
+        info = np.iinfo(dtype)
+        #The largest value of a type is not exact as a float, e.g. 2**63 - 1
+        #rounds to 2**63, so floats are compared with the power of two
+        if values.dtype.kind == 'f':
+            fits = high < -float(info.min)
+        else:
+            fits = high <= info.max
+        if info.min <= low and fits:
+            return values.astype(dtype, copy=False)
+    return values
+
+
+def compact_ids(x, columns):
+    """
+    A function to convert the identifier columns of a frame, see compact().
+    Returns a frame sharing the other columns.  Columns it lacks are
+    skipped.
+
+    Parameters
+    ----------
+    x           :   dataframe; the data
+    columns     :   list; the identifier columns
+
+    """
+    converted = {}
+    for col in columns:
+        if col in x.columns and col not in converted:
+            old = x[col].values
+            values = compact(old)
+            if values is not old:
+                converted[col] = values
+    if not converted:
+        return x
+    x = x.copy(deep=False)
+    for col, values in converted.items():
+        x[col] = values
+    return x
+
+
+def pid_of(ID1968, pernum):
+    """
+    Return the person identifiers ID1968*1000 + pernum, as 32 bit integers
+    when both are integers and the identifiers fit, 64 bit integers
+    otherwise.
+    """
+    ID1968 = np.asarray(ID1968)
+    pernum = np.asarray(pernum)
+    if ID1968.dtype.kind in 'iu' and pernum.dtype.kind in 'iu':
+        dtype = np.int32
+        if ID1968.size and pernum.size:
+            high = max(abs(int(ID1968.min())), abs(int(ID1968.max())))*1000\
+                + max(abs(int(pernum.min())), abs(int(pernum.max())))
+            if high > np.iinfo(np.int32).max:
+                dtype = np.int64
+        return ID1968.astype(dtype)*1000 + pernum.astype(dtype)
+    return ID1968*1000 + pernum
+
+
+def count_by(keys):
+    """
+    Return, for each element of keys, the number of elements with the same
+    key, e.g. the number of years each row's person is present.  Null keys
+    count zero.
+    """
+    codes, found = pd.factorize(np.asarray(keys))
+    counts = np.bincount(codes[codes >= 0], minlength=found.shape[0])
+    return np.where(codes >= 0, counts[np.maximum(codes, 0)], 0)
@@ -0,0 +1,140 @@
+"""
+Origin: A module to merge family and individual PSID data
+Filename: join.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains a join specialised for the per-year merge in
+build_panel.  Family interview numbers are unique within a wave, so instead
+of hashing both sides each individual's family row is found through a direct
+lookup table indexed by interview number, or by binary search in the sorted
+family keys (PSID family files usually are already sorted, in which case the
+sort is skipped).
+
+"""
+import numpy as np
+
+
+class JoinError(Exception):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+def sort_order(keys):
+    """
+    A function returning the order that sorts keys, or None if they are
+    already sorted.
+
+    Parameters
+    ----------
+    keys        :   array; the join keys
+
+    """
+    if keys.shape[0] < 2 or (keys[1:] >= keys[:-1]).all():
+        return None
+    return np.argsort(keys, kind='mergesort')
+
+
+def duplicate_error(keys):
+    """Return a JoinError naming one duplicated interview number."""
+    keys = np.sort(keys)
+    dup = keys[1:][keys[1:] == keys[:-1]]
+    return JoinError('The family data contain duplicate interview numbers, '
+                     'e.g. ' + str(dup[0]) + '.')
+
+
+def whole_numbers(keys):
+    """True if every key but the null keys is a whole number."""
+    whole = keys == np.floor(keys)
+    return bool((whole | np.isnan(keys)).all())
+
+
+def lookup_rows(fam_keys, ind_keys, validate=True):
+    """
+    A function to find the family row of every individual.  Returns the
+    positions of the matched individuals and their family rows.
+
+    Interview numbers are small non-negative integers, so they usually index
+    a direct lookup table.  Otherwise the family keys are sorted and
+    searched.
+
+    Parameters
+    ----------
+    fam_keys    :   array; family interview numbers, unique
+    ind_keys    :   array; individual interview numbers
+    validate    :   bool; raise a JoinError on duplicate family keys
+
+    """
+    #Integer keys, see identifiers, are used as they are
+    integer = np.asarray(fam_keys).dtype.kind in 'iu'\
+        and np.asarray(ind_keys).dtype.kind in 'iu'
+    if not integer:
+        fam_keys = np.asarray(fam_keys, dtype=float)
+        ind_keys = np.asarray(ind_keys, dtype=float)
+    else:
+        fam_keys = np.asarray(fam_keys)
+        ind_keys = np.asarray(ind_keys)
+    n = fam_keys.shape[0]
+    if n == 0:
+        return np.array([], dtype=int), np.array([], dtype=int)
+
+    top = fam_keys.max() if integer or not np.isnan(fam_keys).any() else -1
+    if fam_keys.min() >= 0 and 0 <= top <= 4*n + 1024\
+            and (integer or whole_numbers(fam_keys)
+                 and whole_numbers(ind_keys)):
+        #Direct lookup: table[key] is the family row holding key
+        table = np.full(int(top) + 1, -1, dtype=np.int64)
+        table[fam_keys.astype(np.int64)] = np.arange(0, n)
+        if validate and (table >= 0).sum() != n:
+            raise duplicate_error(fam_keys)
+        inside = (ind_keys >= 0) & (ind_keys <= top)
+        rows = np.full(ind_keys.shape[0], -1, dtype=np.int64)
+        rows[inside] = table[ind_keys[inside].astype(np.int64)]
+        matched = np.flatnonzero(rows >= 0)
+        return matched, rows[matched]
+
+    #Sort the family keys, remembering where each sorted key came from
+    order = sort_order(fam_keys)
+    sorted_keys = fam_keys if order is None else fam_keys[order]
+    if validate and (sorted_keys[1:] == sorted_keys[:-1]).any():
+        raise duplicate_error(fam_keys)
+
+    #Locate every individual's interview number by binary search
+    pos = np.searchsorted(sorted_keys, ind_keys)
+    pos[pos == n] = 0
+    matched = np.flatnonzero(sorted_keys[pos] == ind_keys)
+    rows = pos[matched] if order is None else order[pos[matched]]
+    return matched, rows
+
+
+def interview_join(fam, ind, on='interview', validate=True):
+    """
+    A function to inner join the individual data onto the family data.  The
+    result has the same rows and columns as pd.merge(fam, ind, on=on), in
+    the order of the individual data.
+
+    Parameters
+    ----------
+    fam         :   dataframe; the family data, one row per interview
+    ind         :   dataframe; the individual data
+    on          :   string; the interview number column of both frames
+    validate    :   bool; raise a JoinError on duplicate family interview
+                    numbers
+
+    """
+    ind_rows, fam_rows = lookup_rows(fam[on].values, ind[on].values,
+                                     validate)
+
+    #Overlapping column names get pd.merge's default suffixes
+    both = set(fam.columns) & set(ind.columns) - set([on])
+    m = fam.take(fam_rows)
+    m.index = range(0, m.shape[0])
+    m.columns = [col + '_x' if col in both else col for col in fam.columns]
+    for col in ind.columns:
+        if col != on:
+            m[col + '_y' if col in both else col] = \
+                ind[col].values.take(ind_rows)
+    return m
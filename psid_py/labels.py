@@ -0,0 +1,141 @@
+"""
+Origin: A module to apply value labels to PSID variables
+Filename: labels.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains functions to turn coded PSID variables into pandas
+categoricals from their value labels, e.g. the PROC FORMAT VALUE tables of a
+sas dictionary (see read_sas.value_labels) or the value labels of a Stata
+file.  Each table of labels becomes one CategoricalDtype, created once per
+process and shared by every variable, file and year using the same labels,
+so a labeled column costs one small code array and concatenating years
+keeps the categorical type.  Codes are mapped to categories with a single
+binary search over the sorted codes of the table.
+
+Only variables whose every value has a label are converted.  PSID variables
+often label a few special codes (e.g. 9999 = NA; DK) among plain amounts,
+and those keep their numeric codes.
+
+"""
+import numpy as np
+import pandas as pd
+
+
+#Shared dtypes by their categories
+DTYPES = {}
+
+
+def shared_dtype(categories):
+    """
+    Return the CategoricalDtype of a list of categories, the same object
+    for every call with the same categories.
+    """
+    key = tuple(categories)
+    if key not in DTYPES:
+        #setdefault keeps the first dtype if threads race to create it
+        DTYPES.setdefault(key, pd.CategoricalDtype(list(categories),
+                                                   ordered=False))
+    return DTYPES[key]
+
+
+def table_arrays(table):
+    """
+    A function to prepare a table of labels for lookups.  Returns the
+    sorted codes, the category of each code and the categories, in the
+    order of the codes.
+
+    Parameters
+    ----------
+    table       :   dict; label by code
+
+    """
+    codes = sorted(table)
+    categories = []
+    position = {}
+    for code in codes:
+        label = table[code]
+        if label not in position:
+            position[label] = len(categories)
+            categories.append(label)
+    return (np.array(codes), np.array([position[table[c]] for c in codes],
+                                      dtype=np.int64), categories)
+
+
+def categorical(values, table):
+    """
+    A function to convert coded values to a categorical with a shared
+    dtype.  Returns None if a value that is not null has no label.
+
+    Parameters
+    ----------
+    values      :   array like; the coded values
+    table       :   dict; label by code
+
+    """
+    codes, which, categories = table_arrays(table)
+    if codes.dtype.kind in 'iuf':
+        values = pd.to_numeric(pd.Series(values)).to_numpy(dtype=float,
+                                                           na_value=np.nan)
+        null = np.isnan(values)
+    else:
+        values = pd.Series(values).astype(object)
+        null = values.isna().values
+        values = values.where(~null, '').astype(str).str.strip().values
+        codes = codes.astype(str)
+
+    pos = np.searchsorted(codes, values)
+    pos[pos == codes.shape[0]] = 0
+    found = codes[pos] == values
+    if (~found & ~null).any():
+        return None
+    cat_codes = np.where(found & ~null, which[pos], -1)
+    return pd.Categorical.from_codes(cat_codes,
+                                     dtype=shared_dtype(categories))
+
+
+def apply_labels(x, tables, assigned):
+    """
+    A function to convert the labeled variables of a frame to categoricals,
+    see categorical().  Returns a frame sharing the other columns.
+
+    Parameters
+    ----------
+    x           :   dataframe; the coded data
+    tables      :   dict; tables of labels by name, each a dict of label
+                    by code
+    assigned    :   dict; the name of the table of each variable
+
+    """
+    converted = {}
+    for col in x.columns:
+        name = assigned.get(str(col).upper(), assigned.get(str(col)))
+        if name is None or name not in tables:
+            continue
+        labeled = categorical(x[col].values, tables[name])
+        if labeled is not None:
+            converted[col] = labeled
+    if not converted:
+        return x
+    x = x.copy(deep=False)
+    for col, labeled in converted.items():
+        x[col] = labeled
+    return x
+
+
+def share_categories(x):
+    """
+    A function to give the categorical columns of a frame, e.g. from
+    pd.read_stata, the shared dtype of their categories.  Returns a frame
+    sharing the other columns.
+    """
+    cats = [col for col in x.columns
+            if isinstance(x[col].dtype, pd.CategoricalDtype)]
+    if not cats:
+        return x
+    x = x.copy(deep=False)
+    for col in cats:
+        dtype = shared_dtype(list(x[col].cat.categories))
+        x[col] = pd.Categorical.from_codes(x[col].cat.codes.values,
+                                           dtype=dtype)
+    return x
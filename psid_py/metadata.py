@@ -0,0 +1,143 @@
+"""
+Origin: A module to load the PSID metadata tables
+Filename: metadata.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains the loader of the PSID metadata: the wave years, the
+interview, sequence and relation to head variables of the individual file,
+the code of a head of household, the family interview variables and the
+SIMBA file numbers of the family and individual files.  They are kept in a
+versioned json file, data/psid_metadata.json, of the form
+
+    {"version": 1,
+     "release": 2011,
+     "individual": {"year": 2011, "file": 1053, "name": "IND2011ER"},
+     "columns": ["year", "ind_interview", ..., "fam_file"],
+     "waves": [[1968, "ER30001", ...], ...]}
+
+The file is read once per process and the tables are kept in memory.  To
+use a newer release, copy the file, add its waves and individual file, and
+point the PSID_METADATA environment variable or use() at the copy.  Saved
+panels and presence indexes record the digest() of the file they were built
+with, so they are rebuilt when it changes.
+
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+
+METADATA_VERSION = 1
+
+#The metadata shipped with the package
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'data', 'psid_metadata.json')
+
+COLUMNS = ['year', 'ind_interview', 'ind_seq', 'ind_head', 'ind_head_num',
+           'fam_interview', 'fam_file']
+
+#Loaded metadata by file path, and the file set with use()
+LOADED = {}
+CURRENT = {'file': None}
+
+
+class MetadataError(Exception):
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+def current_file():
+    """
+    Return the path of the metadata in use: the file set with use(), else
+    the PSID_METADATA environment variable, else the packaged file.
+    """
+    return CURRENT['file'] or os.environ.get('PSID_METADATA') or DEFAULT_FILE
+
+
+def use(metadata_file=None):
+    """
+    A function to set the metadata file used by the package, e.g. an
+    updated copy for a newer release.  None restores the default.
+
+    Parameters
+    ----------
+    metadata_file   :   string; path of the json metadata file
+
+    """
+    if metadata_file is not None:
+        load(metadata_file)
+    CURRENT['file'] = metadata_file
+
+
+def load(metadata_file=None):
+    """
+    A function to read a metadata file, once per process.  Returns a
+    dictionary with the release, the individual file description, the
+    waves as a dataframe indexed by year and the sha256 digest of the file.
+    Raises a MetadataError if the file is not valid.
+
+    Parameters
+    ----------
+    metadata_file   :   string; path of the json metadata file, see
+                        current_file()
+
+    """
+    path = os.path.abspath(metadata_file or current_file())
+    if path in LOADED:
+        return LOADED[path]
+
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        found = json.loads(content.decode('utf-8'))
+    except (IOError, ValueError) as e:
+        raise MetadataError('Cannot read the PSID metadata ' + path + ': '
+                            + str(e))
+    if found.get('version') != METADATA_VERSION:
+        raise MetadataError('The PSID metadata ' + path + ' has version '
+                            + str(found.get('version')) + ', expected '
+                            + str(METADATA_VERSION) + '.')
+    lacking = [x for x in COLUMNS if x not in found.get('columns', [])]
+    if lacking or 'individual' not in found:
+        raise MetadataError('The PSID metadata ' + path + ' lacks '
+                            + ', '.join(lacking or ['individual']) + '.')
+
+    waves = pd.DataFrame(found['waves'], columns=found['columns'])[COLUMNS]
+    waves.index = waves['year'].values
+    if not waves.index.is_unique:
+        raise MetadataError('The PSID metadata ' + path + ' repeats a year.')
+    LOADED[path] = {'release': found.get('release'),
+                    'individual': found['individual'],
+                    'waves': waves.sort_index(),
+                    'digest': hashlib.sha256(content).hexdigest()}
+    return LOADED[path]
+
+
+def waves():
+    """
+    Return the wave table, a dataframe indexed by year with the columns of
+    COLUMNS.  The table is shared, copy it before modifying it.
+    """
+    return load()['waves']
+
+
+def individual_file():
+    """
+    Return the individual file of the release as a dictionary with its
+    year, SIMBA file number and name.
+    """
+    return load()['individual']
+
+
+def digest():
+    """
+    Return the sha256 hex digest of the contents of the metadata file in
+    use, identifying the tables builds depend on.
+    """
+    return load()['digest']
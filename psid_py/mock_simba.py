@@ -0,0 +1,312 @@
+"""
+Origin: A module to serve a local stand-in for the SIMBA website
+Filename: mock_simba.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains a small http server mimicking the parts of the PSID
+SIMBA website the download client uses, so that downloads can be measured
+and tuned without the live site:
+
+    GET  /u/Login.aspx              =>  the login form, with the hidden
+                                        ASP.NET fields (__VIEWSTATE, ...)
+    POST /u/Login.aspx              =>  checks the hidden fields and the
+                                        credentials and sets a session
+                                        cookie
+    GET  /Zips/GetFile.aspx?file=N  =>  the zip archive of file number N,
+                                        or the login page without a session
+
+Responses can be delayed (latency), throttled (bandwidth, per connection or
+shared by all connections) and made to fail (failure injection) with a
+seeded random generator, so that runs are reproducible:
+
+    'error'     =>  HTTP 500
+    'truncate'  =>  the connection is closed half way through the archive
+    'login'     =>  the session expires and the login page is returned
+                    instead of the archive, until the client logs in again
+
+A server runs in a background thread:
+
+    server = mock_simba.start(files={'1053': archive_bytes}, latency=0.05)
+    client = download.PSIDClient('user', 'pass', base_url=server.url)
+    ...
+    server.stop()
+
+"""
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+FAILURES = ['error', 'truncate', 'login']
+
+#Bytes written at a time, the unit of throttling
+CHUNK_BYTES = 2**16
+
+LOGIN_PAGE = '''<html><body><form method="post" action="Login.aspx">
+<input type="hidden" name="RadScriptManager1_TSM" value="%(tsm)s" />
+<input type="hidden" name="__VIEWSTATE" value="%(viewstate)s" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" value="%(generator)s" />
+<input type="hidden" name="__EVENTVALIDATION" value="%(validation)s" />
+<input name="ctl00$ContentPlaceHolder1$Login1$UserName" type="text" />
+<input name="ctl00$ContentPlaceHolder1$Login1$Password" type="password" />
+</form></body></html>'''
+
+
+class Throttle(object):
+    """
+    A token bucket limiting a rate in bytes per second, shared by the
+    threads calling wait().  No limit if rate is None.
+    """
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next = time.time()
+
+    def wait(self, n):
+        """Block until n more bytes may be sent."""
+        if self.rate is None:
+            return
+        with self.lock:
+            now = time.time()
+            start = max(self.next, now)
+            self.next = start + float(n)/self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class SIMBAHandler(BaseHTTPRequestHandler):
+    """Serve the login form and the zip archives of a MockSIMBA server."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type='text/html',
+                  headers=None, limit=None):
+        """Send a response, throttled, stopping after limit bytes."""
+        server = self.server
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if limit is not None:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+
+        throttle = Throttle(server.connection_bandwidth)
+        end = len(body) if limit is None else limit
+        for start in range(0, end, CHUNK_BYTES):
+            chunk = body[start:min(start + CHUNK_BYTES, end)]
+            throttle.wait(len(chunk))
+            server.bandwidth.wait(len(chunk))
+            self.wfile.write(chunk)
+            server.count('bytes', len(chunk))
+        if limit is not None:
+            self.close_connection = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        path = url.path.lower()
+        time.sleep(server.latency)
+        server.count('requests')
+
+        if path == '/u/login.aspx':
+            self.send_body(200, server.login_page())
+        elif path == '/zips/getfile.aspx':
+            file = parse_qs(url.query).get('file', [''])[0]
+            server.count('file_requests')
+            if not server.logged_in(self.headers.get('Cookie', '')):
+                self.send_body(200, server.login_page())
+            elif file not in server.files:
+                self.send_body(404, b'Unknown file number')
+            else:
+                self.send_file(file)
+        else:
+            self.send_body(404, b'Not found')
+
+    def send_file(self, file):
+        """Send a zip archive, or an injected failure."""
+        server = self.server
+        body = server.files[file]
+        failure = server.draw_failure()
+        if failure is not None:
+            server.count('failures')
+        if failure == 'error':
+            self.send_body(500, b'Server Error')
+        elif failure == 'truncate':
+            self.send_body(200, body, 'application/zip', limit=len(body)//2)
+        elif failure == 'login':
+            server.expire(self.headers.get('Cookie', ''))
+            self.send_body(200, server.login_page())
+        else:
+            self.send_body(200, body, 'application/zip',
+                           {'Content-Disposition': 'attachment; filename='
+                            + file + '.zip'})
+
+    def do_POST(self):
+        server = self.server
+        time.sleep(server.latency)
+        server.count('requests')
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'),
+                        keep_blank_values=True)
+        if urlparse(self.path).path.lower() != '/u/login.aspx':
+            self.send_body(404, b'Not found')
+            return
+
+        session = server.login(form)
+        if session is None:
+            self.send_body(200, server.login_page())
+        else:
+            server.count('logins')
+            self.send_body(200, b'<html>Welcome</html>',
+                           headers={'Set-Cookie': 'ASP.NET_SessionId='
+                                    + session + '; path=/'})
+
+
+class MockSIMBA(ThreadingHTTPServer):
+    """
+    A local stand-in for the SIMBA website.
+
+    Parameters
+    ----------
+    address     :   tuple; (host, port), port 0 for any free port
+    files       :   dict; zip archive bytes by PSID file number
+    username    :   string; the accepted username, any if None
+    password    :   string; the accepted password, any if None
+    latency     :   float; seconds added before every response
+    bandwidth   :   float; bytes per second shared by all connections, None
+                    for no limit
+    connection_bandwidth :  float; bytes per second of each connection,
+                    None for no limit
+    fail_rate   :   float; the probability that a file request fails
+    failures    :   list; the failure modes to draw from, see FAILURES
+    seed        :   integer; the seed of the failure draws
+
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, files, username=None, password=None,
+                 latency=0., bandwidth=None, connection_bandwidth=None,
+                 fail_rate=0., failures=FAILURES, seed=0):
+        ThreadingHTTPServer.__init__(self, address, SIMBAHandler)
+        self.files = dict((str(k), v) for k, v in files.items())
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.bandwidth = Throttle(bandwidth)
+        self.connection_bandwidth = connection_bandwidth
+        self.fail_rate = fail_rate
+        self.failures = list(failures)
+        #Failures are drawn from their own generator, so that they depend
+        #on the seed only
+        self.random = random.Random(seed)
+        self.tokens = random.SystemRandom()
+        self.fields = {'tsm': 'tsm%08x' % self.tokens.getrandbits(32),
+                       'viewstate': 'vs%032x' % self.tokens.getrandbits(128),
+                       'generator': 'C2EE9ABB',
+                       'validation': 'ev%032x' % self.tokens.getrandbits(128)}
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.reset()
+
+    @property
+    def url(self):
+        """The base url of the server, for PSIDClient(base_url=...)."""
+        return 'http://%s:%d' % self.server_address[:2]
+
+    def reset(self):
+        """Reset the request counters."""
+        with self.lock:
+            self.counts = {'requests': 0, 'file_requests': 0, 'logins': 0,
+                           'failures': 0, 'bytes': 0}
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        #Clients abandoning a download close their connection mid response
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            ThreadingHTTPServer.handle_error(self, request, client_address)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counts[name] += n
+
+    def login_page(self):
+        return (LOGIN_PAGE % self.fields).encode('utf-8')
+
+    def login(self, form):
+        """
+        Check a posted login form.  Returns a new session id, or None if
+        the hidden fields or the credentials do not match.
+        """
+        def value(name):
+            return form.get(name, [''])[0]
+
+        if value('__VIEWSTATE') != self.fields['viewstate']\
+                or value('__EVENTVALIDATION') != self.fields['validation']:
+            return None
+        for name, wanted in [('UserName', self.username),
+                             ('Password', self.password)]:
+            given = value('ctl00$ContentPlaceHolder1$Login1$' + name)
+            if wanted is not None and given != wanted:
+                return None
+        with self.lock:
+            session = '%024x' % self.tokens.getrandbits(96)
+            self.sessions.add(session)
+        return session
+
+    def session_ids(self, cookie):
+        for part in cookie.split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'ASP.NET_SessionId':
+                yield value
+
+    def logged_in(self, cookie):
+        with self.lock:
+            return any(s in self.sessions for s in self.session_ids(cookie))
+
+    def expire(self, cookie):
+        """End the sessions of a request cookie."""
+        with self.lock:
+            for session in self.session_ids(cookie):
+                self.sessions.discard(session)
+
+    def draw_failure(self):
+        """Return the failure mode of a file request, or None."""
+        with self.lock:
+            if self.failures and self.random.random() < self.fail_rate:
+                return self.random.choice(self.failures)
+        return None
+
+
+def start(files, host='127.0.0.1', port=0, **options):
+    """
+    A function to run a MockSIMBA server in a background thread.  Returns
+    the server, stop it with server.stop().
+
+    Parameters
+    ----------
+    files       :   dict; zip archive bytes by PSID file number
+    host        :   string; the address to listen on
+    port        :   integer; the port, any free port if 0
+
+    Other options are those of MockSIMBA.
+
+    """
+    server = MockSIMBA((host, port), files, **options)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
@@ -0,0 +1,121 @@
+"""
+Origin: A module to hold PSID panels without repeating family data
+Filename: normalized.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains the normalized form of a built panel.  The wide panel
+of build_panel repeats every family variable on each member of the family,
+while a NormalizedPanel keeps two tables:
+
+    families        =>  one row per (year, interview), the family variables
+    individuals     =>  one row per (pid, year), the individual variables
+                        and the interview number of the person's family
+
+The interview number is the foreign key of the individual table, so the
+wide panel is rebuilt on demand with a single lookup per year, see
+join.lookup_rows.
+
+"""
+import numpy as np
+import pandas as pd
+
+from . import join
+
+
+class NormalizedPanel(object):
+    """
+    A panel kept as a family table indexed by (year, interview) and an
+    individual table indexed by (pid, year).
+
+    Parameters
+    ----------
+    families    :   dataframe; family variables with year and interview
+                    columns
+    individuals :   dataframe; individual variables with pid, year and
+                    interview columns
+
+    """
+    def __init__(self, families, individuals):
+        if not isinstance(families.index, pd.MultiIndex):
+            families = families.set_index(['year', 'interview'])
+        if not isinstance(individuals.index, pd.MultiIndex):
+            individuals = individuals.set_index(['pid', 'year'])
+        self.families = families.sort_index()
+        self.individuals = individuals
+
+    def __repr__(self):
+        return ('NormalizedPanel(' + str(self.families.shape[0])
+                + ' families, ' + str(self.individuals.shape[0])
+                + ' individuals)')
+
+    @property
+    def years(self):
+        """The years of the panel."""
+        return list(self.families.index.unique(level='year'))
+
+    @property
+    def shape(self):
+        """The shape of the wide panel."""
+        return (self.individuals.shape[0],
+                self.families.shape[1] + self.individuals.shape[1] + 2)
+
+    def nbytes(self):
+        """Return the memory used by both tables in bytes."""
+        return int(self.families.memory_usage(deep=True).sum()
+                   + self.individuals.memory_usage(deep=True).sum())
+
+    def family_rows(self, years=None):
+        """
+        Return the family table rows of the individuals, -1 where an
+        individual's family is missing, for the years given or all years.
+        """
+        ind = self.individuals
+        if years is not None:
+            ind = ind[ind.index.get_level_values('year').isin(years)]
+        rows = np.full(ind.shape[0], -1, dtype=np.int64)
+        fam_year = self.families.index.get_level_values('year').values
+        fam_key = self.families.index.get_level_values('interview').values
+        ind_year = ind.index.get_level_values('year').values
+        for year in pd.unique(ind_year):
+            #The families of a year are a contiguous block of the sorted
+            #index
+            lo = np.searchsorted(fam_year, year, side='left')
+            hi = np.searchsorted(fam_year, year, side='right')
+            where = np.flatnonzero(ind_year == year)
+            matched, found = join.lookup_rows(fam_key[lo:hi],
+                                              ind['interview'].values[where],
+                                              validate=False)
+            rows[where[matched]] = lo + found
+        return ind, rows
+
+    def denormalize(self, years=None, columns=None):
+        """
+        A function to rebuild the wide panel of build_panel, one row per
+        individual and year with the family variables repeated on each
+        member.
+
+        Parameters
+        ----------
+        years       :   list; the years to rebuild, all if None
+        columns     :   list; the family variables to include, all if None
+
+        """
+        ind, rows = self.family_rows(years)
+        fam = self.families if columns is None else self.families[columns]
+        ind = ind[rows >= 0]
+        rows = rows[rows >= 0]
+
+        #Columns in the order of the wide panel: family variables, the
+        #interview number, then the individual variables
+        m = fam.take(rows)
+        m.index = range(0, m.shape[0])
+        m['interview'] = ind['interview'].values
+        for col in ind.columns:
+            if col not in ('interview', 'present'):
+                m[col] = ind[col].values
+        m['pid'] = ind.index.get_level_values('pid').values
+        m['year'] = ind.index.get_level_values('year').values
+        if 'present' in ind.columns:
+            m['present'] = ind['present'].values
+        return m
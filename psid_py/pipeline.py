@@ -0,0 +1,163 @@
+"""
+Origin: A module to overlap downloading and converting PSID files
+Filename: pipeline.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains a producer/consumer pipeline for the SAScii acquisition
+path.  Downloads run in a background thread and feed a queue, a process pool
+converts each archive as soon as it arrives and the converted files are
+handed back to the caller as they finish, so that the network, the cores and
+the panel building all stay busy at the same time.
+
+"""
+import contextlib
+import io
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+
+from . import psid_py
+
+
+def remove_after(thread, directory):
+    """Remove a directory once a thread using it has finished."""
+    thread.join()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def convert_logged(*args):
+    """
+    Run convert_zip() in a worker process.  Returns the path written and
+    what the conversion printed, for the caller to print to its own log.
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        out = psid_py.convert_zip(*args)
+    return out, output.getvalue()
+
+
+def acquire_iter(years, datadir, username, password, processes=None,
+                 concurrency=4, retries=3, base_url=None, out_type='csv',
+                 require=None, log=None):
+    """
+    A generator to download and convert the sas data files, yielding
+    (year, type, path) for each converted file as soon as it is ready.  The
+    type is 'ind' for the individual file and 'fam' for family files.
+
+    Parameters
+    ----------
+    years       :   list; a list of years to download
+    datadir     :   string; the directory to store output
+    username    :   string; PSID username
+    password    :   string; PSID password
+    processes   :   integer; the number of conversion processes.  Defaults
+                    to the number of cores.
+    concurrency :   integer; the number of simultaneous downloads
+    retries     :   integer; the number of retries per file
+    base_url    :   string; the site root, defaults to the SIMBA website
+    out_type    :   string; the output format, one of 'csv', 'parquet' or
+                    'npy'.  See storage.
+    require     :   dict; variables each file must hold, keyed by year for
+                    family files and by 'ind' for the individual file.  A
+                    file lacking any is rejected from its sas dictionary
+                    before it is decoded, see convert_zip().
+    log         :   file; where the downloads and conversions print their
+                    progress, stdout if None
+
+    """
+    from . import download
+
+    files = psid_py.psid_files(years, datadir)
+    client = download.PSIDClient(username, password,
+                                 base_url=base_url or download.SIMBA_URL,
+                                 concurrency=concurrency, retries=retries,
+                                 progress=partial(download.print_progress,
+                                                  log=log),
+                                 log=log)
+    zip_dir = tempfile.mkdtemp()
+    pool = ProcessPoolExecutor(processes)
+    downloaded = queue.Queue()
+
+    #Set when the caller stops early or a file fails, so that the remaining
+    #downloads and conversions are abandoned
+    stop = threading.Event()
+
+    #Hand each archive to the process pool as soon as it is on disk
+    def convert(file, zip_path):
+        if stop.is_set():
+            return
+        key = 'ind' if files.loc[file, 'type'] == 'ind'\
+            else int(files.loc[file, 'year'])
+        try:
+            future = pool.submit(convert_logged, zip_path,
+                                 files.loc[file, 'name'], out_type, None,
+                                 (require or {}).get(key))
+        except RuntimeError:
+            #The pool was shut down after a failure
+            return
+        downloaded.put((file, zip_path, future))
+
+    def run():
+        try:
+            client.download(list(files.index), zip_dir, callback=convert,
+                            stop=stop)
+        except Exception as e:
+            downloaded.put((None, None, e))
+        else:
+            downloaded.put((None, None, None))
+
+    producer = threading.Thread(target=run)
+    producer.daemon = True
+    producer.start()
+
+    pending = {}
+    downloading = True
+    try:
+        while downloading or pending:
+            #Collect new conversions, blocking only if there is nothing to do
+            block = not pending
+            while True:
+                try:
+                    file, zip_path, item = downloaded.get(block=block)
+                except queue.Empty:
+                    break
+                block = False
+                if file is None:
+                    if item is not None:
+                        raise item
+                    downloading = False
+                    if not pending:
+                        break
+                else:
+                    pending[item] = (file, zip_path)
+
+            if not pending:
+                continue
+            done, _ = wait(list(pending), timeout=0.1,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                file, zip_path = pending.pop(future)
+                out, text = future.result()
+                print(text, end='', file=log)
+                os.remove(zip_path)
+                yield (int(files.loc[file, 'year']), files.loc[file, 'type'],
+                       out)
+    finally:
+        #Return at once: abandon the downloads, drop the conversions not
+        #started yet and leave the running ones to finish on their own
+        stop.set()
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+        if producer.is_alive():
+            cleanup = threading.Thread(target=remove_after,
+                                       args=(producer, zip_dir))
+            cleanup.daemon = True
+            cleanup.start()
+        else:
+            shutil.rmtree(zip_dir, ignore_errors=True)
@@ -0,0 +1,199 @@
+"""
+Origin: A module to index which waves each PSID individual is present in
+Filename: presence.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains functions to build a compact presence index from the
+individual file: one bit per (pid, wave), set when the individual has an
+interview number in that wave.  A second bitmap records the waves in which
+the individual is the current head of household.  The design options of
+build_panel can then be resolved with bitwise operations before any family
+file is loaded, so that individuals who will be dropped never reach the
+merge.
+
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import identifiers
+
+
+def popcount(bits):
+    """
+    A function to count the set bits of an array of unsigned integers.
+
+    Parameters
+    ----------
+    bits        :   array; uint64 bitmaps
+
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).astype(int)
+    count = np.zeros(bits.shape, dtype=int)
+    for i in range(0, 64):
+        count += ((bits >> np.uint64(i)) & np.uint64(1)).astype(int)
+    return count
+
+
+def wave_mask(years, ids):
+    """
+    A function to build the bitmap of a set of waves.
+
+    Parameters
+    ----------
+    years       :   list; years desired
+    ids         :   dataframe; the PSID id variables, see makeids()
+
+    """
+    mask = np.uint64(0)
+    for year in years:
+        mask |= np.uint64(1) << np.uint64(list(ids.index).index(year))
+    return mask
+
+
+def person_ids(ind):
+    """
+    A function to compute the person identifier of every row of the
+    individual file.  Returns the identifiers and a boolean array, False
+    for rows whose ER30001 or ER30002 is null, whose identifier is -1.
+
+    Parameters
+    ----------
+    ind         :   dataframe; the individual file
+
+    """
+    ID1968 = ind['ER30001'].to_numpy(dtype=float, na_value=np.nan)
+    pernum = ind['ER30002'].to_numpy(dtype=float, na_value=np.nan)
+    valid = ~(np.isnan(ID1968) | np.isnan(pernum))
+    pid = identifiers.pid_of(np.where(valid, ID1968, 0).astype(np.int64),
+                             np.where(valid, pernum, 0).astype(np.int64))
+    pid[~valid] = -1
+    return pid, valid
+
+
+def build_index(ind, ids):
+    """
+    A function to build the presence index of the individual file.  Returns
+    a dataframe aligned with the rows of ind with columns pid, interviewed
+    and head, the last two being uint64 bitmaps with bit i for the i-th wave
+    of ids.  Rows without a person identifier, see person_ids(), are
+    present in no wave.
+
+    Parameters
+    ----------
+    ind         :   dataframe; the individual file
+    ids         :   dataframe; the PSID id variables, see makeids()
+
+    """
+    #Waves missing from an extract of the individual file stay unset
+    interviewed = np.zeros(ind.shape[0], dtype=np.uint64)
+    head = np.zeros(ind.shape[0], dtype=np.uint64)
+    for i, year in enumerate(ids.index):
+        current = ids.loc[year]
+        if current.ind_interview not in ind.columns:
+            continue
+        bit = np.uint64(1) << np.uint64(i)
+        present = (ind[current.ind_interview] > 0).values
+        interviewed[present] |= bit
+
+        #A current head has the head relation code and, after 1968,
+        #sequence number one
+        if current.ind_head not in ind.columns:
+            continue
+        is_head = present & (ind[current.ind_head]
+                             == current.ind_head_num).values
+        if current.ind_seq in ind.columns:
+            is_head &= (ind[current.ind_seq] == 1).values
+        head[is_head] |= bit
+
+    pid, valid = person_ids(ind)
+    interviewed[~valid] = 0
+    head[~valid] = 0
+    return pd.DataFrame({'pid': pid, 'interviewed': interviewed,
+                         'head': head})
+
+
+def load_index(ind, ids, cache=None, sources=()):
+    """
+    A function to load the presence index, building and saving it to cache
+    if it is missing, was built from a different individual file or
+    metadata file, see metadata.digest(), or is older than any of the
+    source files.
+
+    Parameters
+    ----------
+    ind         :   dataframe; the individual file
+    ids         :   dataframe; the PSID id variables, see makeids()
+    cache       :   string; path of the saved index.  Not saved if None.
+    sources     :   list; paths of the data files the index depends on
+
+    """
+    from . import metadata
+
+    digest = metadata.digest()
+    if cache is not None and os.path.isfile(cache):
+        saved = np.load(cache)
+        pid = person_ids(ind)[0]
+        stale = any(os.path.getmtime(f) > os.path.getmtime(cache)
+                    for f in sources if os.path.isfile(f))
+        if not stale and 'metadata' in saved.files\
+                and str(saved['metadata']) == digest\
+                and list(saved['years']) == list(ids.index)\
+                and np.array_equal(saved['pid'], pid):
+            return pd.DataFrame({'pid': saved['pid'],
+                                 'interviewed': saved['interviewed'],
+                                 'head': saved['head']})
+
+    index = build_index(ind, ids)
+    if cache is not None:
+        #Write to a temporary name first so readers never see half a file
+        tmp = (cache + '.' + str(os.getpid()) + '.'
+               + str(threading.get_ident()) + '.tmp.npz')
+        try:
+            np.savez(tmp, pid=index['pid'].values,
+                     interviewed=index['interviewed'].values,
+                     head=index['head'].values, years=np.array(ids.index),
+                     metadata=np.array(digest))
+            os.replace(tmp, cache)
+        except (IOError, OSError):
+            #A read only data directory rebuilds the index on every build
+            pass
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return index
+
+
+def design_filter(index, years, design, heads_only, ids):
+    """
+    A function to resolve the panel design before loading any family file.
+    Returns a boolean array aligned with the rows of the individual file,
+    True for individuals who can still satisfy the design.  The final design
+    check in build_panel still runs on the merged data, this only removes
+    individuals early.  For 'balanced' it keeps the individuals present in
+    any requested wave: the most waves anyone is present in is only known
+    after the sample, the merge and the nonrespondent filter, so the
+    individual file alone cannot rule out anyone else.
+
+    Parameters
+    ----------
+    index       :   dataframe; the presence index, see build_index()
+    years       :   list; years desired
+    design      :   string or integer; see build_panel()
+    heads_only  :   bool; count only waves as current head of household
+    ids         :   dataframe; the PSID id variables, see makeids()
+
+    """
+    bits = index['head' if heads_only else 'interviewed'].values
+    mask = wave_mask(years, ids)
+    count = popcount(bits & mask)
+
+    if design == 'balanced':
+        return count >= 1
+    elif str(design).isdigit():
+        return count >= int(design)
+    return np.ones(bits.shape, dtype=bool)
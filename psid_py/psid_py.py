@@ -7,23 +7,28 @@ Last modified: 23 June, 2015
 This module is based on that by Florian Oswald
 (http://cran.r-project.org/web/packages/psidR/index.html).
 
-This module contains functions build psid data sets.
+This module contains functions build psid data sets.  The download, html
+scraping and sas parsing dependencies are imported by the functions that use
+them, so building a panel from local files does not load them.
 
 """
-import zipfile
+import numbers
 import tempfile
 import shutil
 import os
 import sys
-import re
-import getpass
-from os import listdir, path
+import threading
+from os import path
 from io import BytesIO
 
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-import read_sas
+from . import identifiers
+from . import join
+
+#Guards the frames dictionaries of read_data, and the locks of the files
+#being read into them, so that concurrent builds read each file once
+FRAMES_LOCK = threading.Lock()
+LOADING = {}
 
 
 class SampleError(Exception):
@@ -36,89 +41,17 @@ class SampleError(Exception):
 
 def makeids():
     """
-    A function that hard codes the PSID variable names.
-    Returns a dictionary object containing id's and codes
-    CHANGE: Returns a dataframe indexed by year.
-    """
-    id_list = {'year': range(1968, 1997) + range(1997, 2013, 2)}
-    id_list['ind_interview'] = ["ER30001", "ER30020", "ER30043", "ER30067",
-                                "ER30091", "ER30117", "ER30138", "ER30160",
-                                "ER30188", "ER30217", "ER30246", "ER30283",
-                                "ER30313", "ER30343", "ER30373", "ER30399",
-                                "ER30429", "ER30463", "ER30498", "ER30535",
-                                "ER30570", "ER30606", "ER30642", "ER30689",
-                                "ER30733", "ER30806", "ER33101", "ER33201",
-                                "ER33301", "ER33401", "ER33501", "ER33601",
-                                "ER33701", "ER33801", "ER33901", "ER34001",
-                                "ER34101"]
-
-    id_list['ind_seq'] = ['NA', "ER30021", "ER30044", "ER30068", "ER30092",
-                          "ER30118", "ER30139", "ER30161", "ER30189",
-                          "ER30218", "ER30247", "ER30284", "ER30314",
-                          "ER30344", "ER30374", "ER30400", "ER30430",
-                          "ER30464", "ER30499", "ER30536", "ER30571",
-                          "ER30607", "ER30643", "ER30690", "ER30734",
-                          "ER30807", "ER33102", "ER33202", "ER33302",
-                          "ER33402", "ER33502", "ER33602", "ER33702",
-                          "ER33802", "ER33902", "ER34002", "ER34102"]
-
-    # name of variable "relationship to head"
-    id_list['ind_head'] = ["ER30003",
-                           "ER30022",
-                           "ER30045",
-                           "ER30069",
-                           "ER30093",
-                           "ER30119",
-                           "ER30140",
-                           "ER30162",
-                           "ER30190",
-                           "ER30219",
-                           "ER30248",
-                           "ER30285",
-                           "ER30315",
-                           "ER30345",
-                           "ER30375",
-                           "ER30401",
-                           "ER30431",
-                           "ER30465",
-                           "ER30500",
-                           "ER30537",
-                           "ER30572",
-                           "ER30608",
-                           "ER30644",
-                           "ER30691",
-                           "ER30735",
-                           "ER30808",
-                           "ER33103",
-                           "ER33203",
-                           "ER33303",
-                           "ER33403",
-                           "ER33503",
-                           "ER33603",
-                           "ER33703",
-                           "ER33803",
-                           "ER33903",
-                           "ER34003",
-                           "ER34103"]
-
-    # numeric code for "i am the head"
-    id_list['ind_head_num'] = [1 for x in range(0, 15)]\
-        + [10 for x in range(0, 22)]
-
-    id_list['fam_interview'] = ["V3", "V442", "V1102", "V1802", "V2402",
-                                "V3002", "V3402", "V3802", "V4302", "V5202",
-                                "V5702", "V6302", "V6902", "V7502", "V8202",
-                                "V8802", "V10002", "V11102", "V12502",
-                                "V13702", "V14802", "V16302", "V17702",
-                                "V19002", "V20302", "V21602", "ER2002",
-                                "ER5002", "ER7002", "ER10002", "ER13002",
-                                "ER17002", "ER21002", "ER25002", "ER36002",
-                                "ER42002", "ER47302"]
-    #setkey(id.list,year)
-    return pd.DataFrame(id_list, index=id_list['year'])
-
-
-def get_psid(file, datadir, name, params, c):
+    A function that returns the PSID id variables and codes.  Returns a
+    dataframe indexed by year.  The table is read from the metadata file,
+    see metadata, once per process.
+    """
+    from . import metadata
+
+    return metadata.waves()[['year', 'ind_interview', 'ind_seq', 'ind_head',
+                             'ind_head_num', 'fam_interview']]
+
+
+def get_psid(file, datadir, name, params, c, out_type='csv'):
     """
     A function to connect to the PSID website and download data.
     Uses the requests package instead of curl, as in psidR.
@@ -135,10 +68,9 @@ def get_psid(file, datadir, name, params, c):
         The curl form. NOTE: this is untested and may need to be fixed....
     c       :   requests session object
         A requests session to post to the form.
+    out_type:   string
+        The output format, one of 'csv', 'parquet' or 'npy'.  See storage.
     """
-    #Create a temporary directory to store unzipped files
-    temp_dir = tempfile.mkdtemp() + os.sep
-
     url = 'http://simba.isr.umich.edu/U/Login.aspx?'\
         + 'redir=http%3a%2f%2fsimba.isr.umich.edu%2fU%2fLogout.aspx'
     referer = "http://simba.isr.umich.edu/U/Login.aspx?"\
@@ -152,32 +84,75 @@ def get_psid(file, datadir, name, params, c):
     data = c.get(url, allow_redirects=False,
                  headers={'Referer': referer})
 
-    #Extract all of the zipped sas and txt files
-    zipped = zipfile.ZipFile(BytesIO(data.content))
-    files_to_unzip = (x for x in zipped.namelist()
-                      if any(['.sas' in x, '.txt' in x]))
-
-    for NAME in files_to_unzip:
-        temp_name = zipped.extract(NAME, temp_dir)
-        #If you have just found the dictionary,
-        if temp_name.find('.sas') >= 0:
-            dict_file = str(temp_name)
-        #If you have just found the data
-        else:
-            data_file = str(temp_name)
+    convert_zip(BytesIO(data.content), name, out_type)
+
+    return
+
+
+def convert_zip(zip_file, name, out_type='csv', missing=None, require=None):
+    """
+    A function to read the sas data of a downloaded PSID archive with
+    read_sas, without extracting the data file, and save it.  Returns the
+    path of the saved file.
+
+    Parameters
+    ----------
+    zip_file    :   string or file-like object
+        The zip archive returned by GetFile.aspx.
+    name        :   string
+        The file name to output to.
+    out_type    :   string
+        The output format, one of 'csv', 'parquet' or 'npy'.  See storage.
+    missing     :   dict or string
+        Per variable missing value codes, see read_sas.missing_codes().
+    require     :   list
+        Variables the data must hold.  They are checked against the sas
+        dictionary, raising a catalog.VariableError before the data are
+        read if any is missing.
+    """
+    import zipfile
+    from . import read_sas
+    from . import storage
+
+    #Extract only the sas dictionary, the data are read from the archive
+    temp_dir = tempfile.mkdtemp() + os.sep
+    zipped = zipfile.ZipFile(zip_file)
+    for NAME in zipped.namelist():
+        if '.sas' in NAME:
+            dict_file = zipped.extract(NAME, temp_dir)
+    zipped.close()
+    if hasattr(zip_file, 'seek'):
+        zip_file.seek(0)
+
+    #Check the requested variables before decoding anything
+    if require:
+        from . import catalog
+
+        have = set(read_sas.parse_sas(dict_file, 1)['varname'].dropna()
+                   .astype(str).str.upper())
+        lacking = [x for x in require if str(x).upper() not in have]
+        if lacking:
+            shutil.rmtree(temp_dir)
+            raise catalog.VariableError(path.basename(name) + ' lacks '
+                                        + ', '.join(lacking) + '.')
 
     #Read and process the sas file
-    print('Reading in file number ' + file + '.')
-    x = read_sas.read_sas(data_file, dict_file)
+    print('Reading in ' + path.basename(name) + '.')
+    x = read_sas.read_sas(zip_file, dict_file, zipped=True, missing=missing)
 
-    #Save the data to the data directory
-    x.to_csv(name + '.csv')
+    #Save the data to the data directory, keeping the dictionary types
+    if out_type == 'csv':
+        layout = None
+        value_labels = None
+    else:
+        layout = read_sas.parse_sas(dict_file, 1)
+        value_labels = read_sas.value_labels(dict_file)
+    out = storage.write_frame(x, name, out_type, layout, value_labels)
 
     #Remove the temporary directory
-    #os.removedirs(temp_dir)
     shutil.rmtree(temp_dir)
 
-    return
+    return out
 
 
 def year_isnt_int(YEARS):
@@ -185,16 +160,22 @@ def year_isnt_int(YEARS):
     return any(type(x) != int for x in YEARS)
 
 
-def acquire_ascii_data(years, datadir):
+def ask_credentials(username=None, password=None):
     """
-    A function to open up a requests session and download the sas  data files.
+    A function to confirm the download and prompt for any missing PSID
+    credentials.  Returns (username, password), or None if the user declines.
 
     Parameters
     ----------
-    years       :   list; a list of years to download
-    datadir     :   string; the directory to store output
+    username    :   string; PSID username.  Prompted for if None.
+    password    :   string; PSID password.  Prompted for if None.
 
     """
+    import getpass
+
+    if username is not None and password is not None:
+        return (username, password)
+
     print('WARNING: You have chosen to download the raw ASCII. \n')
     #Check if the user is aware of the time constraint
     if sys.version_info < (3, 0):
@@ -206,158 +187,206 @@ def acquire_ascii_data(years, datadir):
                         + "download.\nAre you sure you would like to "
                         + "continue? (yes or no): ")
     print('\n')
-    if confirm == 'yes':
-        #Read in the username and passwork for PSID
+    if confirm != 'yes':
+        return None
+
+    #Read in the username and passwork for PSID
+    if username is None:
         if sys.version_info < (3, 0):
-            USERNAME = raw_input("Please enter your PSID username: ")
-            PASSWORD = getpass.getpass("Please enter your PSID"
-                                       + " password: ")
+            username = raw_input("Please enter your PSID username: ")
         else:
-            USERNAME = input("Please enter your PSID username: ")
-            PASSWORD = getpass.getpass("Please enter your PSID"
-                                       + " password: ")
-        print('\n')
-
-        #Create a requests session
-        c = requests.Session()
-
-        URL = 'http://simba.isr.umich.edu/u/login.aspx'
-        #USERNAME = 'tyler.abbot@sciencespo.fr'
-        #PASSWORD = 'tyler.abbot'
-
-        #Get the html once to retrieve form variables
-        page = c.get(URL)
-
-        #Use the beautifulsoup package to scrape for form variables
-        soup = BeautifulSoup(page.content)
-        viewstate = soup.findAll("input", {"type": "hidden",
-                                 "name": "__VIEWSTATE"})
-        radscript = soup.findAll("input", {"type": "hidden",
-                                 "name": "RadScriptManager1_TSM"})
-        #eventtarget = soup.findAll("input", {"type": "hidden",
-        #                           "name": "__EVENTTARGET"})
-        #eventargument = soup.findAll("input", {"type": "hidden",
-        #                             "name": " __EVENTARGUMENT"})
-        viewstategenerator = soup.findAll("input", {"type": "hidden",
-                                          "name": "__VIEWSTATEGENERATOR"})
-        eventvalidation = soup.findAll("input", {"type": "hidden",
-                                       "name": "__EVENTVALIDATION"})
-        radscript = soup.findAll("input", {"type": "hidden", "name":
-                                 "RadScriptManager1_TSM"})
-
-        #Gather form data into a single dictionary
-        params = {'RadScriptManager1_TSM': radscript[0]['value'],
-                  '__EVENTTARGET': '',
-                  ' __EVENTARGUMENT': '',
-                  '__VIEWSTATE': viewstate[0]['value'],
-                  '__VIEWSTATEGENERATOR': viewstategenerator[0]['value'],
-                  '__EVENTVALIDATION': eventvalidation[0]['value'],
-                  'ctl00$ContentPlaceHolder1$Login1$UserName': USERNAME,
-                  'ctl00$ContentPlaceHolder1$Login1$Password': PASSWORD,
-                  'ctl00$ContentPlaceHolder1$Login1$LoginButton': 'Log In',
-                  'ctl00_RadWindowManager1_ClientState': ''}
-
-        #Generate index objects for loop
-        family = {'year': range(1968, 1997) + range(1997, 2013, 2),
-                  'file': [1056] + range(1058, 1083) + range(1047, 1052) +
-                  [1040, 1052, 1132, 1139, 1152, 1156]}
-        psidFiles = {'year': [year for year in years if year in
-                     family['year']] + [2011], 'file':
-                     [family['file'][family['year'].index(year)] for year
-                      in years if year in family['year']] + [1053]}
-
-        #Download all the necessary files
-        for i in range(0, len(psidFiles['file']) - 1):
-            get_psid(str(psidFiles['file'][i]), datadir, name=datadir +
-                     'FAM' + str(psidFiles['year'][i]) + 'ER',
-                     params=params, c=c)
-
-        get_psid(str(psidFiles['file'][-1]), datadir, name=datadir
-                 + 'IND' + str(psidFiles['year'][-1]) + 'ER',
-                 params=params, c=c)
-
-        print('Finished downloading files to ' + datadir
-              + '.  Continuing to build the data set.')
-    elif confirm == 'no':
-        pass
+            username = input("Please enter your PSID username: ")
+    if password is None:
+        password = getpass.getpass("Please enter your PSID"
+                                   + " password: ")
+    print('\n')
+    return (username, password)
+
+
+def psid_files(years, datadir):
+    """
+    A function to list the PSID files needed for a set of years.  Returns a
+    dataframe indexed by PSID file number with the year, the type ('ind' or
+    'fam') and the output name of each file.  The individual file comes
+    first so that it is downloaded first.
+
+    Parameters
+    ----------
+    years       :   list; a list of years to download
+    datadir     :   string; the directory to store output
+
+    """
+    from . import metadata
+
+    family = metadata.waves()['fam_file']
+    ind = metadata.individual_file()
+    fam_years = [year for year in years if year in family.index]
+
+    files = {'year': [ind['year']] + fam_years,
+             'type': ['ind'] + ['fam' for year in fam_years],
+             'name': [datadir + ind['name']] + [datadir + 'FAM' + str(year)
+                                                + 'ER' for year in fam_years]}
+    index = [str(ind['file'])] + [str(family[year]) for year in fam_years]
+    return pd.DataFrame(files, index=index)
+
+
+def acquire_ascii_data(years, datadir, username=None, password=None,
+                       concurrency=4, retries=3, base_url=None,
+                       out_type='csv'):
+    """
+    A function to log in to the PSID website and download the sas data files.
+    If both username and password are given, no prompts are issued, so the
+    download can run unattended.
+
+    Parameters
+    ----------
+    years       :   list; a list of years to download
+    datadir     :   string; the directory to store output
+    username    :   string; PSID username.  Prompted for if None.
+    password    :   string; PSID password.  Prompted for if None.
+    concurrency :   integer; the number of simultaneous downloads
+    retries     :   integer; the number of retries per file
+    base_url    :   string; the site root, defaults to the SIMBA website
+    out_type    :   string; the output format, one of 'csv', 'parquet' or
+                    'npy'.  See storage.
+
+    """
+    from . import download
+
+    credentials = ask_credentials(username, password)
+    if credentials is None:
+        return
+
+    files = psid_files(years, datadir)
+
+    #Download all the necessary files concurrently
+    zip_dir = tempfile.mkdtemp()
+    client = download.PSIDClient(credentials[0], credentials[1],
+                                 base_url=base_url or download.SIMBA_URL,
+                                 concurrency=concurrency, retries=retries)
+    try:
+        zips = client.download(list(files.index), zip_dir)
+        for file in files.index:
+            convert_zip(zips[file], files.loc[file, 'name'], out_type)
+    finally:
+        shutil.rmtree(zip_dir)
+
+    print('Finished downloading files to ' + datadir
+          + '.  Continuing to build the data set.')
     return
 
 
-def load_data(datadir, files, years, ftype, verbose):
+def read_data(data_file, ftype, columns=None, frames=None, labels=None):
     """
-    A function to load the data files.
+    A function to read a data file.  When frames is a dictionary, each file
+    is read whole once and kept in it, keyed by path, modification time and
+    labels, so that later calls reuse the loaded data.
+
+    Parameters
+    ----------
+    data_file   :   string; path of the data file
+    ftype       :   string; indicates type of data file
+    columns     :   list; the columns to read.  Reads all columns if None.
+    frames      :   dict; loaded data files to reuse, or None
+    labels      :   bool; convert labeled variables to categoricals sharing
+                    one dtype per table of labels, see labels.  For stata
+                    files None keeps the value labels as pd.read_stata does
+                    and False reads the codes.  Ignored for csv files.
+
+    """
+    if frames is not None:
+        key = (data_file, path.getmtime(data_file), labels)
+        with FRAMES_LOCK:
+            x = frames.get(key)
+            if x is None:
+                loading = LOADING.setdefault((id(frames), key),
+                                             threading.Lock())
+        if x is None:
+            #Other threads wanting the same file wait for this read
+            with loading:
+                with FRAMES_LOCK:
+                    x = frames.get(key)
+                if x is None:
+                    x = read_data(data_file, ftype, labels=labels)
+                    with FRAMES_LOCK:
+                        #Forget older versions of the same file
+                        for old in [k for k in frames
+                                    if k[0] == data_file and k[1] != key[1]]:
+                            del frames[old]
+                        frames[key] = x
+                        LOADING.pop((id(frames), key), None)
+        return x if columns is None else x[columns]
+
+    if ftype == 'stata':
+        if labels is None:
+            return pd.read_stata(data_file, columns=columns)
+        x = pd.read_stata(data_file, columns=columns,
+                          convert_categoricals=labels)
+        if labels:
+            from .labels import share_categories
+            x = share_categories(x)
+        return x
+    elif ftype == 'csv':
+        return pd.read_csv(data_file, usecols=columns)
+    from . import storage
+    return storage.read_frame(data_file, columns, labels=bool(labels))
+
+
+def load_data(datadir, files, years, ftype, verbose, frames=None,
+              columns=None, log=None):
+    """
+    A function to load the data files.  Returns a dataframe of family file
+    paths indexed by year and the individual data.
 
     Parameters
     ----------
     datadir     :   string; directory containing data files
-    files       :   list; data file names
+    files       :   list; data file names, all files of datadir if None
     years       :   list; years desired
     ftype       :   string; indicates type of data file
     verbose     :   bool; verbose output
+    frames      :   dict; loaded data files to reuse, see read_data()
+    columns     :   list; the individual file columns to read, see
+                    catalog.ind_columns().  Reads all columns if None.
+    log         :   file; where output is printed, stdout if None
 
     """
-    if verbose:
-        print('psid_py: loading data.\n')
-    if ftype == 'stata':
-        #Gather the names of all family data files. case insensitive
-        #Simultaneously check that the year is in the requested files
-        fam_dat = [datadir + f for f in files if 'fam' in f.lower()
-                   and int(re.findall("[-+]?\d+[\.]?\d*", f)[0][:-1]) in years]
-
-        #Convert fam_dat to dataframe indexed by year
-        fam_dat = pd.DataFrame(fam_dat, index=years)
-
-        #Gather the individual file and check for multiplicity
-        tmp = [datadir + f for f in files if 'ind' in f.lower()]
-        if len(tmp) > 1:
-            print('WARNING: You have too many individual files.'
-                  'I will take only the last one in the file: '
-                  + tmp[-1])
-            ind_file = datadir + tmp[-1]
-        else:
-            ind_file = tmp[0]
-
-        #Read in the individual data file to dataframe
-        ind = pd.read_stata(ind_file)
-        #NOTE: in psidR he then converts to data table... not sure why
-    elif ftype == 'Rdata':
-        print('Sorry!  For now this has not been implemented.')
-    elif ftype == 'csv':
-        #Gather the names of all family data files. case insensitive
-        #Simultaneously check that the year is in the requested files
-        fam_dat = [datadir + f for f in files if 'fam' in f.lower()
-                   and int(re.findall("[-+]?\d+[\.]?\d*", f)[0]) in years]
-
-        #Sort the list by year
-        fam_dat = sorted(fam_dat, key=lambda x: x[-10:-6])
-
-        #Convert fam_dat to dataframe indexed by year
-        fam_dat = pd.DataFrame(fam_dat, index=years, columns=['fam_file'])
-
-        #Gather the individual file and check for multiplicity
-        tmp = [datadir + f for f in files if 'ind' in f.lower()]
-        if len(tmp) > 1:
-            print('WARNING: You have too many individual files.'
-                  'I will take only the last one in the file: '
-                  + tmp[len(tmp) - 1])
-            ind_file = datadir + tmp[-1]
-        else:
-            ind_file = [datadir + f for f in files if 'ind' in f.lower()][0]
+    from . import catalog
 
-        #Read in the csv files to dataframe
-        ind = pd.read_csv(ind_file)
+    if verbose:
+        print('psid_py: loading data.\n', file=log)
+    if ftype == 'Rdata':
+        print('Sorry!  For now this has not been implemented.', file=log)
+        return
     elif ftype == 'HDF5':
-        print('Sorry! For now this has not been implemented.')
+        print('Sorry! For now this has not been implemented.', file=log)
+        return
+
+    #Look the files up in the catalog of the directory
+    found = catalog.load_catalog(datadir)
+    if files is not None:
+        found = found.loc[[f for f in found.index if f in set(files)]]
+    ftype, fam_files, ind_file = catalog.resolve(found, datadir, years, ftype,
+                                                 log)
+    fam_dat = pd.DataFrame([fam_files[year] for year in years], index=years,
+                           columns=['fam_file'])
+
+    #Read in the individual data file to dataframe, only the columns it has
+    if columns is not None:
+        have = found.loc[path.basename(ind_file), 'columns']
+        if have is not None:
+            columns = [x for x in columns if x in set(have)]
+    ind = read_data(ind_file, ftype, columns, frames)
 
     if verbose:
-        print('Loaded individual file: ' + ind_file)
+        print('Loaded individual file: ' + ind_file, file=log)
         print('Total memory used in MB: '
-              + str((ind.values.nbytes + ind.index.nbytes)/10**6))
+              + str((ind.values.nbytes + ind.index.nbytes)/10**6), file=log)
 
     return (fam_dat, ind)
 
 
-def sub_sampling(yind, ind_vars, YEAR, sample, verbose):
+def sub_sampling(yind, ind_vars, YEAR, sample, verbose, log=None):
     """
     A function to seperate the requested subsample.
 
@@ -368,6 +397,7 @@ def sub_sampling(yind, ind_vars, YEAR, sample, verbose):
     YEAR        :   int; current year
     sample      :   string; the type of subsampling
     verbose     :   bool; verbose output
+    log         :   file; where output is printed, stdout if None
 
     """
     #Seperate latino/immigrant and general samples
@@ -377,27 +407,27 @@ def sub_sampling(yind, ind_vars, YEAR, sample, verbose):
         yind = yind.query('ER30001 < 3000').copy(deep=True)
         if verbose:
             print('The full ' + str(YEAR) + ' sample has '
-                  + str(n) + ' observations.')
+                  + str(n) + ' observations.', file=log)
             print('The SRC subsample you selected has %s' % yind.shape[0]
-                  + ' observations.')
+                  + ' observations.', file=log)
     elif sample == 'SEO':
         #Check number of individuals
         n = yind.shape[0]
         yind = yind.query('ER30001 < 7000 and ER30001 > 5000').copy(deep=True)
         if verbose:
             print('The full ' + str(YEAR) + ' sample has :'
-                  + str(n) + 'observations.')
+                  + str(n) + 'observations.', file=log)
             print('The SEO subsample you selected has %s' % yind.shape[0]
-                  + ' observations.')
+                  + ' observations.', file=log)
     elif sample == 'immigrant':
         #Check number of individuals
         n = yind.shape[0]
         yind = yind.query('ER30001 < 5000 and ER30001 > 3000').copy(deep=True)
         if verbose:
             print('The full ' + str(YEAR) + ' sample has '
-                  + str(n) + ' observations.')
+                  + str(n) + ' observations.', file=log)
             print('The immigrant subsample you selected has %s' % yind.shape[0]
-                  + ' observations.')
+                  + ' observations.', file=log)
     elif sample == 'latino':
         #NOTE: The latino sample is only for 1990 to 1995
         if YEAR < 1990 or YEAR > 1995:
@@ -410,15 +440,15 @@ def sub_sampling(yind, ind_vars, YEAR, sample, verbose):
         yind = yind.query('ER30001 < 9309 and ER30001 > 7000').copy(deep=True)
         if verbose:
             print('The full ' + str(YEAR) + ' sample has '
-                  + str(n) + ' observations.')
+                  + str(n) + ' observations.', file=log)
             print('The latino subsample you selected has %s' % yind.shape[0]
-                  + ' observations.')
-            print(yind.describe())
+                  + ' observations.', file=log)
+            print(yind.describe(), file=log)
 
     return yind
 
 
-def head_of_house(yind, current, verbose):
+def head_of_house(yind, current, verbose, log=None):
     """
     A function to seperate out only heads of household.
 
@@ -427,6 +457,7 @@ def head_of_house(yind, current, verbose):
     yind        :   dataframe; the current years data
     current     :   dataframe; the variable names for current year
     verbose     :   bool; verbose output
+    log         :   file; where output is printed, stdout if None
 
     """
     #Generate two matrices of dummies
@@ -439,13 +470,404 @@ def head_of_house(yind, current, verbose):
     yind = yind.query('headyes == 1')
     if verbose:
         print('Dropping non-current heads of household leaves '
-              + str(yind.shape[0]) + ' observations.')
+              + str(yind.shape[0]) + ' observations.', file=log)
     yind = yind.drop('headyes', axis=1)
     return yind
 
 
+def year_panel(YEAR, ind, fam_file, ftype, fam_vars, ind_vars, ids, sample,
+               heads_only, verbose, keep=None, frames=None, columns=None,
+               normalized=False, labels=None, log=None):
+    """
+    A function to build the panel rows for a single year by merging the
+    individual file onto that year's family file.  With normalized, returns
+    the family rows and the individual rows separately instead, see
+    normalized.NormalizedPanel.
+
+    Parameters
+    ----------
+    YEAR        :   int; current year
+    ind         :   dataframe; the individual file
+    fam_file    :   string; the family file for YEAR
+    ftype       :   string; indicates type of data file
+    fam_vars    :   dataframe; desired family variables, indexed by year
+    ind_vars    :   dataframe; desired individual variables, indexed by year
+    ids         :   dataframe; the PSID id variables, see makeids()
+    sample      :   string; the type of subsampling
+    heads_only  :   bool; keep only current heads of household
+    verbose     :   bool; verbose output
+    keep        :   array; boolean mask of the individuals to use, see
+                    presence.design_filter().  Uses everyone if None.
+    frames      :   dict; loaded data files to reuse, see read_data()
+    columns     :   list; the columns of fam_file, see catalog.  Read from
+                    the file header if None.
+    normalized  :   bool; return (family rows, individual rows) without
+                    merging them
+    labels      :   bool; read the family variables with their value labels,
+                    see read_data()
+    log         :   file; where output is printed, stdout if None
+
+    """
+    if verbose:
+        print('...........................................', file=log)
+        print('Currently working on data for year ' + str(YEAR), file=log)
+
+    #Subsetting ... not clear yet what this is for.
+    current = ids.loc[YEAR]
+    ind_subset = [current.ind_interview, current.ind_seq,
+                  current.ind_head]
+    DEF_subset = ["ER30001", "ER30002"]
+
+    #Individual variables for the current year, in column order
+    ind_names = [x for x in ind_vars.columns if x != 'year']
+    ind_codes = list(ind_vars.loc[YEAR, ind_names])
+
+    #Generate the current year's sample #NOTE: this needs testing
+    if keep is None:
+        yind = ind[DEF_subset + ind_subset + ind_codes].copy(deep=True)
+    else:
+        yind = ind.loc[keep, DEF_subset + ind_subset + ind_codes]\
+            .copy(deep=True)
+
+    if sample is not None:
+        #Seperate the desired subsample
+        yind = sub_sampling(yind, ind_vars, YEAR, sample, verbose, log)
+
+    #Select for head of household only
+    if heads_only:
+        yind = head_of_house(yind, current, verbose, log)
+
+    #Reset column names
+    yind.columns = ['ID1968', 'pernum', 'interview', 'sequence',
+                    'relation_head'] + ind_names
+    #Calculate a unique person identifier
+    yind['pid'] = identifiers.pid_of(yind['ID1968'].values,
+                                     yind['pernum'].values)
+
+    #Load family files and subset them
+    if ftype in ('stata', 'csv', 'parquet', 'npy'):
+        from . import catalog
+
+        #Read only the requested columns, matching names without case
+        if columns is None:
+            columns = catalog.header_columns(fam_file, ftype)
+        wanted = [str(x).lower() for x in fam_vars.loc[YEAR].drop('year')
+                  if x != 'NA']
+        tmp = read_data(fam_file, ftype,
+                        [x for x in columns if str(x).lower() in wanted],
+                        frames, labels)
+    elif ftype == 'Rdata':
+        print('I dont know how you got this far, but this is not yet'
+              + ' implemented!', file=log)
+    elif ftype == 'HDF5':
+        print('I dont know how you got this far, but this is not yet'
+              + ' implemented!', file=log)
+
+    if verbose:
+        print('Loaded family file: ' + str(fam_file), file=log)
+        print('Current memory usage in MB: ' + str((tmp.values.nbytes
+              + tmp.index.nbytes)/10**6), file=log)
+    #Create a set of variable names for the current year
+    curvar = fam_vars.loc[YEAR].drop('year')
+
+    #Convert column names to lower case
+    tmp.columns = list(map(str.lower, tmp.columns))
+    curvar.index = list(map(str.lower, curvar.index))
+
+    #Test if contains NA and if so fix it!
+    if 'NA' in curvar.values:
+        #Return the variable that is NA
+        na = curvar.index[[x for x in range(len(curvar.values))
+                           if curvar.values[x] == 'NA']]
+
+        #Drop the na variables
+        temp_var = curvar.drop(na[0])
+
+        #Copyt the required columns
+        tmp = tmp[temp_var.str.lower()]
+
+        #Name the columns
+        tmp.columns = temp_var.index
+
+        #Replace the na variable with 'NA'
+        tmp[na[0]] = 'NA'
+    else:
+        tmp = tmp[curvar.str.lower()]
+
+        #Set the index and column names for merging
+        tmp.columns = curvar.index
+
+    #Interview numbers as integers, the key of the merge
+    tmp = identifiers.compact_ids(tmp, ['interview'])
+
+    #Remove nonrepspondents and keep the families and individuals which
+    #match each other, as the merge below does
+    if normalized:
+        idx = [x for x in range(len(curvar.values))
+               if curvar.values[x] != 'NA'][0]
+        tmp = tmp.loc[tmp[curvar.index[idx].lower()].notna().values]
+        matched, rows = join.lookup_rows(tmp['interview'].values,
+                                         yind['interview'].values)
+        tmp = tmp.iloc[pd.unique(rows)].copy()
+        yind = yind.iloc[matched].copy()
+        tmp['year'] = YEAR
+        yind['year'] = YEAR
+        return tmp, yind
+
+    #Merge datasets on the unique family interview numbers
+    m = join.interview_join(tmp, yind, on='interview')
+    m['year'] = YEAR
+
+    #Remove nonrepspondents for a given year, whose family variables are
+    #null (NaN, or missing codes read with read_sas(missing=...))
+    idx = [x for x in range(len(curvar.values))
+           if curvar.values[x] != 'NA'][0]
+    m = m.loc[m[curvar.index[idx].lower()].notna().values]
+
+    return m.copy(deep=True)
+
+
+def id_columns(ids):
+    """
+    Return the identifier columns of the individual file, held as integers
+    during a build, see identifiers.
+
+    Parameters
+    ----------
+    ids         :   dataframe; the PSID id variables, see makeids()
+
+    """
+    return (['ER30001', 'ER30002'] + list(ids['ind_interview'])
+            + list(ids['ind_seq']) + list(ids['ind_head']))
+
+
+def design_keep(ind, ids, years, design, heads_only, verbose, cache=None,
+                sources=(), log=None):
+    """
+    A function to resolve the panel design from the presence index before
+    any family file is merged.  Returns a boolean mask over the rows of ind,
+    or None when the design keeps everyone.
+
+    Parameters
+    ----------
+    ind         :   dataframe; the individual file
+    ids         :   dataframe; the PSID id variables, see makeids()
+    years       :   list; years desired
+    design      :   string or integer; see build_panel()
+    heads_only  :   bool; count only waves as current head of household
+    verbose     :   bool; verbose output
+    cache       :   string; path to save the presence index
+    sources     :   list; paths of the data files the index depends on
+    log         :   file; where output is printed, stdout if None
+
+    """
+    from . import presence
+
+    if design == 'all':
+        return None
+    index = presence.load_index(ind, ids, cache, sources)
+    keep = presence.design_filter(index, years, design, heads_only, ids)
+    if verbose:
+        print('The presence index keeps ' + str(keep.sum()) + ' of '
+              + str(keep.shape[0]) + ' individuals for this design.', file=log)
+    return keep
+
+
+def plan_build(fam_vars, design="balanced", datadir=None, ind_vars=None,
+               SAScii=None, heads_only=None, sample=None, verbose=False,
+               log=None):
+    """
+    A function to check the arguments of a build and resolve its inputs
+    before any data are loaded.  Returns a dictionary with the years, the
+    family and individual variables as dataframes indexed by year, the
+    PSID ids, the data directory, the arguments defining the panel and,
+    for data on disk, the catalog, file type, family files, individual file
+    and input files.  Returns None after printing an error.  Arguments are
+    as in build_panel().
+    """
+    #Test if any of the year is not the proper d-type
+    if year_isnt_int(fam_vars['year']):
+        print("ERROR: The year must be entered as an integer.", file=log)
+        return
+    years = fam_vars['year']
+
+    #Test if the design is one build_panel knows
+    if design not in ('balanced', 'all') and (
+            isinstance(design, bool)
+            or not isinstance(design, numbers.Integral)
+            or design < 0):
+        print("ERROR: (build_panel) The design must be 'balanced', 'all' or"
+              " a minimum number of years as an integer.", file=log)
+        return
+
+    #Check the directory seperator used on the current system
+    s = os.sep
+
+    #If ind_vars is empty, add a year
+    if not ind_vars:
+        ind_vars = {'year': years}
+
+    #The arguments which determine the panel, for the result cache
+    plan = {'years': years,
+            'arguments': {'fam_vars': fam_vars, 'ind_vars': ind_vars,
+                          'design': design, 'heads_only': heads_only,
+                          'sample': sample}}
+
+    #Convert fam_vars and ind_vars to dataframes for simplicity
+    #NOTE: setting index for ind_vars even when empty to avoid error
+    fam_vars = pd.DataFrame(fam_vars, index=years)
+    ind_vars = pd.DataFrame(ind_vars, index=years)
+
+    #If no directory is specified, use a temporary one
+    if datadir is None:
+        datadir = tempfile.mkdtemp() + s
+    elif datadir[-1] != s:
+        datadir += s
+
+    #Retrieve a dictionary of ids
+    ids = makeids()
+    if verbose:
+        print('\nThe following are the hardcoded PSID variables:', file=log)
+        print(ids, file=log)
+
+    #Add a family interview variable for the requested year
+    fam_vars['interview'] = ids.loc[fam_vars['year'], 'fam_interview']
+    plan.update({'fam_vars': fam_vars, 'ind_vars': ind_vars, 'ids': ids,
+                 'datadir': datadir, 'SAScii': SAScii})
+    if SAScii:
+        return plan
+
+    #Catalog the data directory, resolving the input files and their type
+    #before reading anything
+    from . import catalog
+
+    found = catalog.load_catalog(datadir)
+    if found.shape[0] == 0:
+        print('ERROR: (build_panel) The datadir is empty.'
+              + '  Please check the path and try again.', file=log)
+        return
+    try:
+        ftype, fam_files, ind_file = catalog.resolve(found, datadir, years,
+                                                     log=log)
+    except catalog.CatalogError as e:
+        print('ERROR: (build_panel) ' + e.value, file=log)
+        return
+
+    #Check every requested variable from the saved file headers
+    try:
+        catalog.check_variables(found, fam_files, ind_file, fam_vars,
+                                ind_vars, ids)
+    except catalog.VariableError as e:
+        print('ERROR: (build_panel) ' + e.value, file=log)
+        return
+
+    plan.update({'catalog': found, 'ftype': ftype, 'fam_files': fam_files,
+                 'ind_file': ind_file,
+                 'files': [fam_files[year] for year in years] + [ind_file]})
+    return plan
+
+
+def year_frames(plan, design="balanced", heads_only=None, sample=None,
+                verbose=False, username=None, password=None, processes=None,
+                out_type='csv', frames=None, normalized=False, labels=None,
+                log=None):
+    """
+    A generator building the panel one year at a time, yielding (year,
+    frame) as soon as each year is ready, or (year, (families,
+    individuals)) with normalized.  Individuals who cannot satisfy
+    the design are dropped from the presence index before merging, the
+    final design check on the number of years present is left to the
+    caller, see build_panel().
+
+    Parameters
+    ----------
+    plan        :   dict; the output of plan_build()
+
+    Other arguments are as in build_panel().
+
+    """
+    years = plan['years']
+    fam_vars = plan['fam_vars']
+    ind_vars = plan['ind_vars']
+    ids = plan['ids']
+    datadir = plan['datadir']
+
+    #Acquire data, building each year as soon as its family file is ready
+    if plan['SAScii']:
+        from . import pipeline
+
+        credentials = ask_credentials(username, password)
+        if credentials is None:
+            return
+        #Variables each file must hold, checked against its sas dictionary
+        #before the file is decoded
+        require = {'ind': []}
+        for YEAR in years:
+            current = ids.loc[YEAR]
+            require[YEAR] = [x for x in fam_vars.loc[YEAR].drop('year')
+                             if x != 'NA']
+            require['ind'] += [x for x in [current.ind_interview,
+                                           current.ind_seq,
+                                           current.ind_head]
+                               + list(ind_vars.loc[YEAR].drop('year'))
+                               if x != 'NA']
+
+        ind = None
+        ready = {}
+        for year, kind, out in pipeline.acquire_iter(
+                years, datadir, credentials[0], credentials[1],
+                processes=processes, out_type=out_type, require=require,
+                log=log):
+            if kind == 'ind':
+                ind = identifiers.compact_ids(
+                    read_data(out, out_type, frames=frames), id_columns(ids))
+                keep = design_keep(ind, ids, years, design, heads_only,
+                                   verbose, log=log)
+            else:
+                ready[year] = out
+            if ind is None:
+                continue
+            for YEAR in sorted(ready):
+                yield YEAR, year_panel(YEAR, ind, ready.pop(YEAR), out_type,
+                                       fam_vars, ind_vars, ids, sample,
+                                       heads_only, verbose, keep, frames,
+                                       normalized=normalized, labels=labels,
+                                       log=log)
+        return
+
+    from . import catalog
+
+    found = plan['catalog']
+    files = plan['files']
+    ftype = plan['ftype']
+
+    #Load data
+    fam_dat, ind = load_data(datadir, [path.basename(f) for f in files],
+                             years, ftype, verbose, frames,
+                             catalog.ind_columns(ind_vars, ids, years), log)
+    ind = identifiers.compact_ids(ind, id_columns(ids))
+
+    #Drop individuals who cannot satisfy the design before merging
+    keep = design_keep(ind, ids, years, design, heads_only, verbose,
+                       cache=datadir + 'psid_presence.npz', sources=files,
+                       log=log)
+
+    #Loop over years cleaning the data
+    for YEAR in years:
+        fam_file = fam_dat.loc[YEAR].iloc[0]
+        yield YEAR, year_panel(YEAR, ind, fam_file, ftype, fam_vars,
+                               ind_vars, ids, sample, heads_only, verbose,
+                               keep, frames,
+                               found.loc[path.basename(fam_file), 'columns'],
+                               normalized, labels, log)
+
+
 def build_panel(fam_vars, design="balanced", datadir=None, ind_vars=None,
-                SAScii=None, heads_only=None, sample=None, verbose=False):
+                SAScii=None, heads_only=None, sample=None, verbose=False,
+                username=None, password=None, processes=None,
+                out_type='csv', frames=None, cache_dir=None,
+                cache_bytes=None, normalized=False, dataset=None,
+                buckets=None, labels=None, log=None):
     """
     A function to build panel data sets from the PSID.
 
@@ -478,7 +900,9 @@ def build_panel(fam_vars, design="balanced", datadir=None, ind_vars=None,
                         'longitud_wgt': ["ER33637", "ER33740"]}
     SAScii          :   boolean
         A true/false boolean determining whether to directly download the
-        ASCII file.  This can take a long time.
+        ASCII file.  This can take a long time.  Files are converted in a
+        process pool while the remaining downloads continue, and each year
+        is built as soon as its family file is ready.
     heads_only      :   boolean
         Indicates inclusion of current household head only or not.
     sample          :   boolean
@@ -490,202 +914,213 @@ def build_panel(fam_vars, design="balanced", datadir=None, ind_vars=None,
             'latino'   => Latino family sample.
     verbose         :   boolean
         True gives verbose output.
+    username        :   string
+        PSID username for SAScii downloads.  Prompted for if None.
+    password        :   string
+        PSID password for SAScii downloads.  Prompted for if None.
+    processes       :   integer
+        The number of processes converting SAScii downloads.  Defaults to
+        the number of cores.
+    out_type        :   string
+        The format SAScii downloads are saved in, one of 'csv', 'parquet'
+        (compressed columnar) or 'npy' (memory mappable binary).
+    frames          :   dict
+        Loaded data files to reuse across calls, keyed by path and
+        modification time.  Pass the same dictionary to repeated builds on
+        the same data to skip reading the files again.
+    cache_dir       :   string
+        A directory of saved panels, see cache.  A build with the same
+        arguments on data files with the same contents as a saved one
+        returns the saved panel.  Not used for SAScii downloads.
+    cache_bytes     :   integer
+        The size limit of cache_dir, least recently used panels being
+        deleted beyond it.  Defaults to cache.MAX_BYTES.
+    normalized      :   boolean
+        Return a normalized.NormalizedPanel holding the family variables
+        once per family and year, and the individual variables with the
+        family interview number, instead of repeating the family variables
+        on every member.  Its denormalize() method returns the usual panel.
+    dataset         :   string
+        A directory to write the panel to as a parquet dataset partitioned
+        by year, see dataset.  Each year is written as soon as it is built
+        and the panel is never held in memory.  Returns the number of rows
+        written by year.  Read it back with dataset.read_dataset().
+    buckets         :   integer
+        With dataset, split each year into this many files by range of pid.
+    labels          :   boolean
+        Convert the family variables whose every value is labeled to
+        categoricals, e.g. 'Married' rather than 1, see labels.  The labels
+        are those of the Stata files, or those saved from the sas
+        dictionaries when parquet and npy files were converted.  Every year
+        shares one categorical type per table of labels, so the panel keeps
+        it.  For Stata files None keeps the pandas default, which converts
+        labeled variables without sharing types, and False reads the codes.
+    log             :   file
+        Where the build prints its progress and errors, e.g. an
+        io.StringIO per build when several run at once.  Defaults to
+        stdout.
 
     """
-    #Test if any of the year is not the proper d-type
-    if year_isnt_int(fam_vars['year']):
-        print("ERROR: The year must be entered as an integer.")
+    plan = plan_build(fam_vars, design, datadir, ind_vars, SAScii,
+                      heads_only, sample, verbose, log)
+    if plan is None:
         return
-    years = fam_vars['year']
-
-    #Check the directory seperator used on the current system
-    s = os.sep
-
-    #If ind_vars is empty, add a year
-    if not ind_vars:
-        ind_vars = {'year': years}
-
-    #Convert fam_vars and ind_vars to dataframes for simplicity
-    #NOTE: setting index for ind_vars even when empty to avoid error
-    fam_vars = pd.DataFrame(fam_vars, index=years)
-    ind_vars = pd.DataFrame(ind_vars, index=years)
-
-    #If no directory is specified, use a temporary one
-    if datadir is None:
-        datadir = tempfile.mkdtemp() + s
-    elif datadir[-1] != s:
-        datadir += s
-
-    #Acquire data
-    if SAScii:
-        acquire_ascii_data(years, datadir)
+    years = plan['years']
 
-    #Given a set of data, either downloaded by psidPy or user supplied
-    #Check the data types in the directory
-    files = [f for f in listdir(datadir) if path.isfile(datadir + f)]
-    if len(files) == 0:
-        print('ERROR: (build_panel) The datadir is empty.'
-              + '  Please check the path and try again.')
+    if dataset is not None and normalized:
+        print('ERROR: (build_panel) A dataset holds the wide panel, please'
+              ' choose either dataset or normalized.', file=log)
         return
 
-    #NOTE: All files must be of the same file type
-    for i in range(0, len(files)):
-        if files[i].endswith('.dta'):
-            ftype = 'stata'
-            break
-        if files[i].endswith('.rda'):
-            ftype = 'Rdata'
-            break
-        if files[i].endswith('.RData'):
-            ftype = 'Rdata'
-            break
-        if files[i].endswith('.csv'):
-            ftype = 'csv'
-            break
-        if files[i].endswith('.hdf'):
-            ftype = 'HDF5'
-            break
-
-    #Load data
-    fam_dat, ind = load_data(datadir, files, years, ftype, verbose)
+    #Return a saved panel of the same build on the same data
+    key = None
+    if cache_dir is not None and not SAScii and dataset is None:
+        from . import cache
+
+        arguments = dict(plan['arguments'], ftype=plan['ftype'])
+        if normalized:
+            arguments['normalized'] = True
+        if labels is not None:
+            arguments['labels'] = labels
+        key = cache.build_key(arguments, plan['files'], cache_dir)
+        panel = cache.load(cache_dir, key)
+        if panel is not None:
+            if verbose:
+                print('Loaded the panel from the cache: ' + key, file=log)
+            return panel
+
+    #Write each year to the dataset as soon as it is built
+    if dataset is not None:
+        from .dataset import DatasetError, DatasetWriter
+
+        try:
+            writer = DatasetWriter(dataset, buckets)
+        except DatasetError as e:
+            print('ERROR: (build_panel) ' + e.value, file=log)
+            return
+        try:
+            for YEAR, frame in year_frames(plan, design, heads_only, sample,
+                                           verbose, username, password,
+                                           processes, out_type, frames,
+                                           labels=labels, log=log):
+                writer.add(YEAR, frame)
+                print(frame.shape, file=log)
+            rows = writer.close(design)
+        except BaseException:
+            writer.abort()
+            raise
+        if verbose:
+            print('\nWrote ' + str(rows.sum()) + ' observations to '
+                  + dataset, file=log)
+        return rows
 
     #Generate dictionary object to fill with data frames
     datas = {}
-
-    #Retrieve a dictionary of ids
-    ids = makeids()
-    if verbose:
-        print('\nThe following are the hardcoded PSID variables:')
-        print(ids)
-
-    #Add a family interview variable for the requested year
-    fam_vars['interview'] = ids.loc[fam_vars['year'], 'fam_interview']
-
-    #Loop over years cleaning the data
-    for YEAR in years:
-        if verbose:
-            print('...........................................')
-            print('Currently working on data for year ' + str(YEAR))
-
-        #Subsetting ... not clear yet what this is for.
-        current = ids.loc[YEAR]
-        ind_subset = [current.ind_interview, current.ind_seq,
-                      current.ind_head]
-        DEF_subset = ["ER30001", "ER30002"]
-
-        #Generate the current year's sample #NOTE: this needs testing
-        yind = ind[DEF_subset + list(set(ind_subset +
-                   list(ind_vars.loc[YEAR].drop('year'))))]\
-            .copy(deep=True)
-
-        if sample is not None:
-            #Seperate the desired subsample
-            yind = sub_sampling(yind, ind_vars, YEAR, sample, verbose)
-
-        #Select for head of household only
-        if heads_only:
-            yind = head_of_house(yind, current, verbose)
-
-        #Reset column names
-        yind.columns = ['ID1968', 'pernum', 'interview', 'sequence',
-                        'relation_head'] + list(ind_vars.columns[:-1])
-        #Calculate a unique person identifier
-        yind['pid'] = yind['ID1968']*1000 + yind['pernum']
-
-        #Set the index as the interview number
-        yind.index = yind['interview']
-
-        #Load family files and subset them
-        if ftype == 'stata':
-            tmp = pd.read_stata(fam_dat.loc[YEAR][0])
-        elif ftype == 'Rdata':
-            print('I dont know how you got this far, but this is not yet'
-                  + ' implemented!')
-        elif ftype == 'csv':
-            tmp = pd.read_csv(fam_dat.loc[YEAR][0])
-        elif ftype == 'HDF5':
-            print('I dont know how you got this far, but this is not yet'
-                  + ' implemented!')
-
-        if verbose:
-            print('Loaded family file: ' + str(fam_dat.loc[YEAR][0]))
-            print('Current memory usage in MB: ' + str((tmp.values.nbytes
-                  + tmp.index.nbytes)/10**6))
-        #Create a set of variable names for the current year
-        curvar = fam_vars.loc[YEAR].drop('year')
-
-        #Convert column names to lower case
-        tmp.columns = map(str.lower, tmp.columns)
-        curvar.index = map(str.lower, curvar.index)
-
-        #Test if contains NA and if so fix it!
-        if 'NA' in curvar.values:
-            #Return the variable that is NA
-            na = curvar.index[[x for x in range(len(curvar.values))
-                               if curvar.values[x] == 'NA']]
-
-            #Drop the na variables
-            temp_var = curvar.drop(na[0])
-
-            #Copyt the required columns
-            tmp = tmp[temp_var.str.lower()]
-
-            #Name the columns
-            tmp.columns = temp_var.index
-
-            #Replace the na variable with 'NA'
-            tmp[na[0]] = 'NA'
-        else:
-            tmp = tmp[curvar.str.lower()]
-
-            #Set the index and column names for merging
-            tmp.columns = curvar.index
-
-        #Merge datasets
-        m = pd.merge(tmp, yind, on='interview')
-        m['year'] = YEAR
-
-        #Remove nonrepspondents for a given year
-        idx = [x for x in range(len(fam_vars.loc[YEAR][curvar]))
-               if fam_vars.loc[YEAR][curvar][x] != 'NA'][0]
-
-        m['isna'] = pd.get_dummies(m[curvar.index[idx].lower()],
-                                   dummy_na=True)[float('nan')]
-        m = m.loc[m.isna == 0].drop('isna', axis=1)
-
-        #Place the year's dataframe into a dictionary
-        datas[YEAR] = m.copy(deep=True)
-        print(datas[YEAR].shape)
+    for YEAR, frame in year_frames(plan, design, heads_only, sample, verbose,
+                                   username, password, processes, out_type,
+                                   frames, normalized, labels, log):
+        datas[YEAR] = frame
+        print(datas[YEAR][1].shape if normalized else datas[YEAR].shape,
+              file=log)
 
     #Generate a single data frame from the datas dict
-    data2 = pd.DataFrame()
-    for df in datas.itervalues():
-        data2 = pd.concat([data2, df])
+    if normalized:
+        families = pd.concat([datas[YEAR][0] for YEAR in years])
+        data2 = pd.concat([datas[YEAR][1] for YEAR in years])
+    else:
+        data2 = pd.concat([datas[YEAR] for YEAR in years])
 
     #Generate a variable for how many years the agent is present
-    data2['present'] = data2[['year', 'pid']]\
-        .groupby(['pid']).transform('count')
+    data2['present'] = identifiers.count_by(data2['pid'].values)
 
     #Work on design of the study
     if design == 'balanced':
         n = data2.shape[0]
-        print(max(data2['present']))
+        print(max(data2['present']), file=log)
         data2 = data2[data2['present'] ==
                       max(data2['present'])].copy(deep=True)
         if verbose:
             print("\nBalanced panel reduces sample"
-                  " from %s to %s" % (n, data2.shape[0]))
+                  " from %s to %s" % (n, data2.shape[0]), file=log)
     elif str(design).isdigit():
         n = data2.shape[0]
         data2 = data2[data2['present'] >= design].copy(deep=True)
         if verbose:
             print("\nDesign choice reduces sample"
-                  " from %s to %s observations" % (n, data2.shape[0]))
+                  " from %s to %s observations" % (n, data2.shape[0]),
+                  file=log)
     elif design == 'all':
         pass
 
+    if normalized:
+        from .normalized import NormalizedPanel
+
+        #Keep only the families of the remaining individuals
+        families = families.set_index(['year', 'interview'])
+        used = pd.MultiIndex.from_arrays([data2['year'], data2['interview']])
+        data2 = NormalizedPanel(families[families.index.isin(used)], data2)
+
+    if key is not None:
+        cache.store(cache_dir, key, data2, cache_bytes or cache.MAX_BYTES)
+
     if verbose:
-        print('\n\nEnd of build_panel\n\n')
-        print('====================')
+        print('\n\nEnd of build_panel\n\n', file=log)
+        print('====================', file=log)
 
     return data2
+
+
+def build_union(fam_vars, datadir=None, ind_vars=None, verbose=False,
+                frames=None, labels=None, log=None):
+    """
+    A function to build the panel of every individual in every requested
+    year once, from which the panels of many sample, heads_only and design
+    combinations are selected with boolean masks, see variants.  Returns a
+    variants.UnionPanel, or None after printing an error.  Data must be in
+    datadir, download them first with a SAScii build.
+
+    Parameters
+    ----------
+    fam_vars        :   dict of list; as in build_panel()
+    datadir         :   string; directory containing data files
+    ind_vars        :   dict of list; as in build_panel()
+    verbose         :   boolean; True gives verbose output
+    frames          :   dict; loaded data files to reuse, see read_data()
+    labels          :   boolean; see build_panel()
+    log             :   file; where output is printed, stdout if None
+
+    """
+    from . import catalog
+    from . import presence
+    from .variants import UnionPanel
+
+    if datadir is None:
+        print('ERROR: (build_union) Please give the datadir holding the'
+              ' data files.', file=log)
+        return
+    plan = plan_build(fam_vars, 'all', datadir, ind_vars, verbose=verbose,
+                      log=log)
+    if plan is None:
+        return
+    years = plan['years']
+    if frames is None:
+        frames = {}
+
+    datas = dict(year_frames(plan, 'all', verbose=verbose, frames=frames,
+                             labels=labels, log=log))
+    data = pd.concat([datas[YEAR] for YEAR in years])
+
+    #The presence index of the individual file, read again from frames
+    ind = load_data(plan['datadir'],
+                    [path.basename(f) for f in plan['files']], years,
+                    plan['ftype'], False, frames,
+                    catalog.ind_columns(plan['ind_vars'], plan['ids'],
+                                        years), log)[1]
+    index = presence.load_index(ind, plan['ids'],
+                                plan['datadir'] + 'psid_presence.npz',
+                                plan['files'])
+
+    if verbose:
+        print('\nBuilt the union panel of ' + str(data.shape[0])
+              + ' observations.', file=log)
+    return UnionPanel(data, index, years, plan['ids'])
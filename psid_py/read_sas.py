@@ -11,133 +11,225 @@ This module contains functions to read in a two part SAS dataset containing
 an ASCII data file and a .sas file of instructions.
 
 """
+import itertools
 import re
+import json
 import os
-import tempfile
+import struct
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 
 
-def first_clean_up(lines):
-    """
-    A function to remove line delimiters, comments, tabs, etc. from the
-    .sas dictionary file.
+#Pieces of a dictionary: the start of the INPUT statement, block comments
+#closed on the line they open, and the tokens of a variable definition
+INPUT = re.compile(r'(?:^|;)\s*INPUT\b')
+COMMENT = re.compile(r'/\*.*?\*/')
+TOKEN = re.compile(r'\$|[^\s$\-;]+')
+
+#Bytes of a stream decoded at a time, see read_records()
+STREAM_BYTES = 2**24
 
-    Parameters
-    ----------
-    lines    :   list of strings; the raw file
-
-    """
-    #Remove all tabs from the string
-    for i in range(0, len(lines)):
-        lines[i] = re.sub('\t', ' ', lines[i])
-        lines[i] = re.sub('\r', '', lines[i])
-        lines[i] = re.sub('\n', '', lines[i])
-
-    #Remove all comments from the code
-    start_comment = 0
-    for i in range(0, len(lines)):
-        if lines[i].find('/*') >= 0:
-            start_comment = i
-        elif lines[i].find('*/') >= 0:
-            lines[start_comment] = lines[start_comment]\
-                .replace('/*', '')
-            lines[start_comment] = lines[start_comment]\
-                .replace('*', '')
-            lines[i] = lines[i].replace('*/', '')
-            lines[i] = lines[i].replace('*', '')
-            if i > start_comment + 1:
-                lines[start_comment + 1:i] = ['' for x in
-                                              range(start_comment+1, i)]
-    for i in range(0, len(lines)):
-        lines[i] = lines[i].replace('*', '')
-    return lines
-
-
-def find_input(lines):
-    """
-    A function to find the the word INPUT, indicating the start of variables.
+
+def input_tokens(lines):
+    """
+    A function to read the variable definitions of a .sas dictionary file
+    in a single pass.  Block comments are dropped, whatever the number of
+    lines they span, and reading stops at the ; ending the INPUT statement,
+    so the rest of the file is never read.  Returns the upper case tokens of
+    the INPUT statement.
 
     Parameters
     ----------
-    lines    :   list of strings; the raw file
+    lines       :   iterable of strings; the lines of the file, e.g. an open
+                    file
 
     """
-    #Find the first line containing the word 'INPUT', which indicates variables
-    for i in range(0, len(lines)):
-        if lines[i].find('INPUT') < 0:
-            pass
-        else:
-            firstline = i
+    tokens = []
+    started = False
+    in_comment = False
+    for line in lines:
+        #Drop block comments, which may span any number of lines
+        if in_comment:
+            end = line.find('*/')
+            if end < 0:
+                continue
+            line = line[end + 2:]
+            in_comment = False
+        if '/*' in line:
+            line = COMMENT.sub(' ', line)
+            start = line.find('/*')
+            if start >= 0:
+                line = line[:start]
+                in_comment = True
+        line = line.upper()
+
+        #Skip everything before the INPUT statement
+        if not started:
+            found = INPUT.search(line)
+            if found is None:
+                continue
+            line = line[found.end():]
+            started = True
+
+        #Stop at the end of the statement
+        end = line.find(';')
+        if end >= 0:
+            tokens += TOKEN.findall(line[:end])
             break
-    return firstline
+        tokens += TOKEN.findall(line)
+    return tokens
 
 
-def find_semicolon(lines, firstline):
-    """
-    A function to find the the first semicolon, indicating the end of
-    the first variable definition.
+#Tokens of PROC FORMAT and FORMAT statements: quoted strings, punctuation
+#and words
+LABEL_TOKEN = re.compile(r'"(?:[^"]|"")*"|\'(?:[^\']|\'\')*\'|[;=,()\-]|'
+                         r'[^\s;=,()\'"\-]+')
+BLOCK_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+FORMAT_NAME = re.compile(r'^(\$?[A-Z_][A-Z0-9_]*?)\d*\.\d*$')
 
-    Parameters
-    ----------
-    lines       :       list of strings; the raw file
-    firstline   :       integer; the index of the start of the first line
 
-    """
-    #Find the first line containing the word 'INPUT', which indicates variables
-    for i in range(firstline, len(lines)):
-        if lines[i].find(';') < 0:
-            pass
-        else:
-            lastline = i
-            break
-    return lastline
+def unquote(token):
+    """Return a quoted sas string without its quotes."""
+    if token[:1] in ('"', "'") and token[-1:] == token[:1]:
+        return token[1:-1].replace(token[:1]*2, token[:1])
+    return token
 
 
-def second_clean_up(lines, firstline, lastline):
+def format_values(tokens, char):
     """
-    A function to remove all the variable definition information and seperate
-    the file into individual entries.  It returns a list object containing
-    lines from the sas variable definition section.
+    A function to read the code = label pairs of a VALUE statement.
+    Returns a dictionary of label by code.  Codes of ranges of integers are
+    expanded, OTHER, LOW and HIGH are skipped.
 
     Parameters
     ----------
-    lines       :   list of strings; the raw file
-    firstline   :   integer; the index of the start of variable definition
-    lastline    :   integer; the index of the end of variable definition
+    tokens      :   list; the tokens after the format name, up to the ;
+    char        :   bool; the format is a character ($) format
 
     """
-    #Extract the fixed width file (FWF) input lines
-    FWFlines = lines[firstline:lastline + 1]
-
-    #Remove the INPUT command and the trailing ';'
-    FWFlines[0] = FWFlines[0].replace('INPUT', '')
-    FWFlines[len(FWFlines) - 1] = FWFlines[len(FWFlines) - 1]\
-        .replace(';', '')
-
-    #Add spaces around of all dollar signs and dashes
-    #NOTE: Is this necessary?
-    for i in range(0, len(FWFlines)):
-        FWFlines[i] = FWFlines[i].replace('$', ' $ ')
-        FWFlines[i] = FWFlines[i].replace('-', ' - ')
+    def code(token, sign=''):
+        token = unquote(token)
+        if char:
+            return token.strip()
+        try:
+            return float(sign + token)
+        except ValueError:
+            return None
+
+    table = {}
+    spec = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == '=':
+            label = unquote(tokens[i + 1]) if i + 1 < len(tokens) else ''
+            values = []
+            for part in ' '.join(spec).split(','):
+                words = part.split()
+                #A negative code, a range a - b or a single code
+                if '-' in words and not char:
+                    k = words.index('-')
+                    if k == 0:
+                        values.append(code(''.join(words[1:2]), '-'))
+                        continue
+                    low, high = code(words[k - 1]), code(words[k + 1])\
+                        if k + 1 < len(words) else None
+                    if None not in (low, high) and high - low <= 10000\
+                            and low == int(low) and high == int(high):
+                        values += [float(v) for v in range(int(low),
+                                                           int(high) + 1)]
+                elif words:
+                    values.append(code(' '.join(words)))
+            for v in values:
+                if v is not None:
+                    table[v] = label
+            spec = []
+            i += 2
+            continue
+        spec.append(token)
+        i += 1
+    return table
 
-    #Remove all blank lines
-    FWFlines = [x for x in FWFlines if not x.isspace()]
 
-    #Split the string
-    z = [x.split(' ') for x in FWFlines]
+def value_labels(dict_file):
+    """
+    A function to read the value labels of a .sas dictionary file: the
+    VALUE tables of PROC FORMAT and the formats given to variables by
+    FORMAT statements or FORMAT= attributes.  Returns a dictionary of label
+    tables by format name, each a dictionary of label by code, and a
+    dictionary of format name by variable.  Both are empty if the file has
+    no value labels.  See labels.apply_labels().
 
-    #Initiate a character list
-    sas_input_lines = []
+    Parameters
+    ----------
+    dict_file   :   string; file path. Must be a .sas dictionary file
 
-    #Throw out empty characters and then concatenate lines
-    for i in range(0, len(z)):
-        for k in range(0, len(z[i])):
-            z[i][k] = z[i][k].replace('-', '')
-            z[i][k] = z[i][k].replace(' ', '')
-        z[i] = [x for x in z[i] if x != '']
-        sas_input_lines += z[i]
-    return sas_input_lines
+    """
+    with open(dict_file) as f:
+        text = BLOCK_COMMENT.sub(' ', f.read())
+
+    tables = {}
+    assigned = {}
+    statement = []
+    for token in LABEL_TOKEN.findall(text):
+        if token != ';':
+            statement.append(token)
+            continue
+        words = [x.upper() if x[:1] not in ('"', "'") else x
+                 for x in statement]
+        statement = []
+        if not words:
+            continue
+
+        #VALUE name (options) code = label ... inside PROC FORMAT
+        if words[0] == 'PROC' and words[1:2] == ['FORMAT']:
+            words = words[2:]
+            while words and words[0] != 'VALUE':
+                words = words[1:]
+            if not words:
+                continue
+        if words[0] == 'VALUE' and len(words) > 1:
+            name = words[1]
+            rest = words[2:]
+            if rest[:1] == ['(']:
+                rest = rest[rest.index(')') + 1:] if ')' in rest else []
+            tables[name] = format_values(rest, name.startswith('$'))
+
+        #FORMAT var1 var2 name. ...
+        elif words[0] == 'FORMAT':
+            names = []
+            for word in words[1:]:
+                found = FORMAT_NAME.match(word)
+                if found is None:
+                    names.append(word)
+                    continue
+                for var in names:
+                    assigned[var] = found.group(1)
+                names = []
+
+        #ATTRIB var LABEL="..." FORMAT=name. ...
+        elif words[0] == 'ATTRIB':
+            var = None
+            i = 1
+            while i < len(words):
+                if i + 1 < len(words) and words[i + 1] == '=':
+                    if words[i] == 'FORMAT' and var is not None\
+                            and i + 2 < len(words):
+                        found = FORMAT_NAME.match(words[i + 2])
+                        if found is not None:
+                            assigned[var] = found.group(1)
+                    i += 3
+                else:
+                    var = words[i]
+                    i += 1
+
+    #Keep only the formats with a table, e.g. not F4. or 8.2
+    assigned = dict((var, name) for var, name in assigned.items()
+                    if name in tables)
+    return tables, assigned
 
 
 def ampersand_parse(sas_input_lines, DF):
@@ -158,37 +250,37 @@ def ampersand_parse(sas_input_lines, DF):
         #Check the width of the variable definition
         #Skip the first time
         if i > 0:
-            if DF['start'][j-1] + DF['width'][j-1] < start_point:
-                DF['width'][j] = DF['start'][j-1] + DF['width'][j-1]\
-                    - start_point
+            if DF.loc[j-1, 'start'] + DF.loc[j-1, 'width'] < start_point:
+                DF.loc[j, 'width'] = DF.loc[j-1, 'start']\
+                    + DF.loc[j-1, 'width'] - start_point
                 j += 1
 
         #Set first word to variable name
-        DF['start'][j] = start_point
-        DF['varname'][j] = sas_input_lines[i+1]
+        DF.loc[j, 'start'] = start_point
+        DF.loc[j, 'varname'] = sas_input_lines[i+1]
 
         #If there is a dollar sign, record character type
         if sas_input_lines[i+2] == '$':
-            DF['char']['j'] = True
+            DF.loc[j, 'char'] = True
             i += 1
         else:
-            DF['char'][j] = False
+            DF.loc[j, 'char'] = False
 
         #Remove leading f and char
         for k in ['F', 'CHAR']:
             sas_input_lines[i+2] = sas_input_lines[i+2].replace(k, '')
 
-        #If the length has a period, split it
-        try:
-            if sas_input_lines[i+2].find('.') >= 0:
-                period = sas_input_lines[i+2].find('.')
-                DF['width'][j] = int(sas_input_lines[i+2][0:period])
-                DF['divisor'][j] = 1/10**int(sas_input_lines[period+1:])
-        except IndexError:
-            pass
+        #If the length has a period, split it into the width and the
+        #number of implied decimal places
+        token = sas_input_lines[i+2]
+        period = token.find('.')
+        if period >= 0:
+            DF.loc[j, 'width'] = int(token[0:period])
+            places = token[period+1:]
+            DF.loc[j, 'divisor'] = 1/10**int(places) if places else 1
         else:
-            DF['width'][j] = int(sas_input_lines[i+2])
-            DF['divisor'][j] = 1
+            DF.loc[j, 'width'] = int(token)
+            DF.loc[j, 'divisor'] = 1
 
         i += 3
         j += 1
@@ -210,30 +302,29 @@ def widths_not_places_parse(sas_input_lines, DF):
 
     while i < len(sas_input_lines):
         #Set first word to variable name
-        DF['varname'][j] = sas_input_lines[i]
+        DF.loc[j, 'varname'] = sas_input_lines[i]
 
         #If there's a $ between first word and fist number, record as char
         if sas_input_lines[i+1] == '$':
-            DF['width'][j] = int(sas_input_lines[i+2])
-            DF['char'][j] = True
+            DF.loc[j, 'width'] = int(sas_input_lines[i+2])
+            DF.loc[j, 'char'] = True
             i += 3
         #Else record as numeric type
         else:
-            DF['width'][j] = int(sas_input_lines[i+2])
-            DF['char'][j] = False
+            DF.loc[j, 'width'] = int(sas_input_lines[i+2])
+            DF.loc[j, 'char'] = False
             i += 2
 
-        #Search for a divisor
+        #Search for a divisor, one by default
+        DF.loc[j, 'divisor'] = 1
         try:
             if sas_input_lines[i].find('.') >= 0:
                 period = sas_input_lines[i].find('.')
                 divisor = int(sas_input_lines[i][period+1:])
-                DF['divisor'][j] = 1/10**divisor
+                DF.loc[j, 'divisor'] = 1/10**divisor
                 i += 1
         except IndexError:
             pass
-        else:
-            DF['divisor'][j] = 1
 
         j += 1
     return DF
@@ -249,71 +340,54 @@ def hash_parse(sas_input_lines, DF):
     DF              :   DataFrame; the dataframe to fill
 
     """
-    #Initialize positional counters
-    i = j = 0
+    #Collect the rows as lists and build the frame once, as growing a frame
+    #one row at a time is quadratic in the number of variables
+    rows = []
 
+    #Initialize positional counter
+    i = 0
     while i < len(sas_input_lines):
         #Set first word to variable name
-        DF.loc[j, 'varname'] = sas_input_lines[i]
+        varname = sas_input_lines[i]
 
         #If there is a $, char type
-        if sas_input_lines[i+1] == '$':
-            DF['start'] = int(sas_input_lines[i+2])
-
-            #Check the width
-            if any([not sas_input_lines[i+3].isdigit(),
-                    sas_input_lines[i+3].find('.') >= 0]):
-                DF['end'][j] = DF['start'][j]
-                i -= 1
-            else:
-                DF['end'][j] = int(sas_input_lines[i+3])
-            DF['char'][j] = True
-            i += 4
-        #Otherwise type numeric
+        char = sas_input_lines[i+1] == '$'
+        if char:
+            i += 1
+        start = int(sas_input_lines[i+1])
+
+        #Check the width
+        if not sas_input_lines[i+2].isdigit():
+            end = start
+            i -= 1
         else:
-            DF['start'][j] = int(sas_input_lines[i+1])
-
-            #Check the width
-            if any([not sas_input_lines[i+2].isdigit(),
-                   sas_input_lines[i+2].find('.') >= 0]):
-                DF['end'][j] = DF['start'][j]
-                i -= 1
-            else:
-                DF['end'][j] = int(sas_input_lines[i+2])
-            DF['char'][j] = False
-            i += 3
-        #print(i, DF.shape, len(sas_input_lines))
-        #Check for a divisor
+            end = int(sas_input_lines[i+2])
+        i += 3
+
+        #Check for a divisor, one by default
+        divisor = 1
         try:
             if sas_input_lines[i].find('.') >= 0:
                 period = sas_input_lines[i].find('.')
-                divisor = int(sas_input_lines[i][period+1:])
-                DF['divisor'][j] = 1/10**divisor
+                divisor = 1/10**int(sas_input_lines[i][period+1:])
                 i += 1
         except IndexError:
             pass
-        else:
-            DF['divisor'][j] = 1
-
-        #For higher rows
-        if j > 0:
-            #If the start of current row is higher than previous end + 1
-            #add space
-            if int(DF['start'][j]) > int(DF['end'][j-1]) + 1:
-                tempDF = pd.DataFrame(DF.loc[0]).copy().transpose()
-                tempDF.loc[0] = None
-                DF = pd.concat([DF.loc[:j-1], tempDF, DF.loc[j:]])
-                j += 1
-                DF.index = range(0, DF.shape[0])
-                DF['start'][j-1] = int(DF['end'][j-2]) + 1
-                DF['end'][j-1] = int(DF['start'][j]) - 1
-        j += 1
+
+        #If the start of current row is higher than previous end + 1
+        #add space
+        if rows and start > rows[-1][1] + 1:
+            rows.append([rows[-1][1] + 1, start - 1, None, None, None,
+                         None])
+        rows.append([start, end, None, varname, char, divisor])
+
+    DF = pd.DataFrame(rows, columns=DF.columns, dtype=object)
 
     #Calculate the width
     DF['width'] = DF['end'] - DF['start'] + 1
+
     #Replace missing variable names with negative number
-    dummy_for_missing = pd.get_dummies(DF['varname'],
-                                       dummy_na=True)[None]*(-2) + 1
+    dummy_for_missing = DF['varname'].isnull()*(-2) + 1
     DF['width'] = DF['width']*dummy_for_missing
 
     return DF
@@ -330,33 +404,11 @@ def parse_sas(dict_file, beginline=0, lrecl=None):
     lrecl       :   integer; the record length
 
     """
-    #Open the dictionary file
-    file = open(dict_file)
-
-    #Read the entire file into a string
-    sas_input = file.readlines()
-
-    #Close the file so you don't screw it up
-    file.close()
-
-    #Start at the user specified begin line
-    sas_input = sas_input[beginline:]
-
-    #Clean up the file
-    sas_input = first_clean_up(sas_input)
-
-    #Convert to upper case
-    sas_input = [x.upper() for x in sas_input]
-
-    #Find the first line containing the word 'INPUT', which indicates variables
-    firstline = find_input(sas_input)
-
-    #Find the first ; following input.  This indicates the end of variable
-    #definition
-    lastline = find_semicolon(sas_input, firstline)
-
-    #Finish cleaning up
-    sas_input_lines = second_clean_up(sas_input, firstline, lastline)
+    #Read the variable definitions, starting at the user specified begin
+    #line and stopping at the end of the INPUT statement
+    with open(dict_file) as file:
+        sas_input_lines = input_tokens(itertools.islice(file, beginline,
+                                                        None))
 
     #Create FWF structure file
     columns = ['start', 'end', 'width', 'varname', 'char', 'divisor']
@@ -392,13 +444,434 @@ def parse_sas(dict_file, beginline=0, lrecl=None):
         if lrecl > DF['width'].abs().sum():
             #Add blank space to fill the difference
             length_of_blank = lrecl - DF['width'].abs().sum()
-            DF['width'][DF.shape[0]-1] = length_of_blank
+            DF.loc[DF.shape[0]-1, 'width'] = length_of_blank
 
     return DF
 
 
+def column_specs(DF):
+    """
+    A function to locate every named variable of a parsed dictionary in the
+    record.  Returns the rows of DF with a variable name and a 'start'
+    column holding the zero based offset of each variable.  Unnamed rows
+    (negative widths) are gaps that are skipped.
+
+    Parameters
+    ----------
+    DF          :   DataFrame; the output of parse_sas
+
+    """
+    widths = DF['width'].astype(int).abs()
+    specs = DF.copy()
+    specs['width'] = widths
+    specs['start'] = widths.cumsum() - widths
+    specs = specs.dropna(subset=['varname'])
+    specs.index = range(0, specs.shape[0])
+    return specs
+
+
+def record_length(data_file):
+    """
+    A function to find the length in bytes of one record of a fixed width
+    file, including the line terminator.
+
+    Parameters
+    ----------
+    data_file   :   string; .txt data file
+
+    """
+    with open(data_file, 'rb') as f:
+        return len(f.readline())
+
+
+def record_ranges(size, reclen, chunk_bytes):
+    """
+    A function to split a fixed width file into byte ranges holding whole
+    records.  Returns a list of (offset, number of records).
+
+    Parameters
+    ----------
+    size        :   integer; the file size in bytes
+    reclen      :   integer; the record length, see record_length()
+    chunk_bytes :   integer; the approximate size of each range
+
+    """
+    #The last record may lack its line terminator
+    nrecords = -(-size//reclen) if reclen else 0
+    per_chunk = max(1, chunk_bytes//max(reclen, 1))
+    return [(first*reclen, min(per_chunk, nrecords - first))
+            for first in range(0, nrecords, per_chunk)]
+
+
+def decode_numeric(block):
+    """
+    A function to decode a numeric field from the bytes of every record.
+    Right aligned integers, the layout of PSID data files, are decoded with
+    array arithmetic; anything else falls back to parsing the text.  Returns
+    a float array with NaN for blank fields.
+
+    Parameters
+    ----------
+    block       :   array; uint8 array with one row of field bytes per record
+
+    """
+    block = np.ascontiguousarray(block)
+    width = block.shape[1]
+    digits = block - np.uint8(ord('0'))
+    is_digit = digits < 10
+    is_space = block == ord(' ')
+    is_minus = block == ord('-')
+    filled = ~is_space
+    simple = width <= 18 and (is_digit | is_space | is_minus).all()
+    if simple and width > 1:
+        #Characters must run without gaps to the end of the field, with a
+        #minus sign only in front
+        simple = (filled[:, 1:] >= filled[:, :-1]).all()\
+            and not (is_minus[:, 1:] & filled[:, :-1]).any()
+    if not simple:
+        text = block.view('S' + str(width)).ravel()
+        return pd.to_numeric(pd.Series(np.char.strip(text).astype(str)),
+                             errors='coerce').values.astype(float)
+
+    #Accumulate the digits from the left, blanks and signs counting as zero
+    digits[~is_digit] = 0
+    values = np.zeros(block.shape[0], dtype=np.int64)
+    for j in range(0, width):
+        values *= 10
+        values += digits[:, j]
+    values = values.astype(float)
+    values[is_minus.any(axis=1)] *= -1
+    values[~is_digit.any(axis=1)] = np.nan
+    return values
+
+
+def decode_char(block):
+    """
+    A function to decode a character field from the bytes of every record.
+    Returns an object array of stripped strings with NaN for blank fields.
+
+    Parameters
+    ----------
+    block       :   array; uint8 array with one row of field bytes per record
+
+    """
+    text = np.ascontiguousarray(block).view('S' + str(block.shape[1]))
+    text = np.char.strip(text.ravel()).astype(str).astype(object)
+    text[text == ''] = np.nan
+    return text
+
+
+def missing_codes(missing):
+    """
+    A function to normalise a missing value specification.  Returns a
+    dictionary mapping upper case variable names to arrays of codes.
+
+    Parameters
+    ----------
+    missing     :   dict or string; variable names mapped to lists of the
+                    codes meaning missing for that variable (e.g. 9999999,
+                    or 0 for 'inappropriate'), or the path of a json file
+                    holding such a dictionary
+
+    """
+    if missing is None:
+        return None
+    if not isinstance(missing, dict):
+        with open(missing) as f:
+            missing = json.load(f)
+    return dict((str(name).upper(), np.asarray(codes, dtype=float).ravel())
+                for name, codes in missing.items())
+
+
+def decode_group(blocks, group, skip_decimal_division=None,
+                 missing=None):
+    """
+    A function to decode a group of variables from blocks of records.
+    Returns a list of (name, values).
+
+    With a missing value specification numeric variables are returned as
+    nullable arrays: blank fields and the variable's missing codes are null,
+    and variables without implied decimals are integers.
+
+    Parameters
+    ----------
+    blocks      :   list; uint8 arrays with one row of bytes per record
+    group       :   DataFrame; rows of the output of column_specs
+    skip_decimal_division   :   bool; do not apply the implied decimals of
+                                the dictionary
+    missing     :   dict; the output of missing_codes
+    """
+    out = []
+    for name, start, width, char, divisor in zip(
+            group['varname'], group['start'], group['width'], group['char'],
+            group['divisor']):
+        start, width = int(start), int(width)
+        decode = decode_char if char else decode_numeric
+        parts = [decode(b[:, start:start + width]) for b in blocks]
+        values = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if char:
+            out.append((str(name), values))
+            continue
+
+        #Codes are compared with the values as recorded, before division
+        if missing is not None:
+            null = np.isnan(values)
+            codes = missing.get(str(name).upper())
+            if codes is not None and codes.shape[0]:
+                null |= np.isin(values, codes)
+        if not skip_decimal_division and float(divisor) != 1:
+            values *= float(divisor)
+        if missing is None:
+            out.append((str(name), values))
+        elif (values[~null] == np.floor(values[~null])).all():
+            out.append((str(name), pd.arrays.IntegerArray(
+                np.where(null, 0, values).astype(np.int64), null)))
+        else:
+            out.append((str(name), pd.arrays.FloatingArray(
+                np.where(null, 0, values), null)))
+    return out
+
+
+def stream_chunks(stream, chunk_bytes=STREAM_BYTES):
+    """
+    A generator reading a binary stream in pieces of whole records, from its
+    current position to its end.  Yields (bytes, reclen), at least once.
+    The record length is that of the first line.
+
+    Parameters
+    ----------
+    stream      :   file-like object; an open binary stream
+    chunk_bytes :   integer; the bytes of each piece, rounded down to whole
+                    records
+
+    """
+    #Streams may return fewer bytes than asked for
+    pending = bytearray()
+    newline = -1
+    while newline < 0 and len(pending) < 2**20:
+        more = stream.read(2**20 - len(pending))
+        if not more:
+            break
+        pending += more
+        newline = pending.find(b'\n')
+    if newline < 0:
+        #A single record without its line terminator
+        pending += stream.read()
+        yield bytes(pending), len(pending)
+        return
+    reclen = newline + 1
+    size = max(1, chunk_bytes//reclen)*reclen
+    while True:
+        while len(pending) < size:
+            more = stream.read(size - len(pending))
+            if not more:
+                break
+            pending += more
+        if not pending:
+            return
+        yield bytes(pending[:size]), reclen
+        del pending[:size]
+
+
+def decode_records(buf, reclen, specs, skip_decimal_division=None,
+                   workers=1, missing=None):
+    """
+    A function to decode whole records held in a byte array.  Returns a
+    dictionary of the values of each variable.  Arguments are as in
+    read_records(), missing being the output of missing_codes().
+    """
+    #View the records as a matrix, padding a last record that lacks its
+    #line terminator
+    blocks = []
+    full = buf.shape[0]//reclen if reclen else 0
+    if full:
+        blocks.append(buf[:full*reclen].reshape(full, reclen))
+    if reclen and buf.shape[0] > full*reclen:
+        last = np.full((1, reclen), ord(' '), dtype=np.uint8)
+        last[0, :buf.shape[0] - full*reclen] = buf[full*reclen:]
+        blocks.append(last)
+    if not blocks:
+        blocks.append(np.zeros((0, int((specs['start']
+                                        + specs['width']).max())),
+                               dtype=np.uint8))
+
+    #Decode contiguous groups of variables in parallel
+    workers = max(1, min(int(workers), specs.shape[0]))
+    bounds = np.linspace(0, specs.shape[0], workers + 1).astype(int)
+    groups = [specs.iloc[bounds[i]:bounds[i + 1]] for i in range(0, workers)]
+    if workers == 1:
+        decoded = [decode_group(blocks, groups[0], skip_decimal_division,
+                                missing)]
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            decoded = list(pool.map(
+                lambda g: decode_group(blocks, g, skip_decimal_division,
+                                       missing),
+                groups))
+
+    return dict(pair for group in decoded for pair in group)
+
+
+def concat_values(parts):
+    """
+    Concatenate the values of a variable decoded from successive pieces of a
+    file, see decode_records().  Nullable pieces holding integers and
+    decimals are concatenated as decimals.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    if all(isinstance(x, np.ndarray) for x in parts):
+        return np.concatenate(parts)
+    return pd.concat([pd.Series(x, copy=False) for x in parts],
+                     ignore_index=True).array
+
+
+def read_records(data_file, specs, offset=0, nrows=None,
+                 skip_decimal_division=None, workers=1, missing=None,
+                 chunk_bytes=STREAM_BYTES):
+    """
+    A function to read a range of whole records of a fixed width file.  All
+    records have the same length, so a range starting at a record boundary
+    can be read without looking at the rest of the file, which lets large
+    files be read in pieces by several processes.
+
+    The file is memory mapped and viewed as a matrix with one row of bytes
+    per record, so every variable is a column slice of the matrix.  The
+    variables are split into groups decoded in parallel threads, which share
+    the mapped file.  A stream, which cannot be mapped, is read and decoded
+    chunk_bytes at a time and the decoded columns are concatenated.
+
+    Parameters
+    ----------
+    data_file   :   string or file-like object; .txt data file, or an open
+                    binary stream such as a zip archive member, which is
+                    read from its current position to its end
+    specs       :   DataFrame; the output of column_specs
+    offset      :   integer; the byte offset of the first record
+    nrows       :   integer; the number of records.  Reads to the end of the
+                    file if None.
+    skip_decimal_division   :   bool; do not apply the implied decimals of
+                                the dictionary
+    workers     :   integer; the number of decoding threads
+    missing     :   dict or string; per variable missing value codes, see
+                    missing_codes().  Numeric variables are then nullable,
+                    with missing codes and blank fields null.
+    chunk_bytes :   integer; the bytes of a stream read at a time, rounded
+                    down to whole records
+    """
+    missing = missing_codes(missing)
+    names = [str(x) for x in specs['varname']]
+    if hasattr(data_file, 'read'):
+        pieces = [decode_records(np.frombuffer(chunk, dtype=np.uint8),
+                                 reclen, specs, skip_decimal_division,
+                                 workers, missing)
+                  for chunk, reclen in stream_chunks(data_file, chunk_bytes)]
+        #Each variable's pieces are freed once concatenated
+        data = dict((name, concat_values([x.pop(name) for x in pieces]))
+                    for name in names)
+        return pd.DataFrame(data, columns=names, copy=False)
+
+    with open(data_file, 'rb') as f:
+        f.seek(offset)
+        reclen = len(f.readline())
+        size = f.seek(0, os.SEEK_END) - offset
+    if nrows is not None:
+        size = min(size, nrows*reclen)
+    if size > 0:
+        buf = np.memmap(data_file, dtype=np.uint8, mode='r',
+                        offset=offset, shape=(size,))
+    else:
+        buf = np.zeros(0, dtype=np.uint8)
+    data = decode_records(buf, reclen, specs, skip_decimal_division, workers,
+                          missing)
+    return pd.DataFrame(data, columns=names, copy=False)
+
+
+def zip_member(archive):
+    """
+    A function to find the data file of a zip archive.  PSID archives also
+    hold the dictionary and setup files for other packages, so a .txt file
+    is preferred if there is one.
+
+    Parameters
+    ----------
+    archive     :   ZipFile; the open archive
+
+    """
+    name = [x for x in archive.namelist()
+            if not x.lower().endswith('.sas') and not x.endswith('/')]
+    if any(x.lower().endswith('.txt') for x in name):
+        name = [x for x in name if x.lower().endswith('.txt')]
+    if len(name) > 1:
+        print('ERROR: The data file is a zip archive containing multiple '
+              + 'files.  Please supply only a single file.')
+    return name[0]
+
+
+def member_offset(zip_file, member):
+    """
+    A function to locate the data of an uncompressed (stored) zip archive
+    member.  Returns the byte offset of the member in the archive, or None
+    if the member is compressed.  A stored member is an ordinary fixed width
+    file inside the archive, so it can be read by byte ranges in place.
+
+    Parameters
+    ----------
+    zip_file    :   string; the zip archive
+    member      :   string; the member name, see zip_member()
+
+    """
+    with zipfile.ZipFile(zip_file) as archive:
+        info = archive.getinfo(member)
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    #The data follow the local header, whose name and extra field lengths
+    #may differ from those of the central directory
+    with open(zip_file, 'rb') as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+
+def read_zipped(zip_file, specs, skip_decimal_division=None, workers=1,
+                missing=None):
+    """
+    A function to read the data file of a zip archive without extracting it.
+    A stored member is memory mapped in place, a compressed one is
+    decompressed into memory, never to disk.
+
+    Parameters
+    ----------
+    zip_file    :   string or file-like object; the zip archive
+    specs       :   DataFrame; the output of column_specs
+    skip_decimal_division   :   bool; do not apply the implied decimals of
+                                the dictionary
+    workers     :   integer; the number of decoding threads
+    missing     :   dict or string; missing value codes, see missing_codes()
+    """
+    with zipfile.ZipFile(zip_file) as archive:
+        member = zip_member(archive)
+        size = archive.getinfo(member).file_size
+        offset = None
+        if isinstance(zip_file, str):
+            offset = member_offset(zip_file, member)
+        if offset is None:
+            with archive.open(member) as stream:
+                return read_records(stream, specs,
+                                    skip_decimal_division=
+                                    skip_decimal_division, workers=workers,
+                                    missing=missing)
+        with archive.open(member) as stream:
+            reclen = len(stream.readline())
+    return read_records(zip_file, specs, offset, -(-size//max(reclen, 1)),
+                        skip_decimal_division, workers, missing)
+
+
 def read_sas(data_file, dict_file, beginline=1, buffersize=50,
-             zipped=False, lrecl=None, skip_decimal_division=None):
+             zipped=False, lrecl=None, skip_decimal_division=None,
+             workers=1, missing=None, labels=False):
     """
     A funciton to read in sas data files and output a file type of the user's
     specification.
@@ -410,53 +883,38 @@ def read_sas(data_file, dict_file, beginline=1, buffersize=50,
     out_type        :   string; specifies the file type for output.  Options
                         include: csv, excel, hdf, squl, json, html, gbq, stata
     beginline       :   integer;
+    workers         :   integer; the number of threads decoding variables,
+                        see read_records
+    missing         :   dict or string; per variable missing value codes.
+                        Numeric variables are then read as nullable integers
+                        with missing codes and blank fields null.  See
+                        missing_codes().
+    labels          :   bool; convert the variables whose every value has a
+                        label in the dictionary's PROC FORMAT tables to
+                        categoricals, see labels.apply_labels()
     """
     DF = parse_sas(dict_file, beginline, lrecl)
 
-    #Take only rows with variable names
-    DF_cleaned = DF.dropna(subset=['varname'])
+    #Locate the variables with names, skipping gaps
+    specs = column_specs(DF)
+
+    print('Reading in ASCII file.  This could take a while.')
 
-    #If the ASCII file is zipped, unpack it and store
+    #Read in sas file, converting to numeric and dividing by the divisor
+    #where necessary.  A zipped file is read without extracting it.
     if zipped:
-        td = tempfile.mkdtemp()
-        temp = zipfile.ZipFile(data_file)
-        name = temp.namelist()
-        if len(name) > 1:
-            print('ERROR: The data file is a zip archive containing multiple '
-                  + 'files.  Please supply only a single file.')
-        temp.extract(name, td)
-        data_file = td + os.sep + name
-
-    #Initialize data frames
-    sas_file = pd.DataFrame()
+        sas_file = read_zipped(data_file, specs, skip_decimal_division,
+                               workers, missing)
+    else:
+        sas_file = read_records(data_file, specs,
+                                skip_decimal_division=skip_decimal_division,
+                                workers=workers, missing=missing)
 
-    print('Reading in ASCII file.  This could take a while.')
+    if labels:
+        from .labels import apply_labels
+        sas_file = apply_labels(sas_file, *value_labels(dict_file))
 
-    #Read in sas file
-    DF_cleaned['width'] = DF_cleaned['width'].astype(int)
-    sas_file = pd.read_fwf(data_file,
-                           widths=DF_cleaned['width'],
-                           names=list(DF_cleaned['varname']),
-                           header=None)
-
-    print("Finished reading in data.  Cleaning up data frame.\n")
-
-    #Loop through rows, converting to numeric and dividing
-    #by the divisor where necessary
-    for l in range(0, DF_cleaned.shape[0]):
-        #If the sas data says should be numeric, convert
-        if not DF_cleaned['char'][l]:
-            #Handle NAs introduced by coercion warnings by capturing them
-            #NOTE: This is an issue to be added later.  For now, simply convert
-            sas_file[str(DF_cleaned['varname'][l])] = \
-                sas_file[str(DF_cleaned['varname'][l])].astype(float)
-
-        if not skip_decimal_division:
-            # Assuming that the data came from parse_sas, must correct for
-            # scientific notation in the SAS file
-            if not DF_cleaned.loc[l, 'char']:
-                sas_file.loc[l, :] *= DF_cleaned['divisor'][l]
-    #Remove any temporary dirs
+    print("Finished reading in data.\n")
     return sas_file
 
 
@@ -0,0 +1,289 @@
+"""
+Origin: A module to summarize PSID panels
+Filename: stats.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains weighted summary statistics of panels, computed while
+build_panel's years are produced instead of on the finished panel.  Each
+(year, sample, variable) cell holds a WeightedStats accumulator: a count, a
+sum of weights, a weighted mean and sum of squares merged with the pairwise
+formulas of Chan, Golub and LeVeque, and a compressed weighted sample for
+quantiles.  Accumulators of the same cell merge, so summaries of separate
+builds, e.g. of two ranges of years or of two processes, can be combined.
+
+"""
+import numpy as np
+import pandas as pd
+
+
+#Buckets of the quantile sketch.  Quantiles are exact below 2*CAPACITY
+#observations, and within about 1/CAPACITY of rank above
+CAPACITY = 1000
+
+#Sub-samples by 1968 family identifier, see psid_py.sub_sampling()
+SAMPLES = [('SRC', 0, 3000), ('immigrant', 3000, 5000),
+           ('SEO', 5000, 7000), ('latino', 7000, 9309)]
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class WeightedStats(object):
+    """
+    A mergeable accumulator of the weighted statistics of one variable.
+    Observations with a missing value or a missing or non positive weight
+    are skipped.
+    """
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.n = 0
+        self.weight = 0.
+        self.mean = 0.
+        self.m2 = 0.
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+
+    def add(self, x, w):
+        """
+        Add observations x with weights w, both array like.
+        """
+        x = np.asarray(x, dtype=float)
+        w = np.asarray(w, dtype=float)
+        ok = np.isfinite(x) & np.isfinite(w) & (w > 0)
+        x = x[ok]
+        w = w[ok]
+        if x.shape[0] == 0:
+            return self
+        batch = WeightedStats(self.capacity)
+        batch.n = x.shape[0]
+        batch.weight = w.sum()
+        batch.mean = np.dot(w, x)/batch.weight
+        batch.m2 = np.dot(w, (x - batch.mean)**2)
+        batch.values = x
+        batch.weights = w
+        return self.merge(batch)
+
+    def merge(self, other):
+        """
+        Merge the observations of another accumulator into this one.
+        """
+        if other.n == 0:
+            return self
+        weight = self.weight + other.weight
+        delta = other.mean - self.mean
+        self.mean += delta*other.weight/weight
+        self.m2 += other.m2 + delta**2*self.weight*other.weight/weight
+        self.weight = weight
+        self.n += other.n
+        self.values = np.concatenate([self.values, other.values])
+        self.weights = np.concatenate([self.weights, other.weights])
+        if self.values.shape[0] > 2*self.capacity:
+            self.compress()
+        return self
+
+    def compress(self):
+        """
+        Reduce the weighted sample to about capacity buckets of equal
+        weight, each holding the weighted mean of its values.
+        """
+        order = np.argsort(self.values, kind='mergesort')
+        x = self.values[order]
+        w = self.weights[order]
+        mid = np.cumsum(w) - w/2.
+        bucket = np.minimum((mid/self.weight*self.capacity).astype(int),
+                            self.capacity - 1)
+        weights = np.bincount(bucket, w, self.capacity)
+        filled = weights > 0
+        self.values = (np.bincount(bucket, w*x, self.capacity)[filled]
+                       / weights[filled])
+        self.weights = weights[filled]
+
+    def std(self):
+        """Return the weighted standard deviation."""
+        if self.weight <= 0:
+            return np.nan
+        return np.sqrt(self.m2/self.weight)
+
+    def quantile(self, q):
+        """
+        Return the weighted quantiles q, interpolating between the weight
+        midpoints of the sorted values.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        order = np.argsort(self.values, kind='mergesort')
+        x = self.values[order]
+        w = self.weights[order]
+        mid = np.cumsum(w) - w/2.
+        return np.interp(q*w.sum(), mid, x)
+
+
+def sample_of(ID1968):
+    """
+    Return the sub-sample name of each 1968 family identifier, 'other' when
+    it is in none of SAMPLES.
+    """
+    ID1968 = np.asarray(ID1968)
+    names = np.full(ID1968.shape, 'other', dtype=object)
+    for name, low, high in SAMPLES:
+        names[(ID1968 > low) & (ID1968 < high)] = name
+    return names
+
+
+def numeric(column):
+    """
+    Return a column as floats, or None if it is not numeric, e.g. the 'NA'
+    of a variable missing in a year.
+    """
+    try:
+        return pd.to_numeric(column).to_numpy(dtype=float, na_value=np.nan)
+    except (ValueError, TypeError):
+        return None
+
+
+def accumulate(cells, year, frame, variables, weight, capacity=CAPACITY):
+    """
+    A function to add the rows of one year of a panel to the accumulators
+    of each (year, sample, variable) cell, the sample 'all' holding every
+    row.
+
+    Parameters
+    ----------
+    cells       :   dict; accumulators by (year, sample, variable), updated
+    year        :   int; the year of the rows
+    frame       :   dataframe; the rows, with ID1968, the weight and the
+                    variables
+    variables   :   list; the variables to summarize
+    weight      :   string; the weight column, None for unit weights
+    capacity    :   integer; buckets of the quantile sketches
+
+    """
+    if weight is None:
+        w = np.ones(frame.shape[0])
+    else:
+        w = numeric(frame[weight])
+    samples = sample_of(frame['ID1968'])
+    groups = [('all', slice(None))]
+    groups += [(name, samples == name)
+               for name in pd.unique(samples) if name != 'other']
+    for var in variables:
+        x = numeric(frame[var]) if var in frame else None
+        if x is None:
+            continue
+        for name, rows in groups:
+            key = (year, name, var)
+            if key not in cells:
+                cells[key] = WeightedStats(capacity)
+            cells[key].add(x[rows], w[rows])
+    return cells
+
+
+def merge_cells(cells, other):
+    """
+    Merge the accumulators of other into cells, for summaries built
+    separately.  Returns cells.
+    """
+    for key, acc in other.items():
+        if key in cells:
+            cells[key].merge(acc)
+        else:
+            cells[key] = acc
+    return cells
+
+
+def summary_table(cells, quantiles=QUANTILES):
+    """
+    A function to tabulate accumulators.  Returns a dataframe indexed by
+    year, sample and variable with columns count, weight, mean, std and one
+    column per quantile.
+    """
+    rows = []
+    for key in sorted(cells, key=lambda k: (k[0], k[1] != 'all', k[1],
+                                            k[2])):
+        acc = cells[key]
+        row = [acc.n, acc.weight, acc.mean if acc.n else np.nan, acc.std()]
+        rows.append(list(key) + row + list(acc.quantile(quantiles)))
+    columns = ['year', 'sample', 'variable', 'count', 'weight', 'mean',
+               'std'] + ['q' + str(q) for q in quantiles]
+    return pd.DataFrame(rows, columns=columns)\
+        .set_index(['year', 'sample', 'variable'])
+
+
+def panel_summary(fam_vars, weight=None, variables=None, quantiles=QUANTILES,
+                  design="balanced", datadir=None, ind_vars=None,
+                  SAScii=None, heads_only=None, sample=None, verbose=False,
+                  username=None, password=None, processes=None,
+                  out_type='csv', frames=None, capacity=CAPACITY,
+                  cells=None, log=None):
+    """
+    A function to compute weighted summary statistics of a panel by year
+    and sub-sample without building the panel.  Returns a dataframe indexed
+    by year, sample and variable, see summary_table().
+
+    With design 'all' each year is added to the accumulators as soon as it
+    is built and then dropped.  Other designs are decided on the number of
+    years each individual is present, known only after the last year, so
+    each year keeps just the person identifier, the weight and the
+    summarized variables as floats until then.
+
+    Parameters
+    ----------
+    fam_vars    :   dict of list; see build_panel()
+    weight      :   string; the name of an ind_vars variable holding the
+                    weights, e.g. the longitudinal weight.  Unit weights if
+                    None.
+    variables   :   list; names of fam_vars or ind_vars variables to
+                    summarize.  Defaults to every family variable.
+    quantiles   :   list; the quantiles to report
+    capacity    :   integer; buckets of the quantile sketches, see
+                    WeightedStats
+    cells       :   dict; accumulators of an earlier summary to merge this
+                    one into, see merge_cells().  Updated in place.
+    log         :   file; where the build prints its progress and errors,
+                    stdout if None
+
+    The other arguments are as in build_panel().
+
+    """
+    from . import psid_py
+
+    plan = psid_py.plan_build(fam_vars, design, datadir, ind_vars, SAScii,
+                              heads_only, sample, verbose, log)
+    if plan is None:
+        return
+    if variables is None:
+        variables = [x for x in plan['fam_vars'].columns
+                     if x not in ('year', 'interview')]
+    if cells is None:
+        cells = {}
+
+    pending = []
+    for YEAR, frame in psid_py.year_frames(plan, design, heads_only, sample,
+                                           verbose, username, password,
+                                           processes, out_type, frames,
+                                           log=log):
+        if design == 'all':
+            accumulate(cells, YEAR, frame, variables, weight, capacity)
+            continue
+        narrow = pd.DataFrame({'pid': frame['pid'].values,
+                               'ID1968': frame['ID1968'].values})
+        for var in variables + ([weight] if weight is not None else []):
+            x = numeric(frame[var])
+            if x is not None:
+                narrow[var] = x
+        pending.append((YEAR, narrow))
+
+    if pending:
+        #The design on the number of years present, see build_panel()
+        counts = pd.concat([x['pid'] for YEAR, x in pending])\
+            .value_counts()
+        if design == 'balanced':
+            least = counts.max()
+        else:
+            least = int(design)
+        for YEAR, narrow in pending:
+            rows = counts.reindex(narrow['pid']).values >= least
+            accumulate(cells, YEAR, narrow.loc[rows], variables, weight,
+                       capacity)
+    return summary_table(cells, quantiles)
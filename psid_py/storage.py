@@ -0,0 +1,221 @@
+"""
+Origin: A module to store converted PSID files
+Filename: storage.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains functions to write and read converted PSID files in a
+binary format instead of csv.  Two formats are supported:
+
+    parquet =>  a compressed columnar file, requires pyarrow.
+    npy     =>  a flat binary matrix of the numeric columns stored column by
+                column (Fortran order) so that it can be memory mapped, with
+                any character columns in a second matrix.  Loading a few
+                variables from a wide file only touches their pages.
+
+Each binary file is accompanied by a small json file holding the column
+layout from the sas dictionary (the char and divisor of every variable), so
+that loading never has to infer types.
+
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'npy': '.npy'}
+
+
+def layout_path(name):
+    """Return the path of the json layout file for an output name."""
+    return name + '.json'
+
+
+def column_layout(x, layout=None):
+    """
+    A function to describe the columns of a converted frame.  Returns a list
+    of dictionaries with the name, dtype, char and divisor of each column.
+
+    Parameters
+    ----------
+    x           :   dataframe; the converted data
+    layout      :   dataframe; the output of read_sas.parse_sas, if known
+
+    """
+    info = {}
+    if layout is not None:
+        layout = layout.dropna(subset=['varname'])
+        for i in layout.index:
+            info[str(layout.loc[i, 'varname'])] = \
+                (bool(layout.loc[i, 'char']),
+                 float(layout.loc[i, 'divisor']))
+    columns = []
+    for col in x.columns:
+        char, divisor = info.get(str(col),
+                                 (x[col].dtype == object, 1.0))
+        columns.append({'name': str(col), 'dtype': str(x[col].dtype),
+                        'char': char, 'divisor': divisor})
+    return columns
+
+
+def write_frame(x, name, out_type='csv', layout=None, value_labels=None):
+    """
+    A function to save a converted PSID file.  Returns the path written.
+
+    Parameters
+    ----------
+    x           :   dataframe; the converted data
+    name        :   string; the output name, without extension
+    out_type    :   string; one of 'csv', 'parquet' or 'npy'
+    layout      :   dataframe; the output of read_sas.parse_sas, if known
+    value_labels:   tuple; the output of read_sas.value_labels, kept in the
+                    json layout so that read_frame can apply them.  Not kept
+                    for csv.
+
+    """
+    if out_type not in EXTENSIONS:
+        raise ValueError('Unknown out_type ' + str(out_type) + '.  Options'
+                         ' are ' + ', '.join(sorted(EXTENSIONS)) + '.')
+    out = name + EXTENSIONS[out_type]
+    if out_type == 'csv':
+        x.to_csv(out)
+        return out
+
+    columns = column_layout(x, layout)
+    if out_type == 'parquet':
+        x.to_parquet(out, compression='zstd', index=False)
+    else:
+        numeric = [c['name'] for c in columns if not c['char']]
+        char = [c['name'] for c in columns if c['char']]
+        #Nullable columns are stored with NaN for null
+        np.save(out, np.asfortranarray(
+            x[numeric].to_numpy(dtype=float, na_value=np.nan)))
+        if char:
+            #Blank fields are read as null, so null is stored blank
+            chars = x[char].astype(object)
+            np.save(name + '.char.npy', np.asfortranarray(
+                chars.where(chars.notna(), '').values.astype(str)))
+
+    found = {'format': out_type, 'rows': int(x.shape[0]),
+             'columns': columns}
+    if value_labels is not None and value_labels[1]:
+        tables, assigned = value_labels
+        for c in columns:
+            if c['name'].upper() in assigned:
+                c['labels'] = assigned[c['name'].upper()]
+        #json keys are strings, so tables are stored as [code, label] pairs
+        used = set(c['labels'] for c in columns if 'labels' in c)
+        found['value_labels'] = dict(
+            (t, [[k, v] for k, v in tables[t].items()]) for t in used)
+    with open(layout_path(name), 'w') as f:
+        json.dump(found, f)
+    return out
+
+
+def read_layout(out):
+    """
+    A function to read the json layout of a binary file.  Returns None if
+    there is no layout file.
+
+    Parameters
+    ----------
+    out         :   string; path of the .parquet or .npy file
+
+    """
+    name = os.path.splitext(out)[0]
+    if not os.path.isfile(layout_path(name)):
+        return None
+    with open(layout_path(name)) as f:
+        return json.load(f)
+
+
+def frame_columns(out):
+    """
+    A function to list the columns of a converted PSID file without loading
+    it.
+
+    Parameters
+    ----------
+    out         :   string; path of the .csv, .parquet or .npy file
+
+    """
+    layout = read_layout(out) if not out.endswith('.csv') else None
+    if layout is not None:
+        return [c['name'] for c in layout['columns']]
+    if out.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(out).names)
+    return list(pd.read_csv(out, nrows=0).columns)
+
+
+def frame_labels(out):
+    """
+    A function to read the value labels saved with a binary file.  Returns
+    the tables of labels by name and the table name of each variable, see
+    labels.apply_labels().  Both are empty if there are none.
+    """
+    layout = read_layout(out) if not out.endswith('.csv') else None
+    if layout is None or 'value_labels' not in layout:
+        return {}, {}
+    tables = dict((t, dict((k, v) for k, v in pairs))
+                  for t, pairs in layout['value_labels'].items())
+    assigned = dict((c['name'], c['labels']) for c in layout['columns']
+                    if 'labels' in c)
+    return tables, assigned
+
+
+def read_frame(out, columns=None, mmap=True, labels=False):
+    """
+    A function to load a converted PSID file.
+
+    npy files are memory mapped copy-on-write and every numeric column of
+    the frame is a view of the mapped file, so only the pages of the
+    selected columns are ever read, and the OS page cache is shared by every
+    process loading the same file.  Character columns are copied, with
+    blank fields read as null.
+
+    Parameters
+    ----------
+    out         :   string; path of the .csv, .parquet or .npy file
+    columns     :   list; the columns to load.  Loads all columns if None.
+    mmap        :   bool; memory map npy files instead of reading them
+    labels      :   bool; convert the variables with value labels saved by
+                    write_frame to categoricals, see labels.apply_labels()
+
+    """
+    if labels:
+        from .labels import apply_labels
+        x = read_frame(out, columns, mmap)
+        return apply_labels(x, *frame_labels(out))
+    if out.endswith('.csv'):
+        x = pd.read_csv(out, usecols=columns)
+        #usecols keeps the order of the file
+        return x if columns is None else x[columns]
+    if out.endswith('.parquet'):
+        return pd.read_parquet(out, columns=columns)
+
+    layout = read_layout(out)
+    name = os.path.splitext(out)[0]
+    mode = 'c' if mmap else None
+    if columns is None:
+        columns = [c['name'] for c in layout['columns']]
+    numeric = [c['name'] for c in layout['columns'] if not c['char']]
+    char = [c['name'] for c in layout['columns'] if c['char']]
+
+    #Fortran order makes each column a contiguous slice of the file
+    data = {}
+    for names, f in [(numeric, out), (char, name + '.char.npy')]:
+        pos = dict((col, j) for j, col in enumerate(names))
+        if not any(col in pos for col in columns):
+            continue
+        values = np.load(f, mmap_mode=mode)
+        for col in columns:
+            if col not in pos:
+                continue
+            data[col] = values[:, pos[col]]
+            if names is char:
+                data[col] = data[col].astype(object)
+                data[col][data[col] == ''] = np.nan
+    return pd.DataFrame(data, columns=columns, copy=False)
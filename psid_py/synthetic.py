@@ -0,0 +1,120 @@
+"""
+Origin: A module of synthetic PSID data for the psid_py tests
+Filename: synthetic.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module writes synthetic data in the layout of the PSID releases: fixed
+width data files with their sas dictionaries, the zip archives served by
+SIMBA, and converted family and individual files for build_panel.  The
+tests and the benchmarks, see benchmarks/bench.py, build their data with
+it.
+
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+
+def write_release_file(name, n_rec=20000, n_vars=200, width=7, seed=0):
+    """
+    Write a synthetic fixed width data file name.txt and its sas dictionary
+    name.sas, in the layout of the PSID family files.
+
+    Parameters
+    ----------
+    name        :   string; the file name, without extension
+    n_rec       :   integer; the number of records
+    n_vars      :   integer; the number of variables
+    width       :   integer; the width of each variable
+    seed        :   integer; the random seed
+
+    """
+    rng = np.random.RandomState(seed)
+    lines = ['DATA PSID.' + os.path.basename(name) + ' ;',
+             "INFILE '" + os.path.basename(name) + ".txt' LRECL = "
+             + str(n_vars*width) + ' ;', 'INPUT']
+    for i in range(0, n_vars):
+        lines.append('      ER%05d %d - %d' % (i + 1, i*width + 1,
+                                               (i + 1)*width))
+    lines += [';', 'RUN ;', '']
+    with open(name + '.sas', 'w') as f:
+        f.write('\n'.join(lines))
+
+    values = rng.randint(0, 10**(width - 1), (n_rec, n_vars))
+    np.savetxt(name + '.txt', values, fmt='%' + str(width) + 'd',
+               delimiter='')
+
+
+def release_zip(name, n_rec=20000, n_vars=200):
+    """
+    Return the bytes of a zip archive holding a synthetic data file and its
+    sas dictionary, as served by SIMBA, see write_release_file().
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, name)
+        write_release_file(path, n_rec, n_vars)
+        with zipfile.ZipFile(path + '.zip', 'w', zipfile.ZIP_DEFLATED) as z:
+            z.write(path + '.txt', name + '.txt')
+            z.write(path + '.sas', name + '.sas')
+        with open(path + '.zip', 'rb') as f:
+            return f.read()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def write_panel_data(datadir, years=(2001, 2003, 2005, 2007), n_fam=3000,
+                     n_vars=20, seed=0):
+    """
+    Write synthetic family files and an individual file for build_panel to
+    datadir as csv, with three members per family interviewed in about 90%
+    of the waves.  Returns the fam_vars and ind_vars of a build.
+
+    Parameters
+    ----------
+    datadir     :   string; the data directory, created if missing
+    years       :   list; the waves
+    n_fam       :   integer; families in each wave
+    n_vars      :   integer; family variables of each wave
+    seed        :   integer; the seed of the random data
+
+    """
+    from . import metadata
+
+    if not os.path.isdir(datadir):
+        os.makedirs(datadir)
+    rng = np.random.RandomState(seed)
+    ids = metadata.waves()
+    n = n_fam*3
+    family = np.repeat(np.arange(1, n_fam + 1), 3)
+    member = np.tile([1, 2, 3], n_fam)
+    ind = pd.DataFrame({'ER30001': np.repeat(rng.choice(9300, n_fam,
+                                                        replace=False) + 1, 3),
+                        'ER30002': member})
+    fam_vars = {'year': list(years)}
+    ind_vars = {'year': list(years), 'weight': []}
+    for k, year in enumerate(years):
+        current = ids.loc[year]
+        present = rng.rand(n) < 0.9
+        ind[current.ind_interview] = np.where(present, family, 0)
+        ind[current.ind_seq] = np.where(present, member, 0)
+        ind[current.ind_head] = np.tile([current.ind_head_num, 20, 30],
+                                        n_fam)
+        ind['W' + str(year)] = rng.rand(n)
+        ind_vars['weight'].append('W' + str(year))
+
+        fam = pd.DataFrame({current.fam_interview: np.arange(1, n_fam + 1)})
+        for j in range(0, n_vars):
+            name = 'V%02d%d' % (j, year)
+            fam[name] = rng.randint(0, 100000, n_fam).astype(float)
+            fam_vars.setdefault('v' + str(j), []).append(name)
+        fam.to_csv(os.path.join(datadir, 'FAM' + str(year) + 'ER.csv'),
+                   index=False)
+    ind.to_csv(os.path.join(datadir, metadata.individual_file()['name']
+                            + '.csv'), index=False)
+    return fam_vars, ind_vars
@@ -4,7 +4,8 @@ Filename: test.py
 Author: Tyler Abbot
 Last modified: 23 June, 2015
 
-This script contains test calls to the psid_py package.
+This script contains test calls to the psid_py package.  Run it from the
+repository root with python -m psid_py.test.
 
 """
 import psid_py
@@ -0,0 +1,93 @@
+"""
+Origin: A file to test concurrent builds of the psid_py package
+Filename: test_builder.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that builds run from the threads of a builder.PanelBuilder
+return the same panels as the same builds run one at a time, on synthetic
+data written by synthetic.write_panel_data().  Run it from the repository root
+with python -m unittest psid_py.test_builder.
+
+"""
+import contextlib
+import copy
+import io
+import itertools
+import shutil
+import sys
+import tempfile
+import unittest
+
+from psid_py import synthetic
+from psid_py.builder import BuildError, PanelBuilder
+from psid_py.psid_py import build_panel
+
+
+class TestConcurrentBuilds(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.datadir = tempfile.mkdtemp()
+        cls.fam_vars, cls.ind_vars = synthetic.write_panel_data(
+            cls.datadir, n_fam=300, n_vars=4)
+        cls.configurations = list(itertools.product(
+            ['balanced', 2, 'all'], [None, True], [None, 'SRC']))
+
+        #The panel of each build run alone, one at a time
+        cls.expected = {}
+        for design, heads_only, sample in cls.configurations:
+            log = io.StringIO()
+            cls.expected[(design, heads_only, sample)] = build_panel(
+                cls.fam_vars, design=design, datadir=cls.datadir,
+                ind_vars=cls.ind_vars, heads_only=heads_only, sample=sample,
+                log=log)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.datadir)
+
+    def request(self, design, heads_only, sample):
+        return {'fam_vars': self.fam_vars, 'ind_vars': self.ind_vars,
+                'design': design, 'heads_only': heads_only,
+                'sample': sample, 'verbose': True}
+
+    def test_concurrent_equals_serial(self):
+        fam_vars = copy.deepcopy(self.fam_vars)
+        stdout = sys.stdout
+        requests = [self.request(*c) for c in self.configurations]*3
+        with PanelBuilder(self.datadir, workers=6) as builder:
+            builds = builder.map(requests)
+
+        self.assertIs(sys.stdout, stdout)
+        self.assertEqual(self.fam_vars, fam_vars)
+        for r, b in zip(requests, builds):
+            expected = self.expected[(r['design'], r['heads_only'],
+                                      r['sample'])]
+            self.assertTrue(b.panel.reset_index(drop=True).equals(
+                expected.reset_index(drop=True)))
+            self.assertIn('End of build_panel', b.log)
+            self.assertEqual(b.log.count('Currently working on data'),
+                             len(self.fam_vars['year']))
+
+    def test_build_log(self):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            panel = build_panel(self.fam_vars, design=2,
+                                datadir=self.datadir, ind_vars=self.ind_vars,
+                                verbose=True, log=log)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertTrue(panel.equals(self.expected[(2, None, None)]))
+        self.assertIn('Design choice reduces sample', log.getvalue())
+
+    def test_failed_build(self):
+        fam_vars = dict(self.fam_vars, year=['2001', '2003', '2005', '2007'])
+        with PanelBuilder(self.datadir, workers=2) as builder:
+            future = builder.submit(fam_vars, ind_vars=self.ind_vars)
+            with self.assertRaises(BuildError) as raised:
+                future.result()
+        self.assertIn('The year must be entered as an integer',
+                      str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
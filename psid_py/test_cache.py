@@ -0,0 +1,120 @@
+"""
+Origin: A file to test the panel cache of psid_py
+Filename: test_cache.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that cache.build_key changes with the arguments, the
+contents of the input files and the metadata file, that cache.store and
+cache.load return the saved panel, and that cache.evict deletes the least
+recently used panels first.  Run it from the repository root with
+python -m unittest psid_py.test_cache.
+
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from psid_py import cache, metadata
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache', 'panels')
+        self.files = []
+        for name in ['FAM2001ER.csv', 'IND2013ER.csv']:
+            self.files.append(os.path.join(self.temp_dir, name))
+            with open(self.files[-1], 'w') as f:
+                f.write(name + '\n1,2\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_key(self):
+        arguments = {'fam_vars': ['income'], 'design': 3}
+        key = cache.build_key(arguments, self.files, self.cache_dir)
+        self.assertTrue(os.path.isdir(self.cache_dir))
+        self.assertEqual(cache.build_key(dict(arguments), self.files,
+                                         self.cache_dir), key)
+        self.assertNotEqual(cache.build_key({'fam_vars': ['income'],
+                                             'design': 2},
+                                            self.files, self.cache_dir), key)
+
+        #The same contents at another path give the same key
+        moved = os.path.join(self.temp_dir, 'moved')
+        os.mkdir(moved)
+        for file in self.files:
+            shutil.copy(file, moved)
+        self.assertEqual(cache.build_key(
+            arguments, [os.path.join(moved, os.path.basename(f))
+                        for f in self.files], self.cache_dir), key)
+
+        #Modified contents are hashed again
+        with open(self.files[0], 'a') as f:
+            f.write('3,4\n')
+        self.assertNotEqual(cache.build_key(arguments, self.files,
+                                            self.cache_dir), key)
+
+        with mock.patch.object(metadata, 'digest', return_value='other'):
+            self.assertNotEqual(cache.build_key(arguments, self.files,
+                                                self.cache_dir), key)
+
+    def test_fingerprints(self):
+        #Each file keeps a memo of its own
+        found = cache.fingerprints(self.files, self.cache_dir)
+        self.assertEqual([name for name, digest in found],
+                         ['FAM2001ER.csv', 'IND2013ER.csv'])
+        self.assertEqual(found[0][1], cache.file_digest(self.files[0]))
+        memo_dir = os.path.join(self.cache_dir, cache.FINGERPRINTS)
+        self.assertEqual(len(os.listdir(memo_dir)), 2)
+        cache.fingerprints(self.files[:1], self.cache_dir)
+        self.assertEqual(len(os.listdir(memo_dir)), 2)
+
+    def test_hit_and_miss(self):
+        os.makedirs(self.cache_dir)
+        panel = pd.DataFrame({'pid': np.arange(5, dtype=np.int32),
+                              'income': np.arange(5.)})
+        self.assertIsNone(cache.load(self.cache_dir, 'a'*64))
+        cache.store(self.cache_dir, 'a'*64, panel)
+        pd.testing.assert_frame_equal(cache.load(self.cache_dir, 'a'*64),
+                                      panel)
+        self.assertIsNone(cache.load(self.cache_dir, 'b'*64))
+
+        #Columns mixing numbers and strings are pickled
+        mixed = pd.DataFrame({'income': [1., 'NA']}, dtype=object)
+        entry = cache.store(self.cache_dir, 'c'*64, mixed)
+        self.assertTrue(entry.endswith('.pkl'))
+        pd.testing.assert_frame_equal(cache.load(self.cache_dir, 'c'*64),
+                                      mixed)
+
+    def test_eviction(self):
+        os.makedirs(self.cache_dir)
+        panel = pd.DataFrame({'income': np.arange(1000.)})
+        entries = []
+        for i, key in enumerate(['a'*64, 'b'*64, 'c'*64]):
+            entries.append(cache.store(self.cache_dir, key, panel))
+            os.utime(entries[-1], (1000. + i, 1000. + i))
+        size = os.path.getsize(entries[0])
+
+        #Loading an entry marks it as recently used
+        cache.load(self.cache_dir, 'a'*64)
+        cache.evict(self.cache_dir, max_bytes=2*size)
+        self.assertEqual([os.path.exists(e) for e in entries],
+                         [True, False, True])
+
+        #The newest entry is kept even when over the limit
+        entry = cache.store(self.cache_dir, 'd'*64, panel, max_bytes=0)
+        self.assertEqual(os.listdir(self.cache_dir).count(
+            os.path.basename(entry)), 1)
+        self.assertEqual([os.path.exists(e) for e in entries],
+                         [False, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Origin: A file to test the data directory catalog of psid_py
+Filename: test_catalog.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that catalog.resolve finds the input files of a build,
+that its errors and those of catalog.check_variables name the missing files
+and variables, and that build_panel prints them and returns None rather
+than raising, on synthetic data written by synthetic.write_panel_data().
+Run it from the repository root with
+python -m unittest psid_py.test_catalog.
+
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from psid_py import catalog, synthetic
+from psid_py.builder import BuildError, PanelBuilder
+from psid_py.psid_py import build_panel, makeids
+
+
+class PanelData(unittest.TestCase):
+    def setUp(self):
+        self.datadir = tempfile.mkdtemp()
+        self.fam_vars, self.ind_vars = synthetic.write_panel_data(
+            self.datadir, years=(2001, 2003), n_fam=20, n_vars=2)
+        self.ind_file = [name for name in os.listdir(self.datadir)
+                         if name.startswith('IND')][0]
+
+    def tearDown(self):
+        shutil.rmtree(self.datadir)
+
+
+class TestResolve(PanelData):
+    def test_resolve(self):
+        found = catalog.load_catalog(self.datadir)
+        ftype, fam_files, ind_file = catalog.resolve(found, self.datadir,
+                                                     [2001, 2003])
+        self.assertEqual(ftype, 'csv')
+        self.assertEqual(sorted(fam_files), [2001, 2003])
+        self.assertEqual(fam_files[2003],
+                         os.path.join(self.datadir, 'FAM2003ER.csv'))
+        self.assertEqual(ind_file, os.path.join(self.datadir, self.ind_file))
+
+    def test_missing_files(self):
+        found = catalog.load_catalog(self.datadir)
+        with self.assertRaises(catalog.CatalogError) as raised:
+            catalog.resolve(found, self.datadir, [2001, 2005, 2007])
+        self.assertIn('lack the family files of 2005, 2007',
+                      raised.exception.value)
+
+        os.remove(os.path.join(self.datadir, self.ind_file))
+        found = catalog.load_catalog(self.datadir)
+        with self.assertRaises(catalog.CatalogError) as raised:
+            catalog.resolve(found, self.datadir, [2001])
+        self.assertTrue(raised.exception.value.endswith(
+            'lack an individual file.'))
+
+    def test_build_error(self):
+        os.remove(os.path.join(self.datadir, 'FAM2003ER.csv'))
+        log = io.StringIO()
+        self.assertIsNone(build_panel(self.fam_vars, datadir=self.datadir,
+                                      ind_vars=self.ind_vars, log=log))
+        self.assertIn('ERROR: (build_panel) The csv files of',
+                      log.getvalue())
+        self.assertIn('lack the family files of 2003', log.getvalue())
+
+        with PanelBuilder(self.datadir, workers=1) as builder:
+            future = builder.submit(self.fam_vars, ind_vars=self.ind_vars)
+            with self.assertRaises(BuildError) as raised:
+                future.result()
+        self.assertIn('lack the family files of 2003',
+                      str(raised.exception))
+
+
+class TestCheckVariables(PanelData):
+    def test_check_variables(self):
+        found = catalog.load_catalog(self.datadir)
+        ftype, fam_files, ind_file = catalog.resolve(found, self.datadir,
+                                                     [2001, 2003])
+        ids = makeids()
+        fam_vars = pd.DataFrame(dict(self.fam_vars, v1=['v99', 'V012003']),
+                                index=[2001, 2003])
+        ind_vars = pd.DataFrame(self.ind_vars, index=[2001, 2003])
+        with self.assertRaises(catalog.VariableError) as raised:
+            catalog.check_variables(found, fam_files, ind_file, fam_vars,
+                                    ind_vars, ids)
+        self.assertEqual(raised.exception.value,
+                         'Requested variables are missing: '
+                         'FAM2001ER.csv (2001) lacks v99.')
+        fam_vars.loc[2001, 'v1'] = 'NA'
+        catalog.check_variables(found, fam_files, ind_file, fam_vars,
+                                ind_vars, ids)
+
+    def test_build_error(self):
+        fam_vars = dict(self.fam_vars, v1=['V012001', 'v992003'])
+        ind_vars = dict(self.ind_vars, age=['NA', 'ER99999'])
+        log = io.StringIO()
+        self.assertIsNone(build_panel(fam_vars, datadir=self.datadir,
+                                      ind_vars=ind_vars, log=log))
+        self.assertIn('ERROR: (build_panel) Requested variables are '
+                      'missing: FAM2003ER.csv (2003) lacks v992003; '
+                      + self.ind_file + ' (2003) lacks ER99999.',
+                      log.getvalue())
+
+        with PanelBuilder(self.datadir, workers=1) as builder:
+            future = builder.submit(fam_vars, ind_vars=ind_vars)
+            with self.assertRaises(BuildError) as raised:
+                future.result()
+        self.assertIn('lacks v992003', str(raised.exception))
+
+    def test_case(self):
+        #Family variables are matched without case
+        fam_vars = dict(self.fam_vars, v1=['v012001', 'V012003'])
+        log = io.StringIO()
+        panel = build_panel(fam_vars, datadir=self.datadir,
+                            ind_vars=self.ind_vars, log=log)
+        self.assertNotIn('ERROR', log.getvalue())
+        self.assertIn('v1', panel.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Origin: A file to test the command line interface of psid_py
+Filename: test_cli.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks the psid-py command: the checks of a build and of its
+output path, the socket directory of the build server, builds sent to a
+running server, and that the download password never comes from the
+command line, on synthetic data written by synthetic.write_panel_data().
+Run it from the repository root with python -m unittest psid_py.test_cli.
+
+"""
+import io
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from psid_py import cli, psid_py, synthetic
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_run_build_checks(self):
+        out = os.path.join(self.temp_dir, 'panel.parquet')
+        result = cli.run_build({'fam_vars': {}, 'dataset': 'x'}, out)
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('dataset', result['message'])
+        result = cli.run_build({'fam_vars': {}}, out[:-len('.parquet')])
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('.csv', result['message'])
+
+    def test_server_output(self):
+        root = os.path.join(self.temp_dir, 'out')
+        os.makedirs(os.path.join(root, 'sub'))
+        os.symlink(self.temp_dir, os.path.join(root, 'link'))
+        real = os.path.realpath(root)
+        self.assertEqual(cli.server_output('a.csv', root),
+                         os.path.join(real, 'a.csv'))
+        self.assertEqual(cli.server_output('sub/a.csv', root),
+                         os.path.join(real, 'sub', 'a.csv'))
+        self.assertEqual(cli.server_output(os.path.join(root, 'a.csv'),
+                                           root),
+                         os.path.join(real, 'a.csv'))
+        for output in ['../a.csv', '/tmp/a.csv', 'link/a.csv',
+                       root + 'x/a.csv']:
+            self.assertIsNone(cli.server_output(output, root))
+
+    def test_socket_dir(self):
+        directory = os.path.join(self.temp_dir, 'run')
+        socket_file = os.path.join(directory, 'serve.sock')
+        cli.socket_dir(socket_file)
+        self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
+
+        #An existing directory is restricted too
+        os.chmod(directory, 0o755)
+        cli.socket_dir(socket_file)
+        self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
+
+        uid = os.getuid()
+        with mock.patch.object(os, 'getuid', return_value=uid + 1):
+            with self.assertRaises(IOError) as raised:
+                cli.socket_dir(socket_file)
+        self.assertIn('belongs to another user', str(raised.exception))
+
+        link = os.path.join(self.temp_dir, 'link')
+        os.symlink(directory, link)
+        with self.assertRaises(IOError):
+            cli.socket_dir(os.path.join(link, 'serve.sock'))
+
+    def test_server_builds(self):
+        datadir = os.path.join(self.temp_dir, 'data')
+        out_dir = os.path.join(self.temp_dir, 'out')
+        os.makedirs(out_dir)
+        fam_vars, ind_vars = synthetic.write_panel_data(datadir, n_fam=50,
+                                                        n_vars=2)
+        socket_file = os.path.join(self.temp_dir, 'run', 'serve.sock')
+        cli.socket_dir(socket_file)
+        server = cli.BuildServer(socket_file, datadir, out_dir)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            self.assertEqual(stat.S_IMODE(os.stat(socket_file).st_mode),
+                             0o600)
+            with self.assertRaises(IOError):
+                cli.socket_dir(socket_file)
+
+            spec = {'fam_vars': fam_vars, 'ind_vars': ind_vars,
+                    'design': 2}
+            output = os.path.join(out_dir, 'panel.csv')
+            with mock.patch('sys.stdout', new_callable=io.StringIO):
+                result = cli.request_build(spec, output, socket_file)
+            self.assertEqual(result['status'], 'ok')
+            expected = psid_py.build_panel(fam_vars, design=2,
+                                           datadir=datadir,
+                                           ind_vars=ind_vars,
+                                           log=io.StringIO())
+            self.assertEqual(result['rows'], expected.shape[0])
+            self.assertEqual(pd.read_csv(output).shape[0],
+                             expected.shape[0])
+
+            #Keys the server does not accept and outputs outside out_dir
+            result = cli.request_build(dict(spec, datadir='/'), output,
+                                       socket_file)
+            self.assertEqual(result['status'], 'error')
+            self.assertIn('datadir', result['message'])
+            result = cli.request_build(spec, os.path.join(self.temp_dir,
+                                                          'panel.csv'),
+                                       socket_file)
+            self.assertEqual(result['status'], 'error')
+            self.assertIn('inside', result['message'])
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.assertFalse(os.path.exists(socket_file))
+
+    def test_download_password(self):
+        self.assertNotIn('--password', cli.parser().format_help())
+        with self.assertRaises(SystemExit):
+            with mock.patch('sys.stderr', new_callable=io.StringIO):
+                cli.parser().parse_args(['download', self.temp_dir, '2001',
+                                         '-p', 'secret'])
+
+        calls = []
+        acquire = mock.patch.object(
+            psid_py, 'acquire_ascii_data',
+            side_effect=lambda *args, **kwargs: calls.append(args))
+        with acquire, mock.patch.dict(os.environ, {'PSID_PASSWORD': 'env'}):
+            self.assertEqual(cli.main(['download', self.temp_dir, '2001',
+                                       '-u', 'user']), 0)
+        self.assertEqual(calls[-1][2:4], ('user', 'env'))
+
+        environ = dict((k, v) for k, v in os.environ.items()
+                       if k != 'PSID_PASSWORD')
+        with acquire, mock.patch.dict(os.environ, environ, clear=True),\
+                mock.patch.object(cli.getpass, 'getpass',
+                                  return_value='typed') as prompt:
+            cli.main(['download', self.temp_dir, '2001', '-u', 'user'])
+        self.assertEqual(prompt.call_count, 1)
+        self.assertEqual(calls[-1][2:4], ('user', 'typed'))
+
+
+if __name__ == '__main__':
+    unittest.main()
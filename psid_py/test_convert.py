@@ -0,0 +1,87 @@
+"""
+Origin: A file to test the conversion of a release directory by psid_py
+Filename: test_convert.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that convert.convert_release, splitting files into byte
+ranges read by several processes, writes the same data as reading each file
+whole, for .txt/.sas pairs and zip archives.  Run it from the repository
+root with python -m unittest psid_py.test_convert.
+
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from psid_py import convert, read_sas, storage
+
+
+def write_pair(name, n_rec, seed):
+    """Write name.txt and name.sas with a character and a decimal variable."""
+    rng = np.random.RandomState(seed)
+    with open(name + '.sas', 'w') as f:
+        f.write("DATA PSID.X ;\nINPUT\n      ER00001 1 - 5\n"
+                "      ER00002 $ 6 - 7\n      ER00003 8 - 11 .1\n;\n")
+    with open(name + '.txt', 'w') as f:
+        for i in range(0, n_rec):
+            f.write('%5d%s%4d\n' % (rng.randint(0, 99999),
+                                    'AB'[rng.randint(0, 2)] + 'x',
+                                    rng.randint(0, 9999)))
+
+
+class TestConvertRelease(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        self.out = tempfile.mkdtemp()
+        write_pair(os.path.join(self.src, 'FAM2001ER'), 500, 0)
+        write_pair(os.path.join(self.src, 'FAM2003ER'), 300, 1)
+        #An archive holding its data stored, beside its dictionary
+        name = os.path.join(self.src, 'FAM2003ER')
+        with zipfile.ZipFile(os.path.join(self.src, 'FAM2005ER.zip'),
+                             'w', zipfile.ZIP_STORED) as z:
+            z.write(name + '.txt', 'FAM2005ER.txt')
+        shutil.copy(name + '.sas', os.path.join(self.src, 'FAM2005ER.sas'))
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+        shutil.rmtree(self.out)
+
+    def expected(self, name):
+        return read_sas.read_records(
+            os.path.join(self.src, name + '.txt'),
+            read_sas.column_specs(read_sas.parse_sas(
+                os.path.join(self.src, name + '.sas'), 1)))
+
+    def test_ranges(self):
+        for out_type in ['csv', 'parquet', 'npy']:
+            stats = convert.convert_release(self.src, self.out, out_type,
+                                            processes=2, chunk_bytes=1000,
+                                            verbose=False)
+            self.assertEqual(list(stats['file']),
+                             ['FAM2001ER', 'FAM2003ER', 'FAM2005ER'])
+            self.assertEqual(list(stats['rows']), [500, 300, 300])
+            for name, out in zip(stats['file'], stats['output']):
+                source = 'FAM2003ER' if name == 'FAM2005ER' else name
+                expected = self.expected(source)
+                #csv files also hold the index
+                x = storage.read_frame(out, list(expected.columns))
+                pd.testing.assert_frame_equal(x, expected, check_dtype=False)
+
+    def test_record_ranges(self):
+        #Ranges cover every record once and start on record boundaries
+        ranges = read_sas.record_ranges(12*100, 12, 250)
+        self.assertEqual(sum(n for offset, n in ranges), 100)
+        self.assertTrue(all(offset % 12 == 0 for offset, n in ranges))
+        starts = [offset for offset, n in ranges]
+        self.assertEqual(starts, sorted(starts))
+        self.assertTrue(pd.Series(starts).is_unique)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Origin: A file to test the partitioned datasets of psid_py
+Filename: test_dataset.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that a panel written by build_panel(dataset=...) and
+read back with dataset.read_dataset equals the panel build_panel returns,
+with and without buckets, and that dataset.coerce_na only reads numeric
+columns as numbers, on synthetic data written by
+synthetic.write_panel_data().  Run it from the repository root with
+python -m unittest psid_py.test_dataset.
+
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from psid_py import dataset, synthetic
+from psid_py.psid_py import build_panel
+
+
+class TestDataset(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.datadir = os.path.join(cls.temp_dir, 'data')
+        cls.fam_vars, cls.ind_vars = synthetic.write_panel_data(
+            cls.datadir, n_fam=200, n_vars=2)
+        #A variable missing in a year
+        cls.fam_vars['v1'][1] = 'NA'
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    def expected(self, design):
+        panel = build_panel(self.fam_vars, design=design,
+                            datadir=self.datadir, ind_vars=self.ind_vars,
+                            log=io.StringIO())
+        return dataset.coerce_na(panel).sort_values(['year', 'pid'],
+                                                    kind='mergesort')\
+            .reset_index(drop=True)
+
+    def test_equals_panel(self):
+        out = os.path.join(self.temp_dir, 'panel')
+        for design in ['balanced', 3, 'all']:
+            expected = self.expected(design)
+            self.assertEqual(expected['v1'].dtype, np.float64)
+            for buckets in [None, 4]:
+                rows = build_panel(self.fam_vars, design=design,
+                                   datadir=self.datadir,
+                                   ind_vars=self.ind_vars, dataset=out,
+                                   buckets=buckets, log=io.StringIO())
+                self.assertEqual(rows.to_dict(), expected.groupby('year')
+                                 .size().to_dict())
+                x = dataset.read_dataset(out)
+                pd.testing.assert_frame_equal(x[expected.columns], expected,
+                                              check_dtype=False)
+
+        #Reads of a year and a pid range
+        pids = (int(expected['pid'].quantile(0.25)),
+                int(expected['pid'].quantile(0.5)))
+        x = dataset.read_dataset(out, years=[2003], pids=pids,
+                                 columns=['v0'])
+        rows = (expected['year'] == 2003) & (expected['pid'] >= pids[0])\
+            & (expected['pid'] <= pids[1])
+        self.assertEqual(x['pid'].tolist(), expected.loc[rows, 'pid']
+                         .tolist())
+        self.assertEqual(x['v0'].tolist(), expected.loc[rows, 'v0'].tolist())
+
+    def test_coerce_na(self):
+        x = pd.DataFrame({'income': [1., 'NA', 3.],
+                          'state': ['0012', 'NA', '0950'],
+                          'missing': ['NA', 'NA', 'NA'],
+                          'pid': [1001, 1002, 1003]})
+        out = dataset.coerce_na(x)
+        self.assertEqual(out['income'].dtype, np.float64)
+        self.assertTrue(np.isnan(out['income'][1]))
+        #Character variables keep their codes
+        self.assertEqual(out['state'].tolist(), ['0012', 'NA', '0950'])
+        self.assertTrue(out['missing'].isna().all())
+        self.assertEqual(x['income'].tolist(), [1., 'NA', 3.])
+
+
+if __name__ == '__main__':
+    unittest.main()
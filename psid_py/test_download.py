@@ -0,0 +1,93 @@
+"""
+Origin: A file to test the download client of the psid_py package
+Filename: test_download.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks the login and the retries of download.PSIDClient against
+the local stand-in for the SIMBA website, see mock_simba.  Run it from the
+repository root with python -m unittest psid_py.test_download.
+
+"""
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from psid_py import download, mock_simba
+from psid_py.synthetic import release_zip
+
+
+class TestPSIDClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        archive = release_zip('FAM2001ER', 50)
+        cls.files = dict((str(1040 + i), archive) for i in range(0, 12))
+
+    def setUp(self):
+        self.dest = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dest)
+
+    def client(self, server, password='pass', **options):
+        return download.PSIDClient('user', password, base_url=server.url,
+                                   backoff=0.01, progress=None,
+                                   log=io.StringIO(), **options)
+
+    def test_wrong_password(self):
+        server = mock_simba.start(self.files, username='user',
+                                  password='pass')
+        try:
+            client = self.client(server, password='wrong')
+            with self.assertRaises(download.DownloadError):
+                client.download(list(self.files), self.dest)
+            self.assertEqual(server.counts['file_requests'], 0)
+        finally:
+            server.stop()
+
+    def test_expired_sessions(self):
+        #Every expiry ends the session of all threads, each must log in
+        #again before its file can be downloaded
+        server = mock_simba.start(self.files, fail_rate=0.3,
+                                  failures=['login'], seed=1)
+        try:
+            client = self.client(server, concurrency=4, retries=8)
+            paths = client.download(list(self.files), self.dest)
+        finally:
+            server.stop()
+        self.assertGreater(server.counts['failures'], 0)
+        self.assertGreater(client.logins, 1)
+        self.assertLessEqual(client.logins, server.counts['failures'] + 1)
+        for file, archive in self.files.items():
+            with open(paths[file], 'rb') as f:
+                self.assertEqual(f.read(), archive)
+        self.assertEqual(sorted(os.listdir(self.dest)),
+                         sorted(f + '.zip' for f in self.files))
+
+    def test_failed_file(self):
+        #A file failing for good abandons the downloads still running,
+        #without leaving pending tasks behind
+        archive = release_zip('FAM2001ER', 2000)
+        files = dict((f, archive) for f in self.files)
+        server = mock_simba.start(files, connection_bandwidth=2**18)
+        try:
+            client = self.client(server, concurrency=4, retries=0,
+                                 chunk_size=2**14)
+            start = time.time()
+            with self.assertNoLogs('asyncio'):
+                with self.assertRaises(download.DownloadError) as raised:
+                    client.download(['9999'] + list(files), self.dest)
+            elapsed = time.time() - start
+        finally:
+            server.stop()
+        self.assertIn('9999', str(raised.exception))
+        #Faster than a single file takes to download
+        self.assertLess(elapsed, len(archive)/2.**18/2)
+        self.assertLess(server.counts['file_requests'], len(files))
+
+
+if __name__ == '__main__':
+    unittest.main()
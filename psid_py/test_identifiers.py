@@ -0,0 +1,92 @@
+"""
+Origin: A file to test the compact identifiers of psid_py
+Filename: test_identifiers.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that identifiers.compact picks the smallest integer type
+at the limits of each type, and leaves alone what is not whole numbers, and
+that identifiers.pid_of does not overflow.
+Run it from the repository root with
+python -m unittest psid_py.test_identifiers.
+
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from psid_py import identifiers
+
+
+class TestCompact(unittest.TestCase):
+    def test_boundaries(self):
+        for dtype, larger in zip(identifiers.INTEGER_TYPES[:-1],
+                                 identifiers.INTEGER_TYPES[1:]):
+            info = np.iinfo(dtype)
+            for kind in [np.int64, np.float64]:
+                fits = np.array([info.min, 0, info.max], dtype=kind)
+                self.assertEqual(identifiers.compact(fits).dtype, dtype)
+                np.testing.assert_array_equal(identifiers.compact(fits),
+                                              fits)
+                for value in [info.min - 1, info.max + 1]:
+                    over = np.array([0, value], dtype=kind)
+                    self.assertEqual(identifiers.compact(over).dtype,
+                                     larger)
+                    self.assertEqual(identifiers.compact(over)[1], value)
+
+    def test_int64_limits(self):
+        info = np.iinfo(np.int64)
+        ints = np.array([info.min, info.max], dtype=np.int64)
+        self.assertIs(identifiers.compact(ints).dtype, ints.dtype)
+        #2**63 is beyond int64, the float array is returned unchanged
+        floats = np.array([0., 2.**63])
+        self.assertIs(identifiers.compact(floats), floats)
+        self.assertEqual(identifiers.compact(np.array([-2.**63])).dtype,
+                         np.int64)
+        big = np.array([0, 2**64 - 1], dtype=np.uint64)
+        self.assertIs(identifiers.compact(big), big)
+
+    def test_unchanged(self):
+        for values in [np.array([1., np.nan]), np.array([1., 2.5]),
+                       np.array([1., np.inf]), np.array(['1', '2']),
+                       np.array([], dtype=float)]:
+            self.assertIs(identifiers.compact(values), values)
+
+    def test_compact_ids(self):
+        x = pd.DataFrame({'ER30001': [1., 9308.], 'ER30002': [1., 170.],
+                          'weight': [1., 2.]})
+        out = identifiers.compact_ids(x, ['ER30001', 'ER30002', 'missing'])
+        self.assertEqual(out['ER30001'].dtype, np.int16)
+        self.assertEqual(out['ER30002'].dtype, np.int16)
+        self.assertEqual(out['weight'].dtype, np.float64)
+        self.assertEqual(x['ER30001'].dtype, np.float64)
+        self.assertIs(identifiers.compact_ids(x, ['weight2']), x)
+
+
+class TestPid(unittest.TestCase):
+    def test_pid_of(self):
+        pid = identifiers.pid_of(np.array([1, 9308], dtype=np.int16),
+                                 np.array([1, 170], dtype=np.int16))
+        self.assertEqual(pid.dtype, np.int32)
+        self.assertEqual(pid.tolist(), [1001, 9308170])
+        limit = np.iinfo(np.int32).max
+        pid = identifiers.pid_of([limit//1000], [limit % 1000])
+        self.assertEqual(pid.dtype, np.int32)
+        self.assertEqual(pid.tolist(), [limit])
+
+        #Identifiers beyond 32 bits are 64 bit integers
+        for ID1968, pernum in [([3000000], [1]), ([limit//1000], [648]),
+                               ([-3000000], [1])]:
+            pid = identifiers.pid_of(ID1968, pernum)
+            self.assertEqual(pid.dtype, np.int64)
+            self.assertEqual(pid.tolist(), [ID1968[0]*1000 + pernum[0]])
+        pid = identifiers.pid_of(np.array([3000000.]), np.array([1.]))
+        self.assertEqual(pid.tolist(), [3000000001.])
+        self.assertEqual(identifiers.pid_of(np.array([], dtype=int),
+                                            np.array([], dtype=int)).dtype,
+                         np.int32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Origin: A file to test the family and individual merge of psid_py
+Filename: test_join.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks join.interview_join against pd.merge on small fixed
+frames.  Run it from the repository root with
+python -m unittest psid_py.test_join.
+
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from psid_py import join
+
+
+def merged(fam, ind):
+    """pd.merge of fam and ind in the order of the individual rows."""
+    m = pd.merge(fam, ind, on='interview')
+    return m.sort_values('row', kind='mergesort').reset_index(drop=True)
+
+
+class TestInterviewJoin(unittest.TestCase):
+    def setUp(self):
+        self.fam = pd.DataFrame({'interview': [3, 1, 4, 2, 6],
+                                 'income': [30., 10., 40., 20., 60.],
+                                 'weight': [.3, .1, .4, .2, .6]})
+        #Individuals in families without a record (0, 5, 9) are dropped
+        self.ind = pd.DataFrame({'interview': [1, 0, 4, 4, 5, 2, 9, 6, 1],
+                                 'pernum': [1, 2, 3, 4, 5, 6, 7, 8, 9],
+                                 'weight': np.arange(9)/10.,
+                                 'row': np.arange(9)})
+
+    def check(self, fam, ind):
+        result = join.interview_join(fam, ind)
+        pd.testing.assert_frame_equal(result, merged(fam, ind))
+
+    def test_lookup_table(self):
+        self.check(self.fam, self.ind)
+
+    def test_sorted_family(self):
+        self.check(self.fam.sort_values('interview'), self.ind)
+
+    def test_float_keys(self):
+        fam = self.fam.astype({'interview': float})
+        ind = self.ind.astype({'interview': float})
+        self.check(fam, ind)
+
+    def test_fractional_keys(self):
+        #A fractional key matches no family, rather than its whole part
+        fam = self.fam.astype({'interview': float})
+        ind = self.ind.astype({'interview': float})
+        ind.loc[[0, 2], 'interview'] = [3.5, 1.25]
+        self.check(fam, ind)
+        fam = pd.DataFrame({'interview': [3., 4.], 'income': [30., 40.]})
+        ind = pd.DataFrame({'interview': [3.5, 4.], 'row': [0, 1]})
+        result = join.interview_join(fam, ind)
+        self.assertEqual(result['row'].tolist(), [1])
+        self.check(fam, ind)
+
+    def test_sparse_keys(self):
+        #Keys too large for a lookup table are searched in the sorted keys
+        fam = self.fam.assign(interview=self.fam['interview']*10**6)
+        ind = self.ind.assign(interview=self.ind['interview']*10**6)
+        self.check(fam, ind)
+        self.check(fam.astype({'interview': float}),
+                   ind.astype({'interview': float}))
+
+    def test_negative_and_null_keys(self):
+        fam = self.fam.astype({'interview': float})
+        fam.loc[0, 'interview'] = -3.
+        ind = self.ind.astype({'interview': float})
+        ind.loc[[0, 1], 'interview'] = [-3., np.nan]
+        self.check(fam, ind)
+
+    def test_no_match(self):
+        result = join.interview_join(self.fam, self.ind[self.ind['row'] == 1])
+        self.assertEqual(result.shape[0], 0)
+        self.assertEqual(list(result.columns),
+                         list(merged(self.fam, self.ind).columns))
+
+    def test_duplicate_keys(self):
+        fam = pd.concat([self.fam, self.fam.iloc[[2]]])
+        for keys in [fam, fam.assign(interview=fam['interview']*10**6),
+                     fam.astype({'interview': float})]:
+            with self.assertRaises(join.JoinError) as raised:
+                join.interview_join(keys, self.ind)
+            self.assertIn(str(keys['interview'].iloc[2]),
+                          str(raised.exception))
+        #Without validation each key takes one of its family rows
+        result = join.interview_join(fam, self.ind, validate=False)
+        self.assertEqual(result.shape[0], merged(self.fam, self.ind).shape[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
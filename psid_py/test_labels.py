@@ -0,0 +1,67 @@
+"""
+Origin: A file to test the value labels of psid_py
+Filename: test_labels.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks labels.categorical and labels.apply_labels on small
+tables of labels, fully and partially covering the values of a column.  Run
+it from the repository root with python -m unittest psid_py.test_labels.
+
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from psid_py import labels
+
+
+MARRIED = {1: 'Married', 2: 'Never married', 3: 'Widowed',
+           8: 'NA; DK', 9: 'NA; DK'}
+
+
+class TestCategorical(unittest.TestCase):
+    def test_fully_labeled(self):
+        x = labels.categorical(np.array([2., 1., 9., np.nan, 8.]), MARRIED)
+        self.assertEqual(list(x.categories),
+                         ['Married', 'Never married', 'Widowed', 'NA; DK'])
+        self.assertEqual(x.tolist(), ['Never married', 'Married', 'NA; DK',
+                                      np.nan, 'NA; DK'])
+
+    def test_partially_labeled(self):
+        #A labeled special code among plain amounts keeps the codes
+        self.assertIsNone(labels.categorical(np.array([1., 4., 2.]),
+                                             MARRIED))
+        self.assertIsNone(labels.categorical(np.array([1.5, 1.]), MARRIED))
+        x = pd.DataFrame({'ER1': [1., 2., 3.], 'ER2': [1., 52., 9.],
+                          'ER3': [1., 2., 9.]})
+        out = labels.apply_labels(x, {'MARRIED': MARRIED},
+                                  {'ER1': 'MARRIED', 'ER2': 'MARRIED'})
+        self.assertEqual(out['ER1'].tolist(), ['Married', 'Never married',
+                                               'Widowed'])
+        pd.testing.assert_series_equal(out['ER2'], x['ER2'])
+        pd.testing.assert_series_equal(out['ER3'], x['ER3'])
+        self.assertIs(labels.apply_labels(x, {'MARRIED': MARRIED},
+                                          {'ER2': 'MARRIED'}), x)
+
+    def test_shared_dtype(self):
+        a = labels.categorical(np.array([1, 2]), MARRIED)
+        b = labels.categorical(np.array([9., 3.]), dict(MARRIED))
+        self.assertIs(a.dtype, b.dtype)
+        #Years concatenated keep the categorical type
+        both = pd.concat([pd.Series(a), pd.Series(b)])
+        self.assertEqual(both.dtype, a.dtype)
+        self.assertEqual(both.tolist(), ['Married', 'Never married',
+                                         'NA; DK', 'Widowed'])
+
+    def test_string_codes(self):
+        table = {'A': 'Owns', 'B': 'Rents'}
+        x = labels.categorical(np.array(['B ', 'A', None], dtype=object),
+                               table)
+        self.assertEqual(x.tolist(), ['Rents', 'Owns', np.nan])
+        self.assertIsNone(labels.categorical(np.array(['A', 'C']), table))
+
+
+if __name__ == '__main__':
+    unittest.main()
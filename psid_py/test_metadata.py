@@ -0,0 +1,121 @@
+"""
+Origin: A file to test the PSID metadata loader of psid_py
+Filename: test_metadata.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that the metadata shipped with the package describes
+the waves and files used by makeids and psid_files, that an updated copy
+set with the PSID_METADATA environment variable or metadata.use() adds a
+release without code changes and changes the digest builds are cached
+under, and that invalid files raise a MetadataError.  Run it from the
+repository root with python -m unittest psid_py.test_metadata.
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from psid_py import cache, metadata
+from psid_py.psid_py import makeids, psid_files
+
+
+class TestMetadata(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        with open(metadata.DEFAULT_FILE) as f:
+            self.found = json.load(f)
+        #Tests must not see a metadata file set by the environment
+        self.environ = mock.patch.dict(os.environ)
+        self.environ.start()
+        os.environ.pop('PSID_METADATA', None)
+
+    def tearDown(self):
+        metadata.use(None)
+        self.environ.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, found, name='metadata.json'):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            json.dump(found, f)
+        return path
+
+    def newer(self):
+        #A 2013 release adding a wave and a new individual file
+        found = dict(self.found, release=2013)
+        found['individual'] = {'year': 2013, 'file': 1100,
+                               'name': 'IND2013ER'}
+        found['waves'] = found['waves'] + [[2013, 'ER34201', 'ER34202',
+                                            'ER34203', 10, 'ER53002', 1200]]
+        return self.write(found, 'newer.json')
+
+    def test_default(self):
+        ids = makeids()
+        self.assertEqual(ids.index.tolist(),
+                         [x[0] for x in self.found['waves']])
+        self.assertEqual(ids.loc[2011, 'ind_interview'], 'ER34101')
+        self.assertEqual(ids.loc[2011, 'fam_interview'], 'ER47302')
+        files = psid_files([2009, 2011], '')
+        self.assertEqual(files.index.tolist(), ['1053', '1152', '1156'])
+        self.assertEqual(files['name'].tolist(), ['IND2011ER', 'FAM2009ER',
+                                                  'FAM2011ER'])
+        with open(metadata.DEFAULT_FILE, 'rb') as f:
+            self.assertEqual(metadata.digest(),
+                             hashlib.sha256(f.read()).hexdigest())
+        #Read once per process
+        self.assertIs(metadata.load(), metadata.load())
+
+    def test_newer_release(self):
+        path = self.newer()
+        default = metadata.digest()
+        key = cache.build_key({}, [], self.temp_dir)
+        with mock.patch.dict(os.environ, {'PSID_METADATA': path}):
+            self.assertEqual(metadata.current_file(), path)
+            self.assertEqual(makeids().index[-1], 2013)
+            files = psid_files([2011, 2013], '')
+            self.assertEqual(files.index.tolist(), ['1100', '1156', '1200'])
+            self.assertEqual(files.loc['1100', 'name'], 'IND2013ER')
+            self.assertNotEqual(metadata.digest(), default)
+            self.assertNotEqual(cache.build_key({}, [], self.temp_dir), key)
+
+            #use() comes before the environment
+            metadata.use(metadata.DEFAULT_FILE)
+            self.assertEqual(makeids().index[-1], 2011)
+            metadata.use(None)
+            self.assertEqual(makeids().index[-1], 2013)
+        self.assertEqual(metadata.digest(), default)
+        self.assertEqual(cache.build_key({}, [], self.temp_dir), key)
+
+    def test_errors(self):
+        invalid = [dict(self.found, version=2),
+                   dict(self.found, columns=self.found['columns'][:-1]),
+                   dict((k, v) for k, v in self.found.items()
+                        if k != 'individual'),
+                   dict(self.found, waves=self.found['waves']
+                        + self.found['waves'][-1:])]
+        messages = ['has version 2', 'lacks fam_file', 'lacks individual',
+                    'repeats a year']
+        for k, (found, message) in enumerate(zip(invalid, messages)):
+            path = self.write(found, 'invalid' + str(k) + '.json')
+            with self.assertRaises(metadata.MetadataError) as raised:
+                metadata.use(path)
+            self.assertIn(message, raised.exception.value)
+            #A file that fails to load is not used
+            self.assertEqual(metadata.current_file(), metadata.DEFAULT_FILE)
+
+        with self.assertRaises(metadata.MetadataError) as raised:
+            metadata.load(os.path.join(self.temp_dir, 'missing.json'))
+        self.assertIn('Cannot read', raised.exception.value)
+        with open(os.path.join(self.temp_dir, 'broken.json'), 'w') as f:
+            f.write('{"version": 1,')
+        with self.assertRaises(metadata.MetadataError):
+            metadata.load(os.path.join(self.temp_dir, 'broken.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()
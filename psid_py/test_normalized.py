@@ -0,0 +1,73 @@
+"""
+Origin: A file to test the normalized panels of psid_py
+Filename: test_normalized.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that the NormalizedPanel returned by
+build_panel(normalized=True) rebuilds the wide panel build_panel returns,
+for every design and for selected years and variables, while holding each
+family once, on synthetic data written by synthetic.write_panel_data().
+Run it from the repository root with python -m unittest
+psid_py.test_normalized.
+
+"""
+import contextlib
+import io
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from psid_py import synthetic
+from psid_py.psid_py import build_panel
+
+
+class TestDenormalize(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.datadir = tempfile.mkdtemp()
+        cls.fam_vars, cls.ind_vars = synthetic.write_panel_data(
+            cls.datadir, n_fam=200, n_vars=3)
+        #A variable missing in a year
+        cls.fam_vars['v1'][1] = 'NA'
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.datadir)
+
+    def build(self, design, normalized):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return build_panel(self.fam_vars, design=design,
+                               datadir=self.datadir, ind_vars=self.ind_vars,
+                               normalized=normalized, log=io.StringIO())
+
+    def test_equals_wide(self):
+        for design in ['balanced', 2, 'all']:
+            wide = self.build(design, False).reset_index(drop=True)
+            panel = self.build(design, True)
+            self.assertEqual(panel.shape, wide.shape)
+            pd.testing.assert_frame_equal(panel.denormalize(), wide,
+                                          check_dtype=False)
+
+            #One row per family and year
+            self.assertFalse(panel.families.index.duplicated().any())
+            self.assertEqual(panel.families.shape[0],
+                             wide.groupby(['year', 'interview']).ngroups)
+            self.assertLess(panel.nbytes(),
+                            wide.memory_usage(deep=True).sum())
+
+    def test_selection(self):
+        wide = self.build(2, False)
+        panel = self.build(2, True)
+        x = panel.denormalize(years=[2003, 2007], columns=['v0'])
+        expected = wide.loc[wide['year'].isin([2003, 2007]),
+                            x.columns].reset_index(drop=True)
+        self.assertEqual(list(x.columns[:2]), ['v0', 'interview'])
+        self.assertNotIn('v2', x.columns)
+        pd.testing.assert_frame_equal(x, expected, check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
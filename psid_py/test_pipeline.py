@@ -0,0 +1,112 @@
+"""
+Origin: A file to test the download and conversion pipeline of psid_py
+Filename: test_pipeline.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that pipeline.acquire_iter, converting archives while the
+others download, writes the same files as converting each archive after
+the download, prints to its log only, and stops early when a file fails or
+the caller stops, against the local stand-in for the SIMBA website, see
+mock_simba.  Run it from the repository root with
+python -m unittest psid_py.test_pipeline.
+
+"""
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+
+from psid_py import catalog, mock_simba, pipeline, psid_py, storage
+from psid_py.synthetic import release_zip
+
+
+class TestAcquireIter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.years = [2001, 2003, 2005]
+        files = psid_py.psid_files(cls.years, '')
+        cls.archives = dict((f, release_zip(files.loc[f, 'name'], 200, 20))
+                            for f in files.index)
+
+    def setUp(self):
+        self.datadir = tempfile.mkdtemp() + os.sep
+
+    def tearDown(self):
+        shutil.rmtree(self.datadir)
+
+    def test_equals_serial(self):
+        files = psid_py.psid_files(self.years, self.datadir)
+        server = mock_simba.start(self.archives)
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                found = list(pipeline.acquire_iter(
+                    self.years, self.datadir, 'user', 'pass', processes=2,
+                    base_url=server.url, out_type='parquet', log=log))
+        finally:
+            server.stop()
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertIn('Reading in FAM2003ER.', log.getvalue())
+        self.assertEqual(sorted((year, kind) for year, kind, out in found),
+                         sorted(zip(files['year'], files['type'])))
+
+        serial = tempfile.mkdtemp()
+        try:
+            for year, kind, out in found:
+                file = files.index[(files['year'] == year)
+                                   & (files['type'] == kind)][0]
+                with contextlib.redirect_stdout(io.StringIO()):
+                    expected = psid_py.convert_zip(
+                        io.BytesIO(self.archives[file]),
+                        os.path.join(serial, os.path.basename(
+                            files.loc[file, 'name'])), 'parquet')
+                pd.testing.assert_frame_equal(storage.read_frame(out),
+                                              storage.read_frame(expected))
+        finally:
+            shutil.rmtree(serial)
+
+    def test_failed_file(self):
+        #A file lacking a required variable ends the acquisition
+        server = mock_simba.start(self.archives, connection_bandwidth=2**16)
+        require = {2003: ['ER00001', 'ER99999']}
+        try:
+            with self.assertRaises(catalog.VariableError) as raised:
+                for found in pipeline.acquire_iter(
+                        self.years, self.datadir, 'user', 'pass',
+                        processes=1, concurrency=1, base_url=server.url,
+                        require=require, log=io.StringIO()):
+                    pass
+        finally:
+            server.stop()
+        self.assertIn('FAM2003ER lacks ER99999', str(raised.exception))
+        self.assertFalse(os.path.exists(self.datadir + 'FAM2003ER.csv'))
+
+    def test_stop(self):
+        server = mock_simba.start(self.archives, connection_bandwidth=2**15)
+        try:
+            start = time.time()
+            for found in pipeline.acquire_iter(
+                    self.years, self.datadir, 'user', 'pass', processes=1,
+                    concurrency=1, base_url=server.url, log=io.StringIO()):
+                break
+            elapsed = time.time() - start
+            first = server.counts['file_requests']
+            time.sleep(0.5)
+            self.assertEqual(server.counts['file_requests'], first)
+        finally:
+            server.stop()
+        self.assertEqual(found[1], 'ind')
+        self.assertLess(first, len(self.archives))
+        #Well before the remaining archives could download
+        rest = sum(len(x) for x in self.archives.values())
+        self.assertLess(elapsed, rest/2.**15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Origin: A file to test the presence index of psid_py
+Filename: test_presence.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that presence.design_filter keeps every individual the
+design keeps in the merged panel, counting the years each individual is
+present in the panel built with design 'all', including individual rows
+without identifiers, on synthetic data written by
+synthetic.write_panel_data().  Run it from the repository root with
+python -m unittest psid_py.test_presence.
+
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from psid_py import metadata, presence, synthetic
+from psid_py.psid_py import build_panel, makeids
+
+
+class TestDesignFilter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.datadir = tempfile.mkdtemp()
+        cls.fam_vars, cls.ind_vars = synthetic.write_panel_data(
+            cls.datadir, n_fam=300, n_vars=2)
+        cls.years = cls.fam_vars['year']
+
+        #Individuals without a 1968 identifier or person number
+        cls.ind_file = os.path.join(cls.datadir,
+                                    metadata.individual_file()['name']
+                                    + '.csv')
+        ind = pd.read_csv(cls.ind_file)
+        ind.loc[[0, 10], 'ER30001'] = np.nan
+        ind.loc[[5, 10], 'ER30002'] = np.nan
+        ind.to_csv(cls.ind_file, index=False)
+        cls.ind = ind
+        cls.ids = makeids()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.datadir)
+
+    def build(self, design, heads_only=None):
+        return build_panel(self.fam_vars, design=design,
+                           datadir=self.datadir, ind_vars=self.ind_vars,
+                           heads_only=heads_only, log=io.StringIO())
+
+    def test_null_ids(self):
+        index = presence.build_index(self.ind, self.ids)
+        self.assertEqual(index.shape[0], self.ind.shape[0])
+        self.assertEqual(index['pid'].iloc[[0, 5, 10]].tolist(), [-1]*3)
+        self.assertEqual(index['interviewed'].iloc[[0, 5, 10]].tolist(),
+                         [0]*3)
+        self.assertEqual(index['head'].iloc[[0, 5, 10]].tolist(), [0]*3)
+        self.assertEqual(index['pid'].iloc[1],
+                         self.ind['ER30001'].iloc[1]*1000
+                         + self.ind['ER30002'].iloc[1])
+
+    def test_against_panel(self):
+        index = presence.build_index(self.ind, self.ids)
+        for heads_only in [None, True]:
+            every = self.build('all', heads_only)
+            present = every.groupby('pid').size()
+            for design in ['balanced', 1, 2, 3, 4]:
+                keep = presence.design_filter(index, self.years, design,
+                                              heads_only, self.ids)
+                kept = set(index['pid'].values[keep])
+                panel = self.build(design, heads_only)
+                self.assertTrue(set(panel['pid']) <= kept)
+
+                #The filter changes nothing in the panel
+                least = present.max() if design == 'balanced' else design
+                expected = set(present.index[present >= least])
+                self.assertEqual(set(panel['pid']), expected)
+                if design != 'balanced':
+                    #Counting the waves finds the same individuals
+                    self.assertEqual(expected, kept & set(present.index))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+Origin: A file to test the fixed width reader of psid_py
+Filename: test_read_sas.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks read_sas.read_records against pd.read_fwf, and the
+missing value codes of read_sas.decode_group, on a small dictionary with a
+gap, a character variable and implied decimals, and read_sas.parse_sas on
+@START VAR W.D dictionaries.  Run it from the repository root with
+python -m unittest psid_py.test_read_sas.
+
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from psid_py import read_sas
+
+
+DICTIONARY = '''DATA PSID.TEST ;
+INFILE 'test.txt' LRECL = 16 ;
+INPUT
+      V1        1 - 3
+      NAME   $  4 - 7   /* a character variable */
+      V2       10 - 13 .2
+      V3       14 - 16
+;
+'''
+
+#Columns 8 and 9 are a gap, the last record has no line terminator
+RECORDS = ('123abcd  4567890\n'
+           '  7xy    0012 12\n'
+           '999    zz9999   \n'
+           '001 q  ab0000  5')
+
+
+class TestReadRecords(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.dict_file = os.path.join(cls.temp_dir, 'test.sas')
+        cls.data_file = os.path.join(cls.temp_dir, 'test.txt')
+        with open(cls.dict_file, 'w') as f:
+            f.write(DICTIONARY)
+        with open(cls.data_file, 'w') as f:
+            f.write(RECORDS)
+        cls.specs = read_sas.column_specs(read_sas.parse_sas(cls.dict_file,
+                                                             1))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    def expected(self, skiprows=0, nrows=None):
+        """pd.read_fwf of the records, with the implied decimals."""
+        specs = self.specs
+        x = pd.read_fwf(self.data_file, header=None, skiprows=skiprows,
+                        nrows=nrows, names=list(specs['varname']),
+                        colspecs=[(s, s + w) for s, w in
+                                  zip(specs['start'], specs['width'])],
+                        dtype=dict((v, str) for v, c in
+                                   zip(specs['varname'], specs['char'])
+                                   if c))
+        for name, char, divisor in zip(specs['varname'], specs['char'],
+                                       specs['divisor']):
+            if not char:
+                x[name] = x[name].astype(float)*float(divisor)
+        return x
+
+    def test_specs(self):
+        self.assertEqual(list(self.specs['varname']),
+                         ['V1', 'NAME', 'V2', 'V3'])
+        self.assertEqual(list(self.specs['start']), [0, 3, 9, 13])
+        self.assertEqual(list(self.specs['width']), [3, 4, 4, 3])
+        self.assertEqual(list(self.specs['char']), [False, True, False,
+                                                    False])
+
+    def test_read_fwf(self):
+        for workers in [1, 2, 4]:
+            x = read_sas.read_records(self.data_file, self.specs,
+                                      workers=workers)
+            pd.testing.assert_frame_equal(x, self.expected())
+
+    def test_range(self):
+        x = read_sas.read_records(self.data_file, self.specs, offset=17,
+                                  nrows=2)
+        pd.testing.assert_frame_equal(x, self.expected(1, 2))
+        x = read_sas.read_records(self.data_file, self.specs, offset=51)
+        pd.testing.assert_frame_equal(x, self.expected(3))
+
+    def test_stream(self):
+        with open(self.data_file, 'rb') as f:
+            stream = io.BytesIO(f.read())
+        x = read_sas.read_records(stream, self.specs)
+        pd.testing.assert_frame_equal(x, self.expected())
+
+        #Streams are decoded in pieces of whole records
+        for chunk_bytes in [1, 16, 40, 64, 10**6]:
+            for missing in [None, {'V1': [999], 'V3': [5]}]:
+                stream.seek(0)
+                x = read_sas.read_records(stream, self.specs,
+                                          missing=missing,
+                                          chunk_bytes=chunk_bytes)
+                pd.testing.assert_frame_equal(x, read_sas.read_records(
+                    self.data_file, self.specs, missing=missing))
+        #Pieces ending where the first read ends
+        for chunk_bytes in [16, 32, 48]:
+            stream = io.BytesIO(RECORDS.encode('ascii'))
+            stream.read = lambda n=-1, read=stream.read: read(min(n, 16))
+            x = read_sas.read_records(stream, self.specs,
+                                      chunk_bytes=chunk_bytes)
+            pd.testing.assert_frame_equal(x, self.expected())
+        self.assertEqual(read_sas.read_records(io.BytesIO(b''),
+                                               self.specs).shape, (0, 4))
+
+    def test_skip_decimal_division(self):
+        x = read_sas.read_records(self.data_file, self.specs,
+                                  skip_decimal_division=True)
+        self.assertEqual(list(x['V2']), [4567., 12., 9999., 0.])
+
+
+class TestParseSas(unittest.TestCase):
+    def parse(self, dictionary):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            name = os.path.join(temp_dir, 'test.sas')
+            with open(name, 'w') as f:
+                f.write(dictionary)
+            return read_sas.parse_sas(name, 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_ampersand(self):
+        #@START VAR W.D: W columns, D implied decimals, W. or W none
+        DF = self.parse('DATA X;\nINPUT\n @1 V1 5.2\n @6 V2 $ 3.\n'
+                        ' @9 V3 4\n;\nRUN;\n')
+        self.assertEqual(list(DF['varname']), ['V1', 'V2', 'V3'])
+        self.assertEqual(list(DF['width']), [5, 3, 4])
+        self.assertEqual(list(DF['char']), [False, True, False])
+        self.assertEqual([float(x) for x in DF['divisor']], [0.01, 1, 1])
+
+    def test_ampersand_gap(self):
+        DF = self.parse('DATA X;\nINPUT\n @1 V1 2.1\n @6 V2 3\n;\n')
+        specs = read_sas.column_specs(DF)
+        self.assertEqual(list(specs['varname']), ['V1', 'V2'])
+        self.assertEqual(list(specs['start']), [0, 5])
+        self.assertEqual([float(x) for x in specs['divisor']], [0.1, 1])
+
+
+class TestMissingCodes(unittest.TestCase):
+    def decode(self, lines, group, missing):
+        blocks = [np.frombuffer(''.join(lines).encode('ascii'),
+                                dtype=np.uint8).reshape(len(lines), -1)]
+        return dict(read_sas.decode_group(blocks, group, None,
+                                          read_sas.missing_codes(missing)))
+
+    def test_decode_group(self):
+        group = pd.DataFrame({'varname': ['A', 'B', 'C'],
+                              'start': [0, 3, 7], 'width': [3, 4, 2],
+                              'char': [False, False, False],
+                              'divisor': [1, 0.01, 1]})
+        lines = ['9991234 1\n',
+                 '  5999900\n',
+                 ' 12 250  \n']
+        #Codes are compared before the implied decimals, names in any case
+        out = self.decode(lines, group, {'a': [999], 'B': [9999],
+                                         'c': [0, 99]})
+        self.assertEqual(out['A'].dtype, pd.Int64Dtype())
+        self.assertEqual(out['A'].tolist(), [pd.NA, 5, 12])
+        self.assertEqual(out['B'].dtype, pd.Float64Dtype())
+        self.assertEqual(out['B'].tolist(), [12.34, pd.NA, 2.5])
+        self.assertEqual(out['C'].tolist(), [1, pd.NA, pd.NA])
+
+    def test_without_codes(self):
+        group = pd.DataFrame({'varname': ['A', 'B'], 'start': [0, 3],
+                              'width': [3, 2], 'char': [False, False],
+                              'divisor': [1, 1]})
+        lines = ['999 1\n', '   12\n']
+        #Blank fields are null, variables without codes keep every value
+        out = self.decode(lines, group, {'Z': [1]})
+        self.assertEqual(out['A'].tolist(), [999, pd.NA])
+        self.assertEqual(out['B'].tolist(), [1, 12])
+        plain = dict(read_sas.decode_group(
+            [np.frombuffer(''.join(lines).encode('ascii'),
+                           dtype=np.uint8).reshape(2, -1)], group))
+        self.assertTrue(np.isnan(plain['A'][1]))
+        self.assertEqual(plain['A'][0], 999.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Origin: A file to test the panel summaries of psid_py
+Filename: test_stats.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that merged stats.WeightedStats accumulators equal a
+single pass over all the observations, and that stats.panel_summary equals
+the statistics of the panel built by build_panel, on synthetic data
+written by synthetic.write_panel_data().  Run it from the repository root
+with python -m unittest psid_py.test_stats.
+
+"""
+import io
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from psid_py import stats, synthetic
+from psid_py.psid_py import build_panel
+
+
+class TestWeightedStats(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.x = rng.lognormal(10, 1, 5000)
+        self.w = rng.rand(5000)*2
+        self.x[::97] = np.nan
+        self.w[::89] = 0
+
+    def check(self, merged, single, exact):
+        self.assertEqual(merged.n, single.n)
+        self.assertAlmostEqual(merged.weight, single.weight, 6)
+        self.assertAlmostEqual(merged.mean/single.mean, 1, 12)
+        self.assertAlmostEqual(merged.std()/single.std(), 1, 12)
+        spread = np.nanquantile(self.x, 0.9) - np.nanquantile(self.x, 0.1)
+        quantiles = [0.1, 0.5, 0.9]
+        if exact:
+            np.testing.assert_allclose(merged.quantile(quantiles),
+                                       single.quantile(quantiles))
+        else:
+            np.testing.assert_allclose(merged.quantile(quantiles),
+                                       single.quantile(quantiles),
+                                       atol=spread*0.02)
+
+    def test_merge(self):
+        ok = np.isfinite(self.x) & (self.w > 0)
+        x, w = self.x[ok], self.w[ok]
+        single = stats.WeightedStats(capacity=10**4).add(self.x, self.w)
+        self.assertEqual(single.n, ok.sum())
+        self.assertAlmostEqual(single.mean, np.dot(w, x)/w.sum(), 6)
+        self.assertAlmostEqual(
+            single.std(), np.sqrt(np.dot(w, (x - single.mean)**2)/w.sum()),
+            6)
+
+        #Pieces merged in any grouping, without compression
+        parts = [stats.WeightedStats(capacity=10**4).add(self.x[i:j],
+                                                         self.w[i:j])
+                 for i, j in [(0, 1), (1, 700), (700, 3000), (3000, 5000)]]
+        merged = stats.WeightedStats(capacity=10**4)
+        for part in parts:
+            merged.merge(part)
+        self.check(merged, single, True)
+        self.check(stats.merge_cells({'a': parts[0]}, {'a': parts[1]})['a']
+                   .merge(parts[2].merge(parts[3])), single, True)
+
+        #Compressed sketches keep the moments exact
+        small = stats.WeightedStats(capacity=100)
+        for i in range(0, 5000, 250):
+            small.add(self.x[i:i + 250], self.w[i:i + 250])
+        self.assertLessEqual(small.values.shape[0], 200)
+        self.check(small, single, False)
+
+    def test_empty(self):
+        acc = stats.WeightedStats().add([np.nan, 1.], [1., 0.])
+        self.assertEqual(acc.n, 0)
+        self.assertTrue(np.isnan(acc.std()))
+        self.assertTrue(np.isnan(acc.quantile(0.5)).all())
+        self.assertIs(acc.merge(stats.WeightedStats()), acc)
+
+
+class TestPanelSummary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.datadir = tempfile.mkdtemp()
+        cls.fam_vars, cls.ind_vars = synthetic.write_panel_data(
+            cls.datadir, n_fam=200, n_vars=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.datadir)
+
+    def test_equals_panel(self):
+        for design in ['balanced', 3, 'all']:
+            log = io.StringIO()
+            summary = stats.panel_summary(self.fam_vars, 'weight',
+                                          design=design,
+                                          datadir=self.datadir,
+                                          ind_vars=self.ind_vars, log=log)
+            panel = build_panel(self.fam_vars, design=design,
+                                datadir=self.datadir, ind_vars=self.ind_vars,
+                                log=log)
+            self.assertEqual(sorted(set(summary.index.get_level_values(0))),
+                             sorted(set(panel['year'])))
+            for year, rows in panel.groupby('year'):
+                for var in ['v0', 'v1']:
+                    w = rows['weight'].values
+                    x = rows[var].values.astype(float)
+                    row = summary.loc[(year, 'all', var)]
+                    self.assertEqual(row['count'], rows.shape[0])
+                    self.assertAlmostEqual(row['mean'],
+                                           np.dot(w, x)/w.sum(), 6)
+                    self.assertAlmostEqual(row['weight'], w.sum(), 6)
+
+    def test_log(self):
+        log = io.StringIO()
+        summary = stats.panel_summary(self.fam_vars, design=2,
+                                      datadir=self.datadir,
+                                      ind_vars=self.ind_vars, verbose=True,
+                                      log=log)
+        self.assertIsNotNone(summary)
+        self.assertIn('Currently working on data', log.getvalue())
+
+    def test_invalid_design(self):
+        for design in ['2', 2.5, -1, None]:
+            log = io.StringIO()
+            self.assertIsNone(stats.panel_summary(
+                self.fam_vars, design=design, datadir=self.datadir,
+                ind_vars=self.ind_vars, log=log))
+            self.assertIn("ERROR: (build_panel) The design must be",
+                          log.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Origin: A file to test the binary storage of converted PSID files
+Filename: test_storage.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that storage.write_frame and storage.read_frame return
+the converted data for every format, with character variables, nulls,
+column selections and value labels, that npy files are memory mapped and
+that panels built from npy files equal panels built from csv, on synthetic
+data written by synthetic.write_panel_data().  Run it from the repository
+root with python -m unittest psid_py.test_storage.
+
+"""
+import contextlib
+import glob
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from psid_py import read_sas, storage, synthetic
+from psid_py.psid_py import build_panel
+
+
+DICTIONARY = '''DATA PSID.TEST ;
+INPUT
+      ER1        1 - 3
+      ER2   $    4 - 7
+      ER3        8 - 11 .2
+      ER4   $   12 - 13
+;
+'''
+
+
+class TestRoundTrip(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        dict_file = os.path.join(self.temp_dir, 'test.sas')
+        with open(dict_file, 'w') as f:
+            f.write(DICTIONARY)
+        self.layout = read_sas.parse_sas(dict_file, 1)
+        self.x = pd.DataFrame({'ER1': [1., 2., np.nan, 4.],
+                               'ER2': ['0012', np.nan, 'ab', 'x'],
+                               'ER3': [0.25, 10., 99.99, np.nan],
+                               'ER4': ['A', 'B', 'A', np.nan]})
+        self.x['ER2'] = self.x['ER2'].astype(object)
+        self.x['ER4'] = self.x['ER4'].astype(object)
+        self.labels = ({'ANSWER': {1: 'Yes', 2: 'No', 4: 'Maybe'}},
+                       {'ER1': 'ANSWER'})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, out_type, x=None):
+        return storage.write_frame(self.x if x is None else x,
+                                   os.path.join(self.temp_dir, 'FAM2001ER'),
+                                   out_type, self.layout, self.labels)
+
+    def test_round_trip(self):
+        for out_type in ['csv', 'parquet', 'npy']:
+            out = self.write(out_type)
+            self.assertTrue(out.endswith('.' + out_type))
+            x = storage.read_frame(out, list(self.x.columns))
+            pd.testing.assert_frame_equal(x, self.x, check_dtype=False)
+            self.assertEqual(storage.frame_columns(out)[-4:],
+                             list(self.x.columns))
+
+            #Selected columns, in the order asked for
+            x = storage.read_frame(out, ['ER4', 'ER1'])
+            self.assertEqual(list(x.columns), ['ER4', 'ER1'])
+            pd.testing.assert_frame_equal(x, self.x[['ER4', 'ER1']],
+                                          check_dtype=False)
+
+    def test_layout(self):
+        out = self.write('npy')
+        layout = storage.read_layout(out)
+        self.assertEqual(layout['rows'], 4)
+        self.assertEqual([c['char'] for c in layout['columns']],
+                         [False, True, False, True])
+        self.assertEqual([c['divisor'] for c in layout['columns']],
+                         [1., 1., .01, 1.])
+        #Codes of a character variable keep their leading zeros
+        self.assertEqual(storage.read_frame(out, ['ER2'])['ER2'][0], '0012')
+
+    def test_nullable(self):
+        x = self.x.copy()
+        x['ER1'] = pd.array([1, 2, None, 4], dtype='Int64')
+        for out_type in ['parquet', 'npy']:
+            out = self.write(out_type, x)
+            self.assertTrue(np.isnan(
+                storage.read_frame(out, ['ER1'])['ER1'].astype(float)[2]))
+
+    def test_labels(self):
+        for out_type in ['parquet', 'npy']:
+            out = self.write(out_type)
+            x = storage.read_frame(out, ['ER1', 'ER3'], labels=True)
+            self.assertEqual(x['ER1'].dtype, 'category')
+            self.assertEqual(x['ER1'].tolist(), ['Yes', 'No', np.nan,
+                                                 'Maybe'])
+            self.assertEqual(x['ER3'].dtype, np.float64)
+        self.assertEqual(storage.frame_labels(self.write('csv')), ({}, {}))
+
+    def test_unknown_type(self):
+        with self.assertRaises(ValueError):
+            self.write('xlsx')
+
+
+class TestMemoryMap(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_views(self):
+        x = pd.DataFrame({'ER1': np.arange(10.), 'ER2': np.arange(10.)**2,
+                          'ER3': np.ones(10)})
+        out = storage.write_frame(x, os.path.join(self.temp_dir, 'FAM'),
+                                  'npy')
+        mapped = storage.read_frame(out, ['ER2', 'ER3'])
+        pd.testing.assert_frame_equal(mapped, x[['ER2', 'ER3']])
+        for col in mapped.columns:
+            base = mapped[col].values
+            while not isinstance(base, np.memmap):
+                base = base.base
+            self.assertEqual(base.filename, os.path.realpath(out))
+            self.assertEqual(base.mode, 'c')
+
+        #Copy-on-write leaves the file unchanged
+        mapped.loc[0, 'ER2'] = -1.
+        self.assertEqual(storage.read_frame(out, ['ER2'])['ER2'][0], 0.)
+
+        read = storage.read_frame(out, ['ER2', 'ER3'], mmap=False)
+        pd.testing.assert_frame_equal(read, x[['ER2', 'ER3']])
+        self.assertFalse(isinstance(read['ER2'].values.base, np.memmap))
+
+    def test_build(self):
+        csv_dir = os.path.join(self.temp_dir, 'csv')
+        npy_dir = os.path.join(self.temp_dir, 'npy')
+        os.makedirs(npy_dir)
+        fam_vars, ind_vars = synthetic.write_panel_data(csv_dir, n_fam=100,
+                                                        n_vars=2)
+        for f in glob.glob(os.path.join(csv_dir, '*.csv')):
+            name = os.path.splitext(os.path.basename(f))[0]
+            storage.write_frame(pd.read_csv(f), os.path.join(npy_dir, name),
+                                'npy')
+        panels = []
+        for datadir in [csv_dir, npy_dir]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                panels.append(build_panel(fam_vars, design=2,
+                                          datadir=datadir,
+                                          ind_vars=ind_vars,
+                                          log=io.StringIO()))
+        pd.testing.assert_frame_equal(panels[1], panels[0],
+                                      check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Origin: A file to test the union panel of psid_py
+Filename: test_variants.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This script checks that the panel a UnionPanel from build_union selects for
+each sample, heads_only and design has the rows build_panel returns with
+the same arguments, in the same order, and that the counts of each variant
+match, on synthetic data written by synthetic.write_panel_data().  Run it
+from the repository root with python -m unittest psid_py.test_variants.
+
+"""
+import contextlib
+import io
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from psid_py import synthetic, variants
+from psid_py.psid_py import SampleError, build_panel, build_union
+
+
+class TestUnionPanel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.datadir = tempfile.mkdtemp()
+        cls.fam_vars, cls.ind_vars = synthetic.write_panel_data(
+            cls.datadir, n_fam=300, n_vars=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.union = build_union(cls.fam_vars, datadir=cls.datadir,
+                                    ind_vars=cls.ind_vars, log=io.StringIO())
+        cls.configurations = variants.grid([None, 'SRC', 'SEO'],
+                                           [False, True],
+                                           ['balanced', 2, 'all'])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.datadir)
+
+    def test_equals_build(self):
+        masks = self.union.masks(self.configurations)
+        for sample, heads_only, design in self.configurations:
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected = build_panel(self.fam_vars, design=design,
+                                       datadir=self.datadir,
+                                       ind_vars=self.ind_vars,
+                                       sample=sample, heads_only=heads_only,
+                                       log=io.StringIO())
+            expected = expected.reset_index(drop=True)
+            x = self.union.panel(sample, heads_only, design)
+            pd.testing.assert_frame_equal(x.reset_index(drop=True),
+                                          expected)
+            x = self.union.panel(keep=masks[(sample, heads_only, design)])
+            pd.testing.assert_frame_equal(x.reset_index(drop=True),
+                                          expected)
+
+    def test_counts(self):
+        counts = self.union.counts(self.configurations)
+        self.assertEqual(counts.shape[0], len(self.configurations))
+        for c in self.configurations:
+            x = self.union.panel(*c)
+            self.assertEqual(counts.loc[c, 'observations'], x.shape[0])
+            self.assertEqual(counts.loc[c, 'individuals'],
+                             x['pid'].nunique())
+        self.assertEqual(len(self.union),
+                         counts.loc[(None, False, 'all'), 'observations'])
+
+    def test_errors(self):
+        with self.assertRaises(SampleError):
+            self.union.mask('latino')
+        log = io.StringIO()
+        self.assertIsNone(build_union(self.fam_vars, ind_vars=self.ind_vars,
+                                      log=log))
+        self.assertIn('ERROR: (build_union)', log.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
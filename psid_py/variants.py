@@ -0,0 +1,208 @@
+"""
+Origin: A module to select many sample and design variants of one panel
+Filename: variants.py
+Author: Tyler Abbot
+Last modified: 19 October, 2026
+
+This module contains the union panel of a build: every individual in every
+requested year, built once with design='all', no sub-sample and all
+household members.  The panel of any combination of sample, heads_only and
+design is a subset of its rows, so robustness checks over many
+combinations cost one build and one boolean mask per combination:
+
+    union = psid_py.build_union(fam_vars, datadir=..., ind_vars=...)
+    for sample, heads_only, design in variants.grid(
+            ['SRC', 'SEO'], [False, True], ['balanced', 3]):
+        keep = union.mask(sample, heads_only, design)
+        ...
+    panel = union.panel('SRC', True, 'balanced')
+
+The masks reproduce build_panel: the sub-sample ranges of sub_sampling(),
+the current heads of head_of_house(), the presence index filter of
+design_keep() and the design check on the number of years present.  The
+rows of union.panel() are those of build_panel with the same arguments, in
+the same order.
+
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from . import presence
+from .stats import SAMPLES
+
+
+def grid(samples=(None,), heads_only=(False,), designs=('balanced',)):
+    """
+    Return every combination of the samples, heads_only values and designs
+    as a list of (sample, heads_only, design).
+    """
+    return list(itertools.product(samples, heads_only, designs))
+
+
+class UnionPanel(object):
+    """
+    The panel of all individuals and years of a build, with the presence
+    index of the individual file, from which the rows of each sample and
+    design are selected.
+
+    Parameters
+    ----------
+    data        :   dataframe; build_panel rows with design='all', no sample
+                    and no heads_only, without the present column
+    index       :   dataframe; the presence index, see presence.load_index()
+    years       :   list; years of the panel
+    ids         :   dataframe; the PSID id variables, see makeids()
+
+    """
+    def __init__(self, data, index, years, ids):
+        self.data = data
+        self.index = index
+        self.years = list(years)
+        self.ids = ids
+
+        #Each row's person as a position in the persons of the panel
+        self.codes, persons = pd.factorize(data['pid'].values)
+        self.persons = persons.shape[0]
+        self.index_codes = pd.Index(persons).get_indexer(
+            index['pid'].values)
+        self.ID1968 = data['ID1968'].values
+
+        #Current heads: the head relation code and, after 1968, sequence
+        #number one, as in head_of_house()
+        year = data['year'].values
+        head_num = ids.loc[self.years, 'ind_head_num']
+        self.head = (data['relation_head'].values
+                     == head_num.reindex(year).values)\
+            & (data['sequence'].values == 1)
+
+        self.early = {}
+
+    def __repr__(self):
+        return ('UnionPanel(' + str(self.data.shape[0]) + ' observations, '
+                + str(self.persons) + ' individuals, years '
+                + ', '.join(str(y) for y in self.years) + ')')
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def sample_mask(self, sample=None):
+        """
+        Return the rows of a sub-sample, see sub_sampling().  Raises a
+        SampleError for the latino sample outside of 1990 to 1995.
+        """
+        if sample is None:
+            return np.ones(self.data.shape[0], dtype=bool)
+        if sample == 'latino' and any(y < 1990 or y > 1995
+                                      for y in self.years):
+            from .psid_py import SampleError
+
+            raise SampleError('You have requested the latino sample outside'
+                              ' of years for which it is available.  Please'
+                              ' check whether the data you are requesting'
+                              ' exist and try again.')
+        for name, low, high in SAMPLES:
+            if name == sample:
+                return (self.ID1968 > low) & (self.ID1968 < high)
+        return np.ones(self.data.shape[0], dtype=bool)
+
+    def early_mask(self, design, heads_only):
+        """
+        Return the persons kept by the presence index before merging, see
+        design_keep(), as a boolean array over the persons of the panel.
+        Kept for each design and heads_only.
+        """
+        key = (str(design), bool(heads_only))
+        if key not in self.early:
+            keep = presence.design_filter(self.index, self.years, design,
+                                          heads_only, self.ids)
+            found = self.index_codes[keep]
+            persons = np.zeros(self.persons, dtype=bool)
+            persons[found[found >= 0]] = True
+            self.early[key] = persons
+        return self.early[key]
+
+    def present(self, keep):
+        """
+        Return the number of kept rows of each row's person, the present
+        column of build_panel.
+        """
+        count = np.bincount(self.codes[keep], minlength=self.persons)
+        return count[self.codes]
+
+    def mask(self, sample=None, heads_only=None, design='balanced'):
+        """
+        A function to select the rows of the panel build_panel returns for
+        a sample, heads_only and design.  Returns a boolean array over the
+        rows of the union panel.
+
+        Parameters
+        ----------
+        sample      :   string; the sub-sample, see build_panel()
+        heads_only  :   bool; keep only current heads of household
+        design      :   string or integer; see build_panel()
+
+        """
+        keep = self.sample_mask(sample)
+        if heads_only:
+            keep = keep & self.head
+        if design == 'all':
+            return keep
+        keep = keep & self.early_mask(design, heads_only)[self.codes]
+
+        present = self.present(keep)
+        if design == 'balanced':
+            if keep.any():
+                keep &= present == present[keep].max()
+        elif str(design).isdigit():
+            keep &= present >= int(design)
+        return keep
+
+    def masks(self, configurations):
+        """
+        A function to select the rows of many variants at once.  Returns a
+        dictionary of boolean arrays keyed by (sample, heads_only, design).
+
+        Parameters
+        ----------
+        configurations  :   list; (sample, heads_only, design) tuples, see
+                            grid()
+
+        """
+        return dict((tuple(c), self.mask(*c)) for c in configurations)
+
+    def counts(self, configurations):
+        """
+        Return the number of observations and individuals of each variant
+        as a dataframe indexed by (sample, heads_only, design).
+        """
+        rows = []
+        for c in configurations:
+            keep = self.mask(*c)
+            rows.append(list(c) + [int(keep.sum()),
+                                   np.unique(self.codes[keep]).shape[0]])
+        return pd.DataFrame(rows, columns=['sample', 'heads_only', 'design',
+                                           'observations', 'individuals'])\
+            .set_index(['sample', 'heads_only', 'design'])
+
+    def panel(self, sample=None, heads_only=None, design='balanced',
+              keep=None):
+        """
+        A function to return the panel of a variant, the rows and columns of
+        build_panel with the same arguments.
+
+        Parameters
+        ----------
+        sample      :   string; the sub-sample, see build_panel()
+        heads_only  :   bool; keep only current heads of household
+        design      :   string or integer; see build_panel()
+        keep        :   array; a mask from mask(), used instead of the
+                        arguments if given
+
+        """
+        if keep is None:
+            keep = self.mask(sample, heads_only, design)
+        x = self.data[keep].copy()
+        x['present'] = self.present(keep)[keep]
+        return x
@@ -65,11 +65,21 @@ setup(
     # simple. Or you can use find_packages().
     packages=find_packages(exclude=['contrib', 'docs', 'tests*']),
 
+    # The PSID metadata tables, see psid_py/metadata.py
+    package_data={'psid_py': ['data/*.json']},
+
     # List run-time dependencies here.  These will be installed by pip when
     # your project is installed. For an analysis of "install_requires" vs pip's
     # requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=['requests',
+                      'numpy',
                       'pandas',
                       'beautifulsoup4'],
+
+    # Optional dependencies, installed with pip install psid_py[parquet]
+    extras_require={'parquet': ['pyarrow']},
+
+    # The psid-py command, see psid_py/cli.py
+    entry_points={'console_scripts': ['psid-py=psid_py.cli:main']},
 )